@@ -0,0 +1,227 @@
+#!/usr/bin/env python
+"""Measures the CPU-side hot paths of spirenttestcenteriq: converting results, and
+building queries.
+
+No IQ server is needed. The results are synthetic raw_data payloads (as returned by the
+ReST API) with a configurable number of rows and columns, and the queries are built
+against a synthetic database.
+
+For each benchmark, the median time per call, the throughput (rows, columns or
+timestamps per second) and the peak memory allocated by a single call are printed as
+JSON. As with bench_startup.py, the results can be saved as a baseline, and later runs
+compared against it:
+
+    python benchmarks/bench_conversion.py --save-baseline benchmarks/baselines/conversion.json
+    python benchmarks/bench_conversion.py --baseline benchmarks/baselines/conversion.json
+
+The exit status is 1 if any benchmark is slower than the baseline by more than the
+tolerance. Baselines are only comparable if they were made with the same --rows and
+--columns.
+
+The committed baseline (in benchmarks/baselines/) was made with the default options.
+Timings depend on the machine, so save a new baseline before comparing on other hardware.
+
+"""
+
+import argparse
+import datetime
+import json
+import os
+import os.path
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+
+__author__ = "Matthew Jefferson"
+__copyright__ = "Copyright 2020, Spirent Communications"
+__credits__ = ["Matthew Jefferson"]
+__version__ = "0.0.1"
+__maintainer__ = "Matthew Jefferson"
+__email__ = "matt.jefferson@spirent.com"
+
+# "Prototype", "Development", or "Production"
+__status__ = "Prototype"
+
+REPO_PATH = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_PATH)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import spirenttestcenteriq
+import benchcommon
+
+def build_raw_data(rows, columns):
+    # Returns a result like those returned by the ReST API. The first two columns are the
+    # keys (a port name and a stream ID), and the rest are counters.
+    raw_data = {}
+    raw_data["result"] = {}
+    raw_data["result"]["columns"] = ["port_name", "tx_stream_stream_id"] + ["counter_" + str(index) for index in range(columns - 2)]
+    raw_data["result"]["rows"] = []
+
+    for row_index in range(rows):
+        row = ["Port //1/" + str(row_index % 16 + 1), row_index]
+        row += [row_index * column_index for column_index in range(columns - 2)]
+        raw_data["result"]["rows"].append(row)
+
+    return raw_data
+
+def build_db_info(columns):
+    # Returns the information for a database with two result sets, each with the
+    # specified number of facts, which share the "tx_stream" and "port" dimension sets.
+    db_info = {}
+    db_info["id"] = "benchmark"
+    db_info["name"] = "benchmark"
+    db_info["first_created"] = "2020-01-01T00:00:00.000000Z"
+    db_info["last_updated"] = "2020-01-01T00:00:00.000000Z"
+    db_info["metadata"] = {"test.running": "false"}
+
+    db_info["result_sets"] = []
+    for set_name in ("tx_stream_stats", "rx_stream_stats"):
+        result_set = {}
+        result_set["name"] = set_name
+        result_set["facts"] = [{"name": "counter_" + str(index), "type": "uint64"} for index in range(columns)]
+        result_set["dimension_sets"] = ["tx_stream", "port"]
+        result_set["primary_dimension_set"] = "tx_stream"
+        db_info["result_sets"].append(result_set)
+
+    db_info["dimension_sets"] = []
+    db_info["dimension_sets"].append({"name": "tx_stream", "attributes": [{"name": "stream_id", "type": "uint32"}]})
+    db_info["dimension_sets"].append({"name": "port", "attributes": [{"name": "name", "type": "string"}]})
+
+    return db_info
+
+def build_nested_dict(rows, columns):
+    # Returns a dictionary shaped like the result of convert_result_to_dict(key_names=[...]).
+    nested = {}
+    for row_index in range(rows):
+        port = "Port //1/" + str(row_index % 16 + 1)
+        nested.setdefault(port, {})[row_index] = {"counter_" + str(index): row_index for index in range(columns)}
+    return nested
+
+def get_benchmarks(rows, columns):
+    # Returns a dictionary of name: (function, items), where items is the number of
+    # items (rows, columns or timestamps) that each call of the function processes.
+    iq = spirenttestcenteriq.SpirentTestCenterIQ(discover=False)
+    db = spirenttestcenteriq.IqDatabase(iq, "benchmark", db_info=build_db_info(columns))
+
+    raw_data = build_raw_data(rows, columns)
+    key_names = ["port_name", "tx_stream_stream_id"]
+
+    update_target = build_nested_dict(rows, columns)
+    update_source = build_nested_dict(rows, columns)
+
+    multi_query = spirenttestcenteriq.IqMultiQuery(db, iq_set_names=["tx_stream_stats", "rx_stream_stats"], keys=["tx_stream_stream_id"])
+    result_set = db.find_set_by_name("tx_stream_stats")
+
+    timestamps = [iq.iso_format(datetime.datetime(2020, 1, 1) + datetime.timedelta(microseconds=index * 1000)) for index in range(rows)]
+
+    csv_filename = os.path.join(tempfile.gettempdir(), "bench_conversion_" + str(os.getpid()) + ".csv")
+
+    def build_multi_query():
+        # Measure building the query, rather than returning the compiled copy.
+        multi_query.invalidate()
+        return multi_query.get_query()
+
+    def parse_timestamps():
+        for timestamp in timestamps:
+            iq.from_iso_format(timestamp)
+        return
+
+    benchmarks = {}
+    benchmarks["convert_result_to_dict"] = (lambda: iq.convert_result_to_dict(raw_data), rows)
+    benchmarks["convert_result_to_dict_keys"] = (lambda: iq.convert_result_to_dict(raw_data, key_names=key_names), rows)
+    benchmarks["convert_result_to_csv"] = (lambda: iq.convert_result_to_csv(raw_data, filename=csv_filename), rows)
+    benchmarks["deepupdate"] = (lambda: spirenttestcenteriq.deepupdate(update_target, update_source), rows)
+    benchmarks["multi_query_get_query"] = (build_multi_query, len(multi_query.get_columns()))
+    benchmarks["multi_query_get_query_compiled"] = (multi_query.get_query, len(multi_query.get_columns()))
+    benchmarks["result_set_get_columns_info"] = (result_set.get_columns_info, len(result_set.column_list))
+    benchmarks["from_iso_format"] = (parse_timestamps, rows)
+
+    return benchmarks, csv_filename
+
+def measure(function, items, repeat=5, min_duration=0.2):
+    # Returns the median time per call, the throughput and the peak memory of the function.
+
+    # Work out how many calls are needed for each repeat to take at least min_duration.
+    number = 1
+    while True:
+        start_time = time.perf_counter()
+        for index in range(number):
+            function()
+        duration = time.perf_counter() - start_time
+        if duration >= min_duration:
+            break
+        if duration > 0:
+            number = max(number * 2, int(number * min_duration / duration) + 1)
+        else:
+            number *= 10
+
+    timings = []
+    for repeat_index in range(repeat):
+        start_time = time.perf_counter()
+        for index in range(number):
+            function()
+        timings.append((time.perf_counter() - start_time) / number)
+
+    # The peak memory is measured separately, since tracing slows everything down.
+    tracemalloc.start()
+    function()
+    peak_memory = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+
+    median = statistics.median(timings)
+
+    result = {}
+    result["median_ms"] = median * 1000
+    result["min_ms"] = min(timings) * 1000
+    result["items_per_second"] = items / median if median else None
+    result["peak_memory_kb"] = peak_memory / 1024
+
+    return result
+
+def run_benchmarks(rows=10000, columns=20, repeat=5, names=None):
+    benchmarks, csv_filename = get_benchmarks(rows, columns)
+
+    results = {}
+    try:
+        for name, (function, items) in benchmarks.items():
+            if names and name not in names:
+                continue
+            results[name] = measure(function, items, repeat=repeat)
+    finally:
+        if os.path.exists(csv_filename):
+            os.remove(csv_filename)
+
+    return results
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="CPU microbenchmarks for spirenttestcenteriq.")
+    parser.add_argument("--rows", type=int, default=10000, help="The number of rows in the synthetic results.")
+    parser.add_argument("--columns", type=int, default=20, help="The number of columns in the synthetic results (at least 2).")
+    parser.add_argument("--repeat", type=int, default=5, help="The number of timed runs of each benchmark.")
+    parser.add_argument("--only", action="append", help="Only run this benchmark (may be repeated).")
+    parser.add_argument("--baseline", help="Compare the results against this baseline file.")
+    parser.add_argument("--tolerance", type=float, default=0.5, help="The allowed slowdown, as a fraction of the baseline.")
+    parser.add_argument("--save-baseline", help="Save the results to this baseline file.")
+    args = parser.parse_args(argv)
+
+    if args.columns < 2:
+        parser.error("--columns must be at least 2")
+
+    results = run_benchmarks(rows=args.rows, columns=args.columns, repeat=args.repeat, names=args.only)
+
+    print(json.dumps(results, indent=2, sort_keys=True))
+
+    if args.save_baseline:
+        benchcommon.save_baseline(results, args.save_baseline)
+
+    if args.baseline:
+        baseline = benchcommon.load_baseline(args.baseline)
+        if benchcommon.compare(results, baseline, args.tolerance):
+            return 1
+
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
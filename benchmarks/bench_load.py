@@ -0,0 +1,174 @@
+#!/usr/bin/env python
+"""End-to-end load and latency test of the spirenttestcenteriq client.
+
+Each scenario is run at each of the chosen concurrency levels, against the local IQ
+stand-in server (benchmarks/iqserver.py), or against a real IQ server with --server:
+
+    discovery     Construct a SpirentTestCenterIQ object (database discovery).
+    single_query  Execute an IqSingleQuery.
+    view_query    Execute a pre-defined view query (execute_view_query).
+    live_poll     Refresh a StreamLiveResults object (one per worker thread).
+
+For each scenario and concurrency level, the p50 and p99 latency of the operations and
+the number of operations per second are printed as JSON. When the stand-in server is
+used, the number of HTTP requests per second that it served is included:
+
+    python benchmarks/bench_load.py --concurrency 1,8,32 --operations 200 --latency 0.002
+
+"""
+
+import argparse
+import concurrent.futures
+import json
+import os
+import os.path
+import sys
+import threading
+import time
+
+__author__ = "Matthew Jefferson"
+__copyright__ = "Copyright 2020, Spirent Communications"
+__credits__ = ["Matthew Jefferson"]
+__version__ = "0.0.1"
+__maintainer__ = "Matthew Jefferson"
+__email__ = "matt.jefferson@spirent.com"
+
+# "Prototype", "Development", or "Production"
+__status__ = "Prototype"
+
+REPO_PATH = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_PATH)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import spirenttestcenteriq
+import spirenttestcenteriqresults
+import iqserver
+
+SCENARIOS = ["discovery", "single_query", "view_query", "live_poll"]
+
+def percentile(values, percent):
+    # The nearest-rank percentile of the values.
+    if not values:
+        return None
+    values = sorted(values)
+    index = max(int(round(percent / 100.0 * len(values) + 0.5)) - 1, 0)
+    return values[min(index, len(values) - 1)]
+
+def get_operation(scenario, host, port, view_name):
+    # Returns a function that performs one operation of the scenario, and the client it uses.
+    if scenario == "discovery":
+        def discover():
+            iq = spirenttestcenteriq.SpirentTestCenterIQ(host, port)
+            iq.close()
+            return
+        return discover, None
+
+    iq = spirenttestcenteriq.SpirentTestCenterIQ(host, port, pool_size=64)
+    db = iq.db_list[0]
+
+    if scenario == "single_query":
+        query = spirenttestcenteriq.IqSingleQuery(db, iq_set_name="tx_stream_live_stats")
+        return query.execute, iq
+
+    if scenario == "view_query":
+        return lambda: iq.execute_view_query(view_name, db_id=db.id), iq
+
+    if scenario == "live_poll":
+        # The StreamLiveResults objects are not thread-safe, so each worker polls its own.
+        local = threading.local()
+        def poll():
+            if not hasattr(local, "results"):
+                local.results = spirenttestcenteriqresults.StreamLiveResults(db, incremental=True)
+            local.results.refresh()
+            return
+        return poll, iq
+
+    raise ValueError("Unknown scenario '" + scenario + "'. Use one of: " + ", ".join(SCENARIOS))
+
+def run_scenario(scenario, concurrency, operations, host, port, view_name, server=None):
+    operation, iq = get_operation(scenario, host, port, view_name)
+
+    def timed_operation():
+        start_time = time.perf_counter()
+        operation()
+        return time.perf_counter() - start_time
+
+    if server:
+        server_requests = sum(server.request_counts.values())
+
+    latencies = []
+    errors = 0
+    start_time = time.perf_counter()
+    with concurrent.futures.ThreadPoolExecutor(max_workers=concurrency) as executor:
+        futures = [executor.submit(timed_operation) for index in range(operations)]
+        for future in concurrent.futures.as_completed(futures):
+            try:
+                latencies.append(future.result())
+            except Exception as error:
+                errors += 1
+                print("ERROR: " + scenario + ": " + str(error), file=sys.stderr)
+    duration = time.perf_counter() - start_time
+
+    if iq:
+        iq.close()
+
+    result = {}
+    result["operations"] = operations
+    result["errors"] = errors
+    result["duration_s"] = duration
+    result["operations_per_second"] = len(latencies) / duration if duration else None
+    result["p50_ms"] = percentile(latencies, 50) * 1000 if latencies else None
+    result["p99_ms"] = percentile(latencies, 99) * 1000 if latencies else None
+    if server:
+        result["http_requests_per_second"] = (sum(server.request_counts.values()) - server_requests) / duration if duration else None
+
+    return result
+
+def run_benchmarks(scenarios, levels, operations, host, port, view_name, server=None):
+    results = {}
+    for scenario in scenarios:
+        results[scenario] = {}
+        for concurrency in levels:
+            results[scenario][str(concurrency)] = run_scenario(scenario, concurrency, operations, host, port, view_name, server=server)
+
+    return results
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="End-to-end load test for spirenttestcenteriq.")
+    parser.add_argument("--server", help="host:port of an IQ server. If not specified, the local stand-in server is started.")
+    parser.add_argument("--scenario", action="append", choices=SCENARIOS, help="Only run this scenario (may be repeated).")
+    parser.add_argument("--concurrency", default="1,4,16", help="Comma-separated concurrency levels.")
+    parser.add_argument("--operations", type=int, default=100, help="The number of operations per scenario and concurrency level.")
+    parser.add_argument("--view", default="Stream Results", help="The view used by the view_query scenario.")
+    parser.add_argument("--databases", type=int, default=4, help="Stand-in server: the number of databases.")
+    parser.add_argument("--streams", type=int, default=100, help="Stand-in server: the number of rows returned by each query.")
+    parser.add_argument("--result-sets", type=int, default=0, help="Stand-in server: the number of extra result sets per database.")
+    parser.add_argument("--latency", type=float, default=0.0, help="Stand-in server: the latency (in seconds) of each response.")
+    parser.add_argument("--jitter", type=float, default=0.0, help="Stand-in server: the maximum random variation of the latency.")
+    parser.add_argument("--scale", type=float, default=1.0, help="Stand-in server: multiplies the number of rows returned.")
+    args = parser.parse_args(argv)
+
+    levels = [int(level) for level in args.concurrency.split(",")]
+    scenarios = args.scenario or SCENARIOS
+
+    server = None
+    if args.server:
+        host, port = args.server.rsplit(":", 1)
+        port = int(port)
+    else:
+        server = iqserver.IqStandInServer(databases=args.databases, streams=args.streams, result_sets=args.result_sets,
+                                          latency=args.latency, jitter=args.jitter, scale=args.scale).start()
+        host, port = "127.0.0.1", server.port
+
+    try:
+        results = run_benchmarks(scenarios, levels, args.operations, host, port, args.view, server=server)
+    finally:
+        if server:
+            server.stop()
+
+    print(json.dumps(results, indent=2, sort_keys=True))
+
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
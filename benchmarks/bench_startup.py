@@ -0,0 +1,110 @@
+#!/usr/bin/env python
+"""Measures the import time of the spirenttestcenteriq modules, and the time taken to
+construct a SpirentTestCenterIQ object.
+
+Each measurement is made in a fresh Python process, so nothing is cached between runs.
+The results are printed as JSON. They can be saved as a baseline, and later runs
+compared against it, so that startup regressions are caught:
+
+    python benchmarks/bench_startup.py --save-baseline benchmarks/baselines/startup.json
+    python benchmarks/bench_startup.py --baseline benchmarks/baselines/startup.json
+
+The exit status is 1 if any measurement is slower than the baseline by more than the
+tolerance.
+
+The committed baseline (in benchmarks/baselines/) was made with the default options.
+Timings depend on the machine, so save a new baseline before comparing on other hardware.
+
+"""
+
+import argparse
+import json
+import os.path
+import statistics
+import subprocess
+import sys
+
+__author__ = "Matthew Jefferson"
+__copyright__ = "Copyright 2020, Spirent Communications"
+__credits__ = ["Matthew Jefferson"]
+__version__ = "0.0.1"
+__maintainer__ = "Matthew Jefferson"
+__email__ = "matt.jefferson@spirent.com"
+
+# "Prototype", "Development", or "Production"
+__status__ = "Prototype"
+
+REPO_PATH = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import benchcommon
+
+# Each snippet prints the number of seconds taken by the code being measured.
+BENCHMARKS = {
+    "import_spirenttestcenteriq": "import spirenttestcenteriq",
+    "import_spirenttestcenteriqresults": "import spirenttestcenteriqresults",
+    "construct_without_discovery": "import spirenttestcenteriq\n"
+                                   "spirenttestcenteriq.SpirentTestCenterIQ('127.0.0.1', discover=False)",
+}
+
+SERVER_BENCHMARKS = {
+    "construct_with_discovery": "import spirenttestcenteriq\n"
+                                "spirenttestcenteriq.SpirentTestCenterIQ({host!r}, {port})",
+    "construct_with_lazy_discovery": "import spirenttestcenteriq\n"
+                                     "spirenttestcenteriq.SpirentTestCenterIQ({host!r}, {port}, lazy_discovery=True)",
+}
+
+def run_snippet(snippet):
+    # Run the snippet in a new interpreter, and return the time it took (in seconds).
+    code = "import sys, time\n" \
+           "sys.path.insert(0, " + repr(REPO_PATH) + ")\n" \
+           "start_time = time.perf_counter()\n" + \
+           snippet + "\n" \
+           "print(time.perf_counter() - start_time)\n"
+
+    output = subprocess.run([sys.executable, "-c", code], check=True, stdout=subprocess.PIPE, universal_newlines=True).stdout
+
+    return float(output.strip().splitlines()[-1])
+
+def run_benchmarks(repeat=10, server=None):
+    benchmarks = dict(BENCHMARKS)
+    if server:
+        host, port = server.rsplit(":", 1)
+        for name, snippet in SERVER_BENCHMARKS.items():
+            benchmarks[name] = snippet.format(host=host, port=int(port))
+
+    results = {}
+    for name, snippet in benchmarks.items():
+        timings = [run_snippet(snippet) * 1000 for index in range(repeat)]
+
+        results[name] = {}
+        results[name]["min_ms"] = min(timings)
+        results[name]["median_ms"] = statistics.median(timings)
+
+    return results
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Startup benchmark for spirenttestcenteriq.")
+    parser.add_argument("--repeat", type=int, default=10, help="The number of runs of each benchmark.")
+    parser.add_argument("--server", help="host:port of an IQ server (or the stand-in server), to also measure discovery.")
+    parser.add_argument("--baseline", help="Compare the results against this baseline file.")
+    parser.add_argument("--tolerance", type=float, default=0.5, help="The allowed slowdown, as a fraction of the baseline.")
+    parser.add_argument("--save-baseline", help="Save the results to this baseline file.")
+    args = parser.parse_args(argv)
+
+    results = run_benchmarks(repeat=args.repeat, server=args.server)
+
+    print(json.dumps(results, indent=2, sort_keys=True))
+
+    if args.save_baseline:
+        benchcommon.save_baseline(results, args.save_baseline)
+
+    if args.baseline:
+        baseline = benchcommon.load_baseline(args.baseline)
+        if benchcommon.compare(results, baseline, args.tolerance):
+            return 1
+
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
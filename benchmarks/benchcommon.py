@@ -0,0 +1,54 @@
+#!/usr/bin/env python
+"""Baseline handling shared by the benchmark scripts.
+
+A baseline is the JSON output of a benchmark script, keyed by benchmark name. Each
+benchmark has (at least) a "median_ms" value, which is what later runs are compared
+against.
+
+"""
+
+import json
+import os
+import os.path
+import sys
+
+__author__ = "Matthew Jefferson"
+__copyright__ = "Copyright 2020, Spirent Communications"
+__credits__ = ["Matthew Jefferson"]
+__version__ = "0.0.1"
+__maintainer__ = "Matthew Jefferson"
+__email__ = "matt.jefferson@spirent.com"
+
+# "Prototype", "Development", or "Production"
+__status__ = "Prototype"
+
+BASELINES_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baselines")
+
+def save_baseline(results, filename):
+    # Save the results as a baseline. The directory is created if it doesn't exist.
+    directory = os.path.dirname(os.path.abspath(filename))
+    os.makedirs(directory, exist_ok=True)
+
+    with open(filename, "w") as baseline_file:
+        json.dump(results, baseline_file, indent=2, sort_keys=True)
+        baseline_file.write("\n")
+
+    return
+
+def load_baseline(filename):
+    with open(filename) as baseline_file:
+        return json.load(baseline_file)
+
+def compare(results, baseline, tolerance):
+    # Returns the names of the benchmarks that are slower than the baseline.
+    regressions = []
+    for name, result in results.items():
+        if name not in baseline:
+            continue
+
+        limit = baseline[name]["median_ms"] * (1 + tolerance)
+        if result["median_ms"] > limit:
+            regressions.append(name)
+            print("REGRESSION: " + name + " took %.3f ms (baseline %.3f ms)" % (result["median_ms"], baseline[name]["median_ms"]), file=sys.stderr)
+
+    return regressions
@@ -0,0 +1,361 @@
+#!/usr/bin/env python
+"""A local stand-in for the Spirent IQ ReST API, for load and latency testing.
+
+Only the parts of the API used by spirenttestcenteriq are implemented:
+
+    GET  /databases?detail=summary
+    GET  /databases
+    GET  /databases/<id>[?detail=summary]
+    POST /queries
+
+The databases are synthetic. Each one has the stream live statistics result sets used
+by spirenttestcenteriqresults, plus any number of extra result sets (to make the
+catalog larger). Queries return {"result": {"columns": [...], "rows": [...]}}, with one
+column per projection alias, and one row per stream (multiplied by the scale). The
+pagination and limit of the query are honoured.
+
+The latency and jitter of each response can be set, and gzip is supported in both
+directions. To run it on its own:
+
+    python benchmarks/iqserver.py --port 9199 --streams 1000 --latency 0.005
+
+"""
+
+import argparse
+import datetime
+import gzip
+import json
+import random
+import re
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+__author__ = "Matthew Jefferson"
+__copyright__ = "Copyright 2020, Spirent Communications"
+__credits__ = ["Matthew Jefferson"]
+__version__ = "0.0.1"
+__maintainer__ = "Matthew Jefferson"
+__email__ = "matt.jefferson@spirent.com"
+
+# "Prototype", "Development", or "Production"
+__status__ = "Prototype"
+
+# The result sets used by the canned results (StreamLiveResults).
+LIVE_RESULT_SETS = [
+    {"name": "tx_stream_live_stats",
+     "facts": ["timestamp", "frame_count", "frame_rate"],
+     "dimension_sets": ["tx_stream", "port", "tx_port", "stream_block", "tx_stream_config"],
+     "primary_dimension_set": "tx_stream"},
+    {"name": "rx_stream_live_stats",
+     "facts": ["timestamp", "frame_count", "sig_frame_count", "sig_frame_rate", "avg_latency"],
+     "dimension_sets": ["rx_stream", "rx_port"],
+     "primary_dimension_set": "rx_stream"},
+]
+
+DIMENSION_SETS = {
+    "tx_stream": ["stream_id"],
+    "rx_stream": ["stream_id"],
+    "port": ["name", "handle"],
+    "tx_port": ["name", "handle", "scheduling_mode", "speed"],
+    "rx_port": ["name", "handle"],
+    "stream_block": ["name"],
+    "tx_stream_config": ["ipv4_1_dest_addr", "ipv4_1_source_addr"],
+}
+
+#========================================================================================================
+class IqStandInServer(ThreadingHTTPServer):
+    """A threaded HTTP server that behaves like the IQ ReST API.
+
+    Parameters
+    ----------
+    address: tuple
+        The (host, port) to listen on. Port 0 picks a free port (see self.port).
+
+    databases: int
+        The number of synthetic databases.
+
+    streams: int
+        The number of rows returned by a query (before scaling).
+
+    result_sets: int
+        The number of extra result sets in each database, in addition to the live
+        statistics result sets.
+
+    facts: int
+        The number of facts in each extra result set.
+
+    latency: float
+        The time (in seconds) added to every response.
+
+    jitter: float
+        A random amount of up to +/- jitter seconds is added to the latency.
+
+    scale: float
+        Multiplies the number of rows returned by queries, to scale the response size.
+
+    running: bool
+        The value of the "test.running" metadata of the databases.
+
+    """
+    daemon_threads = True
+
+    # The default listen backlog (5) drops connections under load, which shows up as
+    # one second connect retries in the client latencies.
+    request_queue_size = 128
+
+    def __init__(self, address=("127.0.0.1", 0), databases=1, streams=100, result_sets=0, facts=10,
+                 latency=0.0, jitter=0.0, scale=1.0, running=False):
+
+        self.databases = {}
+        self.streams = streams
+        self.latency = latency
+        self.jitter = jitter
+        self.scale = scale
+
+        self.lock = threading.Lock()
+        self.request_counts = {}
+
+        for index in range(databases):
+            db_info = self.build_db_info("db" + str(index), result_sets, facts, running)
+            self.databases[db_info["id"]] = db_info
+
+        super().__init__(address, IqStandInHandler)
+
+        self.port = self.server_address[1]
+        self.thread = None
+
+        return
+
+    def build_db_info(self, db_id, result_sets, facts, running):
+        now = datetime.datetime.utcnow().strftime("%Y-%m-%dT%H:%M:%S.%fZ")
+
+        db_info = {}
+        db_info["id"] = db_id
+        db_info["name"] = "standin_" + db_id
+        db_info["first_created"] = now
+        db_info["last_updated"] = now
+        db_info["metadata"] = {"application.name": "TestCenter", "test.running": str(running).lower()}
+        db_info["datastore"] = {"id": "default", "provider": "standin", "capabilities": ["has_multi_result_query_type", "has_single_result_query_type", "has_cost_query_mode"]}
+
+        db_info["result_sets"] = []
+        for result_set in LIVE_RESULT_SETS:
+            result_set_info = dict(result_set)
+            result_set_info["facts"] = [self.build_column(fact) for fact in result_set["facts"]]
+            db_info["result_sets"].append(result_set_info)
+
+        for index in range(result_sets):
+            result_set_info = {}
+            result_set_info["name"] = "result_set_" + str(index)
+            result_set_info["facts"] = [self.build_column("counter_" + str(fact)) for fact in range(facts)]
+            result_set_info["dimension_sets"] = ["tx_stream", "port"]
+            result_set_info["primary_dimension_set"] = "tx_stream"
+            db_info["result_sets"].append(result_set_info)
+
+        db_info["dimension_sets"] = []
+        for name, attributes in DIMENSION_SETS.items():
+            db_info["dimension_sets"].append({"name": name, "attributes": [self.build_column(attribute) for attribute in attributes]})
+
+        return db_info
+
+    def build_column(self, name):
+        column = {}
+        column["name"] = name
+        if name == "timestamp":
+            column["type"] = "timestamp"
+        elif name in ("stream_id", "speed") or "count" in name or "counter" in name:
+            column["type"] = "uint64"
+        elif "rate" in name or "latency" in name:
+            column["type"] = "double"
+        else:
+            column["type"] = "string"
+        column["unit"] = None
+        column["display_name"] = name
+        column["description"] = name
+        return column
+
+    def get_summary(self, db_info):
+        return {key: value for key, value in db_info.items() if key not in ("result_sets", "dimension_sets")}
+
+    def count_request(self, endpoint):
+        with self.lock:
+            self.request_counts[endpoint] = self.request_counts.get(endpoint, 0) + 1
+        return
+
+    def get_delay(self):
+        delay = self.latency
+        if self.jitter:
+            delay += random.uniform(-self.jitter, self.jitter)
+        return max(delay, 0.0)
+
+    def execute_query(self, payload):
+        # Returns the result for the query payload.
+        definition = payload.get("definition", {})
+        query_type = list(definition.keys())[0] if definition else None
+        query = definition.get(query_type) or {}
+
+        columns = [self.get_alias(projection) for projection in query.get("projections", [])]
+
+        if payload.get("mode") == "cost":
+            # Roughly what a PostgreSQL EXPLAIN would give: the cost grows with the number of
+            # values, and with each joined subquery.
+            row_count = self.get_row_count(query)
+            cost = row_count * len(columns) * 0.01 * (1 + len(query.get("subqueries", [])))
+            return {"result": {"columns": ["total_cost", "plan_rows"], "rows": [[cost, row_count]]}}
+
+        timestamp = datetime.datetime.utcnow().strftime("%Y-%m-%dT%H:%M:%S.%fZ")
+
+        # The rows of a page continue from its offset.
+        first_row = (query.get("pagination") or {}).get("offset", 0)
+
+        rows = []
+        for row_index in range(first_row, first_row + self.get_row_count(query)):
+            rows.append([self.get_value(column, row_index, timestamp) for column in columns])
+
+        return {"result": {"columns": columns, "rows": rows}}
+
+    def get_row_count(self, query):
+        row_count = int(self.streams * self.scale)
+
+        # Grouped queries return one row per group. There are 16 of each dimension.
+        if query.get("groups"):
+            row_count = min(row_count, 16 ** len(query["groups"]))
+
+        pagination = query.get("pagination")
+        if pagination:
+            row_count = max(min(row_count - pagination.get("offset", 0), pagination.get("limit", row_count)), 0)
+
+        if query.get("limit") is not None:
+            row_count = min(row_count, query["limit"])
+
+        return row_count
+
+    def get_alias(self, projection):
+        # "view.name as alias" returns "alias". Projections without an alias return the column name.
+        match = re.search(r"\s+as\s+(\w+)\s*$", projection, re.IGNORECASE)
+        if match:
+            return match.group(1)
+        return projection.split(".")[-1].strip("() ")
+
+    def get_value(self, column, row_index, timestamp):
+        if column.endswith("timestamp"):
+            return timestamp
+        elif column.endswith("stream_id"):
+            return row_index
+        elif column.endswith("_name") or column.endswith("handle"):
+            return "Port //1/" + str(row_index % 16 + 1)
+        elif "addr" in column:
+            return "10.0." + str(row_index // 256 % 256) + "." + str(row_index % 256)
+        elif "rate" in column or "latency" in column:
+            return row_index * 0.5
+        else:
+            return row_index * 10
+
+    def start(self):
+        # Serve requests in a background thread.
+        self.thread = threading.Thread(target=self.serve_forever, daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+        return
+
+#========================================================================================================
+class IqStandInHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    # The headers and body are written separately, so without this, Nagle's algorithm
+    # (and the client's delayed ACK) adds ~40 ms to every response.
+    disable_nagle_algorithm = True
+
+    def log_message(self, format, *args):
+        return
+
+    def send_json(self, data, status=200):
+        body = json.dumps(data).encode()
+
+        time.sleep(self.server.get_delay())
+
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        if "gzip" in self.headers.get("Accept-Encoding", ""):
+            body = gzip.compress(body, compresslevel=1)
+            self.send_header("Content-Encoding", "gzip")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+        return
+
+    def do_GET(self):
+        path, _, parameters = self.path.lstrip("/").partition("?")
+        parts = path.split("/")
+
+        if parts == ["databases"]:
+            self.server.count_request("databases")
+            if "detail=summary" in parameters:
+                self.send_json([self.server.get_summary(db_info) for db_info in self.server.databases.values()])
+            else:
+                self.send_json(list(self.server.databases.values()))
+        elif len(parts) == 2 and parts[0] == "databases" and parts[1] in self.server.databases:
+            self.server.count_request("database")
+            db_info = self.server.databases[parts[1]]
+            if "detail=summary" in parameters:
+                self.send_json(self.server.get_summary(db_info))
+            else:
+                self.send_json(db_info)
+        else:
+            self.send_json({"error": "Not found: " + self.path}, status=404)
+
+        return
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        if self.headers.get("Content-Encoding") == "gzip":
+            body = gzip.decompress(body)
+
+        if self.path.lstrip("/").split("?")[0] != "queries":
+            self.send_json({"error": "Not found: " + self.path}, status=404)
+            return
+
+        self.server.count_request("queries")
+        try:
+            result = self.server.execute_query(json.loads(body))
+        except Exception as error:
+            self.send_json({"error": str(error)}, status=400)
+            return
+
+        self.send_json(result)
+        return
+
+#==============================================================================
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Local stand-in for the Spirent IQ ReST API.")
+    parser.add_argument("--host", default="127.0.0.1", help="The address to listen on.")
+    parser.add_argument("--port", type=int, default=9199, help="The port to listen on.")
+    parser.add_argument("--databases", type=int, default=1, help="The number of databases.")
+    parser.add_argument("--streams", type=int, default=100, help="The number of rows returned by each query.")
+    parser.add_argument("--result-sets", type=int, default=0, help="The number of extra result sets in each database.")
+    parser.add_argument("--facts", type=int, default=10, help="The number of facts in each extra result set.")
+    parser.add_argument("--latency", type=float, default=0.0, help="The latency (in seconds) added to each response.")
+    parser.add_argument("--jitter", type=float, default=0.0, help="The maximum random variation of the latency.")
+    parser.add_argument("--scale", type=float, default=1.0, help="Multiplies the number of rows returned by queries.")
+    parser.add_argument("--running", action="store_true", help="Mark the databases as belonging to a running test.")
+    args = parser.parse_args(argv)
+
+    server = IqStandInServer((args.host, args.port), databases=args.databases, streams=args.streams, result_sets=args.result_sets,
+                             facts=args.facts, latency=args.latency, jitter=args.jitter, scale=args.scale, running=args.running)
+
+    print("Serving the IQ stand-in on http://" + args.host + ":" + str(server.port))
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    server.server_close()
+
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
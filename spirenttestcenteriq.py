@@ -1,23 +1,25 @@
 #!/usr/bin/env python
 """Provides a Python front-end for the Spirent TestCenter IQ ReST API.
     
+The modules that are slow to import (requests, dateutil, csv, tempfile and NumPy) are
+only imported when they are first needed, so that importing this module is fast.
 """
 
 import sys
 import os.path
 import time
 import datetime
-import pkg_resources
 import json
 import re
 import copy
-import csv
-import dateutil.parser
-from distutils.version import LooseVersion
-
-import requests
-
-import pprint
+import concurrent.futures
+import threading
+import collections
+import codecs
+import functools
+import warnings
+import mmap
+import array
 
 __author__ = "Matthew Jefferson"
 __copyright__ = "Copyright 2019, Spirent Communications"
@@ -29,17 +31,44 @@ __email__ = "matt.jefferson@spirent.com"
 # "Prototype", "Development", or "Production"
 __status__ = "Prototype"
 
+# NumPy is optional. Without it, IqColumnarResult stores every column as a list.
+# It is slow to import, so it is only imported by get_numpy().
+numpy_module = None
+numpy_imported = False
+
+def get_numpy():
+    """Returns the numpy module, or None if it is not installed.
+    """
+    global numpy_module, numpy_imported
+
+    if not numpy_imported:
+        try:
+            import numpy
+            numpy_module = numpy
+        except ImportError:
+            numpy_module = None
+        numpy_imported = True
+
+    return numpy_module
+
 def timeit(method):
+    # Records the duration of the method as the "method_seconds" metric, labelled with the
+    # method name, in the metrics of the object (self.metrics). Nothing is measured if
+    # metrics are disabled.
+    @functools.wraps(method)
     def timed(*args, **kw):
-        ts = time.time()
+        metrics = getattr(args[0], "metrics", None) if args else None
+        if 'log_time' not in kw and not (metrics and metrics.enabled):
+            return method(*args, **kw)
+
+        ts = time.perf_counter()
         result = method(*args, **kw)
-        te = time.time()
+        te = time.perf_counter()
         if 'log_time' in kw:
             name = kw.get('log_name', method.__name__.upper())
             kw['log_time'][name] = int((te - ts) * 1000)
-        else:
-            print('%r  %2.2f ms' % \
-                  (method.__name__, (te - ts) * 1000))
+        if metrics and metrics.enabled:
+            metrics.record("method_seconds", te - ts, {"method": method.__qualname__})
         return result
     return timed
 
@@ -75,317 +104,1837 @@ def deepupdate(target, src):
                 target[k].update(v.copy())
         else:
             target[k] = copy.copy(v)
-        
-class SpirentTestCenterIQ:
-    def __init__(self, iq_server_ip=None, iq_server_port=9199, verbose=False, log_path=None, log_level="INFO", query_definitions_file=None, stc_api_instance=None):
 
-        self.query_definitions = {}        
+def build_keyed_index(columns, rows, key_names, flat=False, share_rows=False):
+    """Build an index of the result rows, keyed by the values of the specified columns.
 
-        if iq_server_ip:
-            self.spirent_iq_rest_api_url = "http://" + iq_server_ip + ":" + str(iq_server_port)
+    The index is built in a single pass over the rows, without copying any of the
+    intermediate dictionaries. If more than one row has the same key values, the
+    last one wins.
 
-        self.module_path = os.path.dirname(os.path.abspath(__file__))            
+    Parameters
+    ----------
+    columns: list
+        The column names of the result.
 
-        if not query_definitions_file:
-            query_definitions_file = os.path.join(self.module_path, "spirent_iq_query_definitions.json")
+    rows: list
+        The result rows (each is a list of values, in the same order as the columns).
 
-        if os.path.isfile(query_definitions_file):
-            self.__load_json_from_file(query_definitions_file)
+    key_names: list
+        The columns to use as the keys.
 
-        self.stc = stc_api_instance        
+    flat: bool
+        If True, a single level dictionary keyed by a tuple of the key values is
+        returned. Otherwise, there is one level of nested dictionaries per key.
 
-        self.subscribe()
+    share_rows: bool
+        If True, the entries are the row lists themselves, instead of a new dictionary
+        of column to value for each row.
 
-        self.db_list = []
-        self.refresh_database_list()
+    Returns
+    -------
+    dict
+        The index of the rows.
 
-        self.set_current_db()
+    Examples:
+    >>> build_keyed_index(["id", "ts", "count"], [[1, "t0", 5], [1, "t1", 7]], ["id", "ts"])
+    {1: {'t0': {'id': 1, 'ts': 't0', 'count': 5}, 't1': {'id': 1, 'ts': 't1', 'count': 7}}}
+    """
+    key_indexes = []
+    for key in key_names:
+        if key not in columns:
+            raise KeyError("The key '" + key + "' is not a valid value.")
+        key_indexes.append(columns.index(key))
 
-        return
+    index = {}
 
-    def subscribe(self, retention_duration=15, subscribe_type="ALL", config_subscribe_type="ALL"):
-        """If the Spirent TestCenter API is loaded, this will enable the IQ results.
+    if not rows:
+        return index
 
-        Parameters
-        ----------
-        retention_duration: int
-            The number of minutes worth of data that is retained in the database.
+    last_key_index = key_indexes[-1]
+    parent_key_indexes = key_indexes[:-1]
 
-        subscribe_type: str
-            Use this argument to control which statistics are stored in the database.
+    for row in rows:
+        if share_rows:
+            entry = row
+        else:
+            entry = dict(zip(columns, row))
 
-        config_subscribe_type: str
-            Use this argument to control what configuration information is stored in the database.
+        if flat:
+            index[tuple([row[key_index] for key_index in key_indexes])] = entry
+        else:
+            current = index
+            for key_index in parent_key_indexes:
+                key_value = row[key_index]
+                child = current.get(key_value)
+                if child is None:
+                    child = current[key_value] = {}
+                current = child
+            current[row[last_key_index]] = entry
 
-        """
-        erp = None
+    return index
 
-        if self.stc:
-            erp = stc.get("system1", "children-spirent.results.EnhancedResultsSelectorProfile")
-            if erp == "":        
-                # This is required in order to enable the enhanced results.
-                # If you don't set the SubscribeType to "ALL", then you must create some EnhancedResultsGroupFilter objects 
-                # for the results you want to have collected.
-                erp = stc.create("spirent.results.EnhancedResultsSelectorProfile", under="system1", 
-                                                                                   SubscribeType=subscribe_type,
-                                                                                   ConfigSubscribeType=config_subscribe_type,
-                                                                                   EnableLiveDataRetention=True,
-                                                                                   LiveDataRetentionInterval=retention_duration)
+def paginate_query(query, offset, page_size):
+    """Returns a copy of the query definition that requests a single page of rows.
 
-        return erp
+    Parameters
+    ----------
+    query: dict
+        The query definition, e.g. {"multi_result": {...}} or {"single_result": {...}}.
 
-    def get_result_url(self):
-        """Get the URL of the ReST server URL of the Spirent IQ results API.
+    offset: int
+        The index of the first row of the page.
 
-        Returns
-        -------
-        str
-            Returns the URL of the ReST API.
-        """ 
+    page_size: int
+        The maximum number of rows in the page.
 
-        if not self.spirent_iq_rest_api_url:
-            self.spirent_iq_rest_api_url = stc.get("system1.TemevaResultsConfig", "ServiceUrl")
+    Returns
+    -------
+    dict
+        The new query definition. The original query is not modified.
 
-        return(self.spirent_iq_rest_api_url)        
+    """
+    paged_query = {}
+    for query_type, definition in query.items():
+        definition = dict(definition)
+        definition["pagination"] = {"offset": offset, "limit": page_size}
+        paged_query[query_type] = definition
 
-    def execute_query(self, query, mode="once", db_id=None):
-        """Returns the raw results based on the specified query.
+    return paged_query
 
-        You may pass the query from the Spirent TestCenter IQ GUI into this method.
-        You can find the query in the IQ GUI by selecting the three lines at the top of the 
-        desired results view, and then selecting "View Query".
+class IqPageCursor:
+    """Tracks the position of a query that is executed one page at a time.
 
-        Parameters
-        ----------
-        query: dict
-            The Spirent IQ query to execute.
+    This is shared by the synchronous and asynchronous iter_query_pages():
 
-        mode: set
-            Not entirely sure what this does. :-)
+        cursor = IqPageCursor(query, page_size, offset, limit)
+        while not cursor.done:
+            page = execute_query(cursor.get_query())
+            cursor.add_page(page)
 
-        db_id: str
-            The database ID that the query will be executed against. The current DB ID will
-            be used if one is not specified.
+    Parameters
+    ----------
+    query: dict
+        The query definition.
 
-        Returns
-        -------
-        dict
-            Dictionary containing the raw results for the query.
+    page_size: int
+        The maximum number of rows requested per page.
 
-        """
-        
-        full_query = {}
+    offset: int
+        The index of the first row to return.
 
-        full_query["database"] = {}
-        if db_id is None:
-            full_query["database"]["id"] = self.get_session_db_id()
-        else:
-            full_query["database"]["id"] = db_id
-        
-        full_query["mode"] = mode
-        full_query["definition"] = query
+    limit: int
+        The maximum total number of rows to return, or None.
 
-        response = self.__execute("post", "queries", full_query)
+    """
+    def __init__(self, query, page_size=10000, offset=0, limit=None):
+        if not isinstance(page_size, int) or isinstance(page_size, bool) or page_size <= 0:
+            raise ValueError("The page size must be a positive integer.")
 
-        return(response)        
+        self.query = query
+        self.page_size = page_size
+        self.offset = offset
+        self.limit = limit
 
-    def execute_view_query(self, view_name, db_id=None):        
-        """Returns results based on the specified pre-defined query.
+        self.row_total = 0
+        self.previous_rows = None
+        self.request_size = self.get_request_size()
+        self.done = self.request_size <= 0
 
-        By default, queries are located in a JSON file, loaded when this class is instantiated.        
-        
-        Parameters
-        ----------
-        view_name: str
-            The name of the pre-defined query. These queries are stored in the file self.query_definitions_file.
+        return
 
-        db_id: str
-            The database ID that the query will be executed against. The current DB ID will
-            be used if one is not specified.
+    def get_request_size(self):
+        # The number of rows requested for the next page. The last page is shrunk to fit the limit.
+        if self.limit is None:
+            return self.page_size
+        return min(self.page_size, self.limit - self.row_total)
 
-        Returns
-        -------
-        dict
-            Dictionary containing the results for the query.
+    def get_query(self):
+        # Returns the query definition for the next page.
+        return paginate_query(self.query, self.offset, self.request_size)
 
-        """        
-        if db_id is None:
-            db_id = self.get_session_db_id()          
+    def add_page(self, page):
+        # Advance past a page that was returned for get_query(). A RuntimeError is raised
+        # if the server does not appear to support the pagination, rather than paging forever.
+        rows = page["result"].get("rows") or []
+        row_count = len(rows)
 
-        response = None
-        if view_name in self.query_definitions.keys():
-            query = self.query_definitions[view_name]
-            response = self.execute_query(query, db_id=db_id)            
-        else:
-            print("ERROR: The view '" + view_name + "' is not defined. Please use one of the following views:")
-            for view in self.query_definitions.keys():
-                print("  " + view)
+        if row_count > self.request_size:
+            raise RuntimeError("The server returned " + str(row_count) + " rows for a page of " + str(self.request_size) + " rows. The query pagination is not supported.")
 
-        return response
+        # The complete rows (including any timestamps) are compared, since consecutive
+        # samples of a stopped stream may only differ in their timestamps.
+        if rows and rows == self.previous_rows:
+            raise RuntimeError("The server returned the same page at offsets " + str(self.offset - row_count) + " and " + str(self.offset) + ". The query pagination is not supported.")
+        self.previous_rows = rows
 
-    def refresh_database_list(self):
+        self.row_total += row_count
+        self.offset += row_count
 
-        for db in self.db_list:
-            del db
+        if row_count < self.request_size:
+            self.done = True
+        else:
+            self.request_size = self.get_request_size()
+            self.done = self.request_size <= 0
 
-        self.db_list = []
+        return
 
-        all_db_info = self.get_all_db_info(summary=True)
+def get_query_limit(query):
+    # Returns the "limit" of a query definition (e.g. {"single_result": {...}}), or None.
+    for definition in query.values():
+        if isinstance(definition, dict) and definition.get("limit") is not None:
+            return definition["limit"]
+    return None
 
-        for db_info in all_db_info:
-            if "application.name" in db_info["metadata"].keys() and db_info["metadata"]["application.name"] == "TestCenter":
-                db = IqDatabase(self, db_info["id"])
-                self.db_list.append(db)
+def raise_for_response_status(response, extract_json):
+    """Raises a RuntimeError if the HTTP status of a response is not 2xx.
 
+    Parameters
+    ----------
+    response: class
+        The response returned by the transport.
+
+    extract_json: function
+        Decodes the body of the response. The IQ server's error message is used if
+        the body has one.
+
+    """
+    if 200 <= response.status_code < 300:
         return
 
-    def get_session_db_id(self):
-        """Returns the Spirent IQ results database ID for the current session (if there is one).
+    message = "HTTP error " + str(response.status_code)
+    try:
+        body = extract_json(response)
+        message = body.get("message") or body.get("error") or message
+    except Exception:
+        pass
 
-        This only works if the Spirent TestCenter API is loaded, and the STC API class is pointed to by "stc".
+    raise RuntimeError(message)
 
-        Returns
-        -------
-        str
-            Results database ID.
+def parse_query_cost(raw_data):
+    """Returns the estimated cost of a query, from the response to a "cost" mode query.
 
-        """    
+    The format of the response is not documented. The cost (and the estimated number of
+    rows, if there is one) is taken from the first of:
 
-        db_id = None
+    - "cost" (and "rows") values in the response, or in its "result".
+    - A result row, with a column named "cost", "total_cost" or "estimated_cost" (and
+      "rows", "plan_rows" or "estimated_rows").
+    - A PostgreSQL EXPLAIN plan ("Total Cost" and "Plan Rows") in any value of the
+      above (e.g. a "QUERY PLAN" column), which may also be a JSON string.
 
-        try:
-            db_id = self.stc.get("system1.project.testinfo", "ResultDbId") 
-        except:
-            pass
+    Parameters
+    ----------
+    raw_data: dict
+        The result dict returned by the Spirent IQ ReST API.
 
-        return db_id
+    Returns
+    -------
+    dict
+        "cost" is the estimated cost (a float), and "rows" the estimated number of rows
+        (None if it is not known).
 
-    def set_current_db(self, name=None, db_id=None):
-        """Set the current database to the database specified by name or DB ID. 
-        If neither the or db_id are specified, the method will attempt to query
-        the Spirent TestCenter API (if loaded) for the current database.
+    """
+    cost_names = ("cost", "total_cost", "estimated_cost", "Total Cost")
+    row_names = ("rows", "plan_rows", "estimated_rows", "Plan Rows")
 
-        Parameters
-        ----------
-        name: str
-            The name of the database.
+    def find_cost(value):
+        if isinstance(value, str) and value[:1] in ("[", "{"):
+            try:
+                value = json.loads(value)
+            except ValueError:
+                return None
+
+        if isinstance(value, list):
+            for item in value:
+                cost = find_cost(item)
+                if cost:
+                    return cost
+            return None
+
+        if not isinstance(value, dict):
+            return None
+
+        if "Plan" in value:
+            return find_cost(value["Plan"])
+
+        for cost_name in cost_names:
+            if isinstance(value.get(cost_name), (int, float)):
+                rows = None
+                for row_name in row_names:
+                    if isinstance(value.get(row_name), (int, float)):
+                        rows = int(value[row_name])
+                        break
+                return {"cost": float(value[cost_name]), "rows": rows}
+
+        result = value.get("result")
+        if isinstance(result, dict) and result.get("columns"):
+            for row in result.get("rows") or []:
+                cost = find_cost(dict(zip(result["columns"], row)))
+                if cost:
+                    return cost
+
+        # e.g. a "QUERY PLAN" column that holds the EXPLAIN output.
+        for item in value.values():
+            if isinstance(item, (str, list, dict)):
+                cost = find_cost(item)
+                if cost:
+                    return cost
 
-        db_id: str
-            The database ID to be used.
+        return None
 
-        Returns
-        -------
-        class
-            The database object being used.
+    cost = find_cost(raw_data)
+    if not cost:
+        raise ValueError("The query cost could not be found in the response: " + str(raw_data)[:200])
 
-        """
+    return cost
 
-        self.current_db = None
+def merge_query_pages(pages):
+    # Returns a single raw result with the rows of all of the pages.
+    merged = None
+    for page in pages:
+        if merged is None:
+            merged = dict(page)
+            merged["result"] = dict(page["result"])
+            merged["result"]["rows"] = list(page["result"].get("rows") or [])
+        else:
+            merged["result"]["rows"].extend(page["result"].get("rows") or [])
 
-        if db_id is None and name is None:
-            db_id = self.get_session_db_id()
-            self.current_db = self.find_db_by_id(id=db_id)
-        elif db_id:
-            self.current_db = self.find_db_by_id(id=db_id)
-        elif name:
-            self.current_db = self.find_db_by_name(name)
-        
-        return self.current_db
+    return merged
 
-    def find_db_by_id(self, id=None):
-        """Returns the database object that matches the specified database ID.
+#========================================================================================================
+class IqTransport:
+    """Pooled, keep-alive HTTP transport used for all requests to the IQ server.
+
+    A single requests.Session is shared by every call, so the TCP connection to the
+    IQ server is reused instead of being opened for each query.
+
+    Another object may be passed to SpirentTestCenterIQ (or AsyncSpirentTestCenterIQ)
+    in place of this class, if it implements the same methods:
+
+        request(cmdtype, url, payload=None, timeout=None, stream=False)
+            Returns a requests.Response-like object (status_code, raise_for_status(),
+            iter_content() and close() are used).
+        extract_json(response)
+            Returns the decoded JSON body of a response.
+        get_stats()
+            Returns a dict of statistics (see get_transport_stats()).
+        close()
+            Closes the connections.
+        record_response(response, content_size)
+            Optional. Called when a streamed response has been read.
+
+    Parameters
+    ----------
+    pool_size: int
+        The maximum number of connections kept open to each host.
+
+    timeout: float or tuple
+        The default timeout (in seconds) applied to each request. This may also be a
+        (connect, read) tuple. None means wait forever.
+
+    compress_responses: bool
+        If True, gzip or deflate compressed responses are requested from the server
+        (Accept-Encoding), and decompressed as they are received.
+
+    compress_requests: bool
+        If True, request bodies of at least compress_min_bytes are gzip compressed
+        (Content-Encoding). The IQ server must support this.
+
+    compress_min_bytes: int
+        Smaller request bodies are not worth compressing, and are sent as is.
 
-        Parameters
-        ----------
-        id: str
-            The database ID of the desired database.
+    """
+    def __init__(self, pool_size=10, timeout=None, compress_responses=True, compress_requests=False, compress_min_bytes=1024):
 
-        name: str
-            The name of the desired database.
+        self.pool_size = pool_size
+        self.timeout = timeout
 
-        Returns
-        -------
-        class
-            Database object that matches the name. None otherwise.
+        self.compress_responses = compress_responses
+        self.compress_requests = compress_requests
+        self.compress_min_bytes = compress_min_bytes
 
-        """
-        for db in self.db_list:
-            if id and id == db.id:
-                return db
+        # The session (and the requests module) is only created when the first request is sent.
+        self.session = None
+        self.json_is_method = True
 
-        return None
+        # The transport is shared by worker threads, so the counters are protected by a lock.
+        self.lock = threading.Lock()
+        self.request_count = 0
 
-    def find_db_by_name(self, name=None):
-        """Returns the latest database object that matches the specified name.
+        # The bytes sent and received, as transferred (compressed) and uncompressed.
+        self.request_bytes = 0
+        self.request_bytes_uncompressed = 0
+        self.response_bytes = 0
+        self.response_bytes_uncompressed = 0
 
-        WARNING: The current implemenation is probably incorrect. The last_updated
-                 information needs to be updated each time if this method is 
-                 going be accurate.
+        return
+
+    def get_session(self):
+        if self.session is not None:
+            return self.session
+
+        with self.lock:
+            if self.session is None:
+                import requests
+                import requests.adapters
+
+                session = requests.Session()
+                adapter = requests.adapters.HTTPAdapter(pool_connections=self.pool_size, pool_maxsize=self.pool_size)
+                session.mount("http://", adapter)
+                session.mount("https://", adapter)
+
+                if self.compress_responses:
+                    session.headers["Accept-Encoding"] = "gzip, deflate"
+                else:
+                    session.headers["Accept-Encoding"] = "identity"
+
+                # Apparently there is a difference between the json commands for Python 2.6 and 2.7+.
+                # Determine which one to use once, instead of on every response.
+                major_version = re.match(r"\d+", requests.__version__)
+                self.json_is_method = major_version is None or int(major_version.group(0)) >= 1
+
+                self.session = session
+
+        return self.session
+
+    def request(self, cmdtype, url, payload=None, timeout=None, stream=False):
+        """Send a single HTTP request over the pooled session.
 
         Parameters
         ----------
-        id: str
-            The database ID of the desired database.
+        cmdtype: str
+            The HTTP method (get, put, post, delete or head).
 
-        name: str
-            The name of the desired database.
+        url: str
+            The full URL of the request.
+
+        payload: dict
+            The JSON body of the request (only used for post). This may also be the
+            already serialized JSON, as bytes.
+
+        timeout: float or tuple
+            Overrides the default timeout for this request only.
+
+        stream: bool
+            If True, the body is not read until the caller iterates over it. The caller
+            should pass the number of bytes read to record_response() once it is done.
 
         Returns
         -------
         class
-            Database that matches the name. None otherwise.
+            The requests.Response object. Its transfer_stats attribute holds the
+            compressed and uncompressed sizes of the request and response.
 
         """
-        current_db = None
-        db_timestamp = None
+        if timeout is None:
+            timeout = self.timeout
 
-        for db in self.db_list:
-            if db.name == name:
+        cmdtype = cmdtype.lower()
+        if cmdtype not in ("get", "put", "post", "delete", "head"):
+            raise ValueError("The HTTP method '" + cmdtype + "' is not supported.")
 
-                new_db_timestamp = dateutil.parser.parse(db.last_updated)
+        session = self.get_session()
 
-                if not db_timestamp:
-                    db_timestamp = new_db_timestamp
-                    current_db = db
-                elif db_timestamp < new_db_timestamp:
-                    db_timestamp = new_db_timestamp
-                    current_db = db
+        headers = {}
+        body = None
+        body_size = 0
 
-        return current_db
+        if cmdtype == "post":
+            if isinstance(payload, bytes):
+                body = payload
+            else:
+                body = json.dumps(payload).encode()
+            body_size = len(body)
+            headers["Content-Type"] = "application/json"
 
-    def get_all_db_info(self, summary=False):
-        """Returns information about the Spirent IQ results databases.
-        
-        Parameters
-        ----------
-        summary: bool
-            If True, returns only a summary. Otherwise, all of the database information is returned.
-            Also, the information cached this class is updated when set to False.
+            if self.compress_requests and body_size >= self.compress_min_bytes:
+                import gzip
+                body = gzip.compress(body)
+                headers["Content-Encoding"] = "gzip"
 
-        name: str
-            Return only the DB's that match this name (overridden by db_id).
+        response = session.request(cmdtype, url, data=body, headers=headers, timeout=timeout, stream=stream)
 
-        Returns
-        -------
-        list
-            A list of dicts containing the information on the database(s).
+        response.transfer_stats = {}
+        response.transfer_stats["request_bytes"] = len(body) if body else 0
+        response.transfer_stats["request_bytes_uncompressed"] = body_size
+        response.transfer_stats["response_bytes"] = None
+        response.transfer_stats["response_bytes_uncompressed"] = None
+        response.transfer_stats["content_encoding"] = response.headers.get("Content-Encoding")
 
-        """    
+        with self.lock:
+            self.request_count += 1
+            self.request_bytes += response.transfer_stats["request_bytes"]
+            self.request_bytes_uncompressed += body_size
 
-        if summary:
-            result_db_list = self.__execute("get", "databases?detail=summary")
-        else:
-            result_db_list = self.__execute("get", "databases")
+        if not stream:
+            self.record_response(response, len(response.content))
 
-        return(result_db_list) 
+        return response
+
+    def record_response(self, response, content_size):
+        """Record the size of a response body once it has been read.
 
-    def get_db_info(self, db_id=None, summary=True):
-        """Returns information about the specified Spirent IQ results databases.
-        
         Parameters
         ----------
-        db_id: str
-            The database ID to be used. If None, the current DB ID will be used.
+        response: class
+            The requests.Response object returned by request().
+
+        content_size: int
+            The size of the (uncompressed) body.
+
+        """
+        # urllib3 counts the bytes that were actually received, before decompression.
+        transferred_size = content_size
+        if hasattr(response.raw, "tell"):
+            try:
+                transferred_size = response.raw.tell()
+            except Exception:
+                pass
+
+        if hasattr(response, "transfer_stats"):
+            response.transfer_stats["response_bytes"] = transferred_size
+            response.transfer_stats["response_bytes_uncompressed"] = content_size
+
+        with self.lock:
+            self.response_bytes += transferred_size
+            self.response_bytes_uncompressed += content_size
+
+        return
+
+    def extract_json(self, response):
+        if self.json_is_method:
+            return response.json()
+        else:
+            return response.json
+
+    def get_stats(self):
+        """Returns the connection statistics for this transport.
+
+        Returns
+        -------
+        dict
+            "requests" is the number of requests sent, "connections_opened" the number
+            of new TCP connections, and "connections_reused" the number of requests that
+            were sent over an already open connection. The request and response byte
+            counts are given both as transferred and uncompressed.
+
+        """
+        opened = 0
+        pool_requests = 0
+
+        adapters = []
+        if self.session is not None:
+            adapters = set(self.session.adapters.values())
+
+        for adapter in adapters:
+            pools = adapter.poolmanager.pools
+            for key in list(pools.keys()):
+                pool = pools.get(key)
+                if pool is None:
+                    continue
+                opened += pool.num_connections
+                pool_requests += pool.num_requests
+
+        stats = {}
+        stats["requests"] = self.request_count
+        stats["connections_opened"] = opened
+        stats["connections_reused"] = max(pool_requests - opened, 0)
+        stats["request_bytes"] = self.request_bytes
+        stats["request_bytes_uncompressed"] = self.request_bytes_uncompressed
+        stats["response_bytes"] = self.response_bytes
+        stats["response_bytes_uncompressed"] = self.response_bytes_uncompressed
+
+        return stats
+
+    def close(self):
+        if self.session is not None:
+            self.session.close()
+        return
+
+#========================================================================================================
+class IqCatalogCache:
+    """Persistent on-disk cache of the full database information (IqDatabase.info).
+
+    Each database is stored in its own JSON file, named after the database ID. An entry
+    is only used if its "last_updated" value matches the one reported by the IQ server,
+    so a database that has changed is always fetched again. Files are replaced
+    atomically, so the cache may be shared by many processes.
+
+    Parameters
+    ----------
+    path: str
+        The directory used to store the cache files. It is created if necessary.
+
+    """
+    def __init__(self, path):
+        self.path = path
+
+        os.makedirs(self.path, exist_ok=True)
+
+        self.hits = 0
+        self.misses = 0
+
+        return
+
+    def get_filename(self, db_id):
+        return os.path.join(self.path, re.sub(r"[^A-Za-z0-9_.-]", "_", db_id) + ".json")
+
+    def get(self, db_id, last_updated):
+        """Returns the cached database information, or None if it is missing or stale.
+        """
+        db_info = None
+
+        try:
+            with open(self.get_filename(db_id)) as cache_file:
+                db_info = json.load(cache_file)
+        except (OSError, ValueError):
+            db_info = None
+
+        if db_info is None or db_info.get("last_updated") != last_updated:
+            self.misses += 1
+            return None
+
+        self.hits += 1
+
+        return db_info
+
+    def put(self, db_info):
+        """Stores the full database information.
+        """
+        import tempfile
+
+        handle, temp_filename = tempfile.mkstemp(dir=self.path, suffix=".tmp")
+        try:
+            with os.fdopen(handle, "w") as cache_file:
+                json.dump(db_info, cache_file)
+            os.replace(temp_filename, self.get_filename(db_info["id"]))
+        except:
+            if os.path.exists(temp_filename):
+                os.remove(temp_filename)
+            raise
+
+        return
+
+    def delete(self, db_id):
+        try:
+            os.remove(self.get_filename(db_id))
+        except FileNotFoundError:
+            pass
+        return
+
+    def clear(self):
+        for filename in os.listdir(self.path):
+            if filename.endswith(".json"):
+                os.remove(os.path.join(self.path, filename))
+        return
+
+#========================================================================================================
+class IqQueryCache:
+    """In-memory LRU cache of query results.
+
+    Entries are keyed by a canonical serialization of the database ID, mode and query
+    definition. The least recently used entries are evicted when the total size exceeds
+    max_bytes. An entry is discarded when the "last_updated" value of its database
+    changes. Entries for databases that are still running (or unknown) also expire
+    after live_ttl seconds.
+
+    Cached results are shared between callers, and must not be modified.
+
+    Parameters
+    ----------
+    max_bytes: int
+        The memory budget, measured as the size of the results serialized as JSON. The
+        size of a result is estimated from a sample of its rows (see estimate_size()).
+
+    live_ttl: float
+        The number of seconds that the results of a live database are kept.
+
+    """
+    def __init__(self, max_bytes=64 * 1024 * 1024, live_ttl=1.0):
+        self.max_bytes = max_bytes
+        self.live_ttl = live_ttl
+
+        # key => (result, size, last_updated, expires)
+        self.entries = collections.OrderedDict()
+        self.size = 0
+
+        self.lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+        return
+
+    @staticmethod
+    def make_key(db_id, mode, query):
+        # A compiled query is already serialized canonically (with sorted keys).
+        if isinstance(query, IqCompiledQuery):
+            definition_json = query.json.decode()
+        else:
+            definition_json = json.dumps(query, sort_keys=True, separators=(",", ":"))
+
+        return json.dumps([db_id, mode], separators=(",", ":")) + definition_json
+
+    def get(self, key, last_updated=None):
+        """Returns the cached result, or None.
+
+        Parameters
+        ----------
+        key: str
+            The key returned by make_key().
+
+        last_updated: str
+            The current "last_updated" value of the database.
+
+        """
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+
+            result, size, entry_last_updated, expires = entry
+
+            if entry_last_updated != last_updated or (expires is not None and expires < time.monotonic()):
+                self.remove(key)
+                self.invalidations += 1
+                self.misses += 1
+                return None
+
+            self.entries.move_to_end(key)
+            self.hits += 1
+
+            return result
+
+    @staticmethod
+    def estimate_size(result, sample_rows=8):
+        # Returns the approximate size of the result serialized as JSON. Only a few rows
+        # are serialized, so that caching a large result doesn't cost a full encode.
+        rows = None
+        if isinstance(result, dict) and isinstance(result.get("result"), dict):
+            rows = result["result"].get("rows")
+
+        if not rows or len(rows) <= sample_rows:
+            return len(json.dumps(result, separators=(",", ":")))
+
+        step = len(rows) // sample_rows
+        sample = [rows[index * step] for index in range(sample_rows)]
+        sample_size = len(json.dumps(sample, separators=(",", ":")))
+
+        size = len(json.dumps(result["result"].get("columns"), separators=(",", ":"))) + 64
+        size += sample_size * len(rows) // sample_rows
+
+        return size
+
+    def put(self, key, result, last_updated=None, live=False):
+        size = len(key) + IqQueryCache.estimate_size(result)
+        if size > self.max_bytes:
+            return
+
+        expires = None
+        if live:
+            expires = time.monotonic() + self.live_ttl
+
+        with self.lock:
+            if key in self.entries:
+                self.remove(key)
+
+            self.entries[key] = (result, size, last_updated, expires)
+            self.size += size
+
+            while self.size > self.max_bytes:
+                oldest_key = next(iter(self.entries))
+                self.remove(oldest_key)
+                self.evictions += 1
+
+        return
+
+    def remove(self, key):
+        # The caller must hold the lock.
+        entry = self.entries.pop(key)
+        self.size -= entry[1]
+        return
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.size = 0
+        return
+
+    def get_stats(self):
+        stats = {}
+        stats["hits"] = self.hits
+        stats["misses"] = self.misses
+        stats["evictions"] = self.evictions
+        stats["invalidations"] = self.invalidations
+        stats["entries"] = len(self.entries)
+        stats["bytes"] = self.size
+        return stats
+
+#========================================================================================================
+class IqResultWriter:
+    """Writes query results to a CSV or NDJSON file, one page at a time.
+
+    The header is written with the first page. Statistics are available in self.stats
+    once the writer has been closed.
+
+    Parameters
+    ----------
+    filename: str
+        The name of the output file.
+
+    file_format: str
+        Either "csv" or "ndjson" (one JSON object per row, keyed by column name).
+
+    """
+    def __init__(self, filename, file_format="csv"):
+        import csv
+
+        file_format = file_format.lower()
+        if file_format not in ("csv", "ndjson"):
+            raise ValueError("The file format '" + file_format + "' is not supported. Use 'csv' or 'ndjson'.")
+
+        self.filename = filename
+        self.file_format = file_format
+
+        self.result_file = open(filename, mode='w', newline='')
+        self.result_writer = None
+        if file_format == "csv":
+            self.result_writer = csv.writer(self.result_file, delimiter=',', quotechar='"', quoting=csv.QUOTE_MINIMAL)
+
+        self.columns = None
+        self.row_count = 0
+        self.page_count = 0
+        self.start_time = time.time()
+        self.stats = {}
+
+        return
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+        return
+
+    def write_page(self, raw_data):
+        # Write a page of results, as returned by the IQ ReST API (or an IqStreamingResult).
+        self.page_count += 1
+        if isinstance(raw_data, IqStreamingResult):
+            self.write_rows(raw_data.columns, raw_data.rows())
+        else:
+            self.write_rows(raw_data["result"]["columns"], raw_data["result"].get("rows") or [])
+        return
+
+    def write_rows(self, columns, rows):
+        if self.columns is None:
+            self.columns = columns
+            if self.file_format == "csv":
+                self.result_writer.writerow(columns)
+
+        # The rows may be any iterable (e.g. IqStreamingResult.rows()).
+        for row in rows:
+            if self.file_format == "csv":
+                self.result_writer.writerow(row)
+            else:
+                self.result_file.write(json.dumps(dict(zip(columns, row))))
+                self.result_file.write("\n")
+
+            self.row_count += 1
+
+        return
+
+    def close(self):
+        if self.result_file.closed:
+            return self.stats
+
+        self.result_file.close()
+
+        duration = time.time() - self.start_time
+
+        self.stats = {}
+        self.stats["rows"] = self.row_count
+        self.stats["pages"] = self.page_count
+        self.stats["bytes"] = os.path.getsize(self.filename)
+        self.stats["duration"] = duration
+        self.stats["rows_per_second"] = self.row_count / duration if duration > 0 else 0.0
+
+        return self.stats
+
+#========================================================================================================
+class IqMetrics:
+    """Collects the measurements made by the client, and passes them to the sinks.
+
+    Each measurement has a name, a value and a dict of labels. The client records:
+
+        request_seconds      The time taken by each request (until the body is received).
+        request_bytes        The size of each request body, as sent.
+        response_bytes       The size of each response body, as received.
+        json_decode_seconds  The time taken to decode each response.
+        rows_returned        The number of rows returned by each query.
+        method_seconds       The duration of the methods decorated with timeit (e.g. the
+                             result conversions, and StreamLiveResults.refresh()).
+
+    The requests are labelled with "endpoint" (e.g. "queries" or "databases/{id}"),
+    "db_id" and "view" (the view name, for view queries, or the label of a query
+    executed by execute_many()).
+
+    When there are no sinks, nothing is measured.
+
+    Parameters
+    ----------
+    sinks: list
+        The sinks. Each one must have a record(name, value, labels) method.
+
+    """
+    def __init__(self, sinks=None):
+        self.sinks = []
+        self.enabled = False
+
+        for sink in sinks or []:
+            self.add_sink(sink)
+
+        return
+
+    def add_sink(self, sink):
+        self.sinks.append(sink)
+        self.enabled = True
+        return sink
+
+    def remove_sink(self, sink):
+        self.sinks.remove(sink)
+        self.enabled = bool(self.sinks)
+        return
+
+    def record(self, name, value, labels=None):
+        for sink in self.sinks:
+            sink.record(name, value, labels or {})
+        return
+
+    def record_request(self, labels, response, duration, decode_duration=None, result=None):
+        # Record the measurements of one request to the IQ server.
+        self.record("request_seconds", duration, labels)
+
+        transfer_stats = getattr(response, "transfer_stats", None)
+        if transfer_stats:
+            self.record("request_bytes", transfer_stats["request_bytes"], labels)
+            if transfer_stats["response_bytes"] is not None:
+                self.record("response_bytes", transfer_stats["response_bytes"], labels)
+
+        if decode_duration is not None:
+            self.record("json_decode_seconds", decode_duration, labels)
+
+        if isinstance(result, dict) and isinstance(result.get("result"), dict):
+            self.record("rows_returned", len(result["result"].get("rows") or []), labels)
+
+        return
+
+#========================================================================================================
+class IqCallbackSink:
+    """A metrics sink that calls a function with each measurement.
+
+    Parameters
+    ----------
+    callback: function
+        Called as callback(name, value, labels).
+
+    """
+    def __init__(self, callback):
+        self.callback = callback
+        return
+
+    def record(self, name, value, labels):
+        self.callback(name, value, labels)
+        return
+
+#========================================================================================================
+class IqHistogramSink:
+    """A metrics sink that keeps an in-memory histogram of each metric (per set of labels).
+
+    Parameters
+    ----------
+    buckets: dict
+        The upper bounds of the buckets, keyed by metric name. Metrics that end with
+        "_seconds" use default_seconds_buckets by default, and all others use
+        default_buckets.
+
+    """
+    default_seconds_buckets = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+    default_buckets = (1, 10, 100, 1000, 10000, 100000, 1000000, 10000000, 100000000, 1000000000)
+
+    def __init__(self, buckets=None):
+        self.buckets = buckets or {}
+        self.lock = threading.Lock()
+
+        # The histograms, keyed by metric name, and then by the (sorted) label items.
+        self.histograms = {}
+
+        return
+
+    def get_buckets(self, name):
+        if name in self.buckets:
+            return self.buckets[name]
+        if name.endswith("_seconds"):
+            return self.default_seconds_buckets
+        return self.default_buckets
+
+    def record(self, name, value, labels):
+        key = tuple(sorted((label, str(label_value)) for label, label_value in labels.items() if label_value is not None))
+
+        with self.lock:
+            histograms = self.histograms.setdefault(name, {})
+            histogram = histograms.get(key)
+            if histogram is None:
+                histogram = {"count": 0, "sum": 0.0, "min": value, "max": value, "buckets": [0] * len(self.get_buckets(name))}
+                histograms[key] = histogram
+
+            histogram["count"] += 1
+            histogram["sum"] += value
+            histogram["min"] = min(histogram["min"], value)
+            histogram["max"] = max(histogram["max"], value)
+
+            for index, upper_bound in enumerate(self.get_buckets(name)):
+                if value <= upper_bound:
+                    histogram["buckets"][index] += 1
+                    break
+
+        return
+
+    def get_summary(self, name=None):
+        """Returns a summary of the histograms.
+
+        Parameters
+        ----------
+        name: str
+            The name of the metric. If None, all metrics are returned.
+
+        Returns
+        -------
+        list
+            A list of dicts, each with the "name", "labels", "count", "sum", "min",
+            "max", "mean", "p50" and "p99" of one histogram. The percentiles are
+            estimated from the buckets.
+
+        """
+        summary = []
+        with self.lock:
+            for metric_name, histograms in sorted(self.histograms.items()):
+                if name is not None and metric_name != name:
+                    continue
+
+                for key, histogram in histograms.items():
+                    entry = {}
+                    entry["name"] = metric_name
+                    entry["labels"] = dict(key)
+                    entry["count"] = histogram["count"]
+                    entry["sum"] = histogram["sum"]
+                    entry["min"] = histogram["min"]
+                    entry["max"] = histogram["max"]
+                    entry["mean"] = histogram["sum"] / histogram["count"]
+                    entry["p50"] = self.get_quantile(metric_name, histogram, 0.5)
+                    entry["p99"] = self.get_quantile(metric_name, histogram, 0.99)
+                    summary.append(entry)
+
+        return summary
+
+    def get_quantile(self, name, histogram, quantile):
+        # Interpolate linearly within the bucket that holds the quantile.
+        rank = quantile * histogram["count"]
+        lower_bound = 0.0
+        cumulative = 0
+        for upper_bound, count in zip(self.get_buckets(name), histogram["buckets"]):
+            if count and cumulative + count >= rank:
+                lower_bound = max(lower_bound, histogram["min"])
+                upper_bound = min(upper_bound, histogram["max"])
+                return lower_bound + (upper_bound - lower_bound) * (rank - cumulative) / count
+            cumulative += count
+            lower_bound = upper_bound
+
+        # The quantile is above the largest bucket.
+        return histogram["max"]
+
+    def reset(self):
+        with self.lock:
+            self.histograms = {}
+        return
+
+#========================================================================================================
+class IqPrometheusSink(IqHistogramSink):
+    """A histogram sink that can export the metrics in the Prometheus text format.
+
+    Parameters
+    ----------
+    prefix: str
+        Prepended to the name of each metric.
+
+    buckets: dict
+        See IqHistogramSink.
+
+    """
+    def __init__(self, prefix="spirentiq_", buckets=None):
+        super().__init__(buckets=buckets)
+        self.prefix = prefix
+        return
+
+    def get_text(self):
+        """Returns all of the histograms in the Prometheus text exposition format.
+        """
+        lines = []
+        with self.lock:
+            for name, histograms in sorted(self.histograms.items()):
+                metric_name = self.prefix + name
+                lines.append("# TYPE " + metric_name + " histogram")
+
+                for key, histogram in sorted(histograms.items()):
+                    cumulative = 0
+                    for upper_bound, count in zip(self.get_buckets(name), histogram["buckets"]):
+                        cumulative += count
+                        lines.append(metric_name + "_bucket" + self.format_labels(key + (("le", repr(float(upper_bound))),)) + " " + str(cumulative))
+                    lines.append(metric_name + "_bucket" + self.format_labels(key + (("le", "+Inf"),)) + " " + str(histogram["count"]))
+                    lines.append(metric_name + "_sum" + self.format_labels(key) + " " + repr(float(histogram["sum"])))
+                    lines.append(metric_name + "_count" + self.format_labels(key) + " " + str(histogram["count"]))
+
+        return "\n".join(lines) + "\n"
+
+    def format_labels(self, key):
+        if not key:
+            return ""
+        labels = []
+        for label, value in key:
+            value = value.replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n")
+            labels.append(label + '="' + value + '"')
+        return "{" + ",".join(labels) + "}"
+
+    def write_text(self, filename):
+        """Write the metrics to a file (e.g. for the node_exporter textfile collector).
+        The file is replaced atomically.
+        """
+        temp_filename = filename + ".tmp"
+        with open(temp_filename, "w") as metrics_file:
+            metrics_file.write(self.get_text())
+        os.replace(temp_filename, filename)
+        return
+
+#========================================================================================================
+class SpirentTestCenterIQ:
+    def __init__(self, iq_server_ip=None, iq_server_port=9199, verbose=False, log_path=None, log_level="INFO", query_definitions_file=None, stc_api_instance=None,
+                 transport=None, pool_size=10, timeout=None, discovery_workers=8, lazy_discovery=False,
+                 catalog_cache_dir=None, query_cache_bytes=None, query_cache_live_ttl=1.0, discover=True,
+                 compress_requests=False, metrics=None, cost_budget=None, cost_policy="refuse", cost_page_size=10000):
+
+        self.query_definitions = {}        
+
+        # Optional guard against expensive queries (see execute_query()).
+        if cost_policy not in ("refuse", "paginate"):
+            raise ValueError("The cost policy '" + str(cost_policy) + "' is not supported. Use 'refuse' or 'paginate'.")
+        self.cost_budget = cost_budget
+        self.cost_policy = cost_policy
+        self.cost_page_size = cost_page_size
+
+        # The number of databases whose details are fetched concurrently by refresh_database_list().
+        self.discovery_workers = discovery_workers
+        self.discovery_stats = {}
+
+        # When True, the databases only fetch their full details (and build their sets) when first used.
+        self.lazy_discovery = lazy_discovery
+
+        # Optional on-disk cache of the database details, validated against "last_updated".
+        self.catalog_cache = None
+        if catalog_cache_dir:
+            self.catalog_cache = IqCatalogCache(catalog_cache_dir)
+
+        # Optional in-memory cache of the query results (see execute_query()).
+        self.query_cache = None
+        if query_cache_bytes:
+            self.query_cache = IqQueryCache(max_bytes=query_cache_bytes, live_ttl=query_cache_live_ttl)
+
+        # All HTTP requests are sent through the transport. By default this is a pooled
+        # keep-alive session, but the caller may supply their own.
+        if transport is None:
+            transport = IqTransport(pool_size=pool_size, timeout=timeout, compress_requests=compress_requests)
+        self.transport = transport
+
+        # The metrics are only collected once a sink has been added (see IqMetrics).
+        if metrics is None:
+            metrics = IqMetrics()
+        self.metrics = metrics
+
+        if iq_server_ip:
+            self.spirent_iq_rest_api_url = "http://" + iq_server_ip + ":" + str(iq_server_port)
+
+        self.module_path = os.path.dirname(os.path.abspath(__file__))            
+
+        self.load_query_definitions(query_definitions_file)
+
+        self.stc = stc_api_instance        
+
+        self.db_list = []
+        self.current_db = None
+
+        # If discover is False, nothing is sent to the IQ server (or the STC API) until
+        # connect() or refresh_database_list() is called.
+        if discover:
+            self.connect()
+
+        return
+
+    def connect(self):
+        """Enable the IQ results, discover the databases and select the current database.
+        This is done by the constructor, unless discover=False was specified.
+        """
+        self.subscribe()
+
+        self.refresh_database_list()
+
+        self.set_current_db()
+
+        return
+
+    def subscribe(self, retention_duration=15, subscribe_type="ALL", config_subscribe_type="ALL"):
+        """If the Spirent TestCenter API is loaded, this will enable the IQ results.
+
+        Parameters
+        ----------
+        retention_duration: int
+            The number of minutes worth of data that is retained in the database.
+
+        subscribe_type: str
+            Use this argument to control which statistics are stored in the database.
+
+        config_subscribe_type: str
+            Use this argument to control what configuration information is stored in the database.
+
+        """
+        erp = None
+
+        if self.stc:
+            erp = stc.get("system1", "children-spirent.results.EnhancedResultsSelectorProfile")
+            if erp == "":        
+                # This is required in order to enable the enhanced results.
+                # If you don't set the SubscribeType to "ALL", then you must create some EnhancedResultsGroupFilter objects 
+                # for the results you want to have collected.
+                erp = stc.create("spirent.results.EnhancedResultsSelectorProfile", under="system1", 
+                                                                                   SubscribeType=subscribe_type,
+                                                                                   ConfigSubscribeType=config_subscribe_type,
+                                                                                   EnableLiveDataRetention=True,
+                                                                                   LiveDataRetentionInterval=retention_duration)
+
+        return erp
+
+    def get_result_url(self):
+        """Get the URL of the ReST server URL of the Spirent IQ results API.
+
+        Returns
+        -------
+        str
+            Returns the URL of the ReST API.
+        """ 
+
+        if not self.spirent_iq_rest_api_url:
+            self.spirent_iq_rest_api_url = stc.get("system1.TemevaResultsConfig", "ServiceUrl")
+
+        return(self.spirent_iq_rest_api_url)        
+
+    def execute_query(self, query, mode="once", db_id=None, timeout=None, columnar=False, column_types=None, use_cache=True, stream=False,
+                      view_name=None, check_cost=True):
+        """Returns the raw results based on the specified query.
+
+        You may pass the query from the Spirent TestCenter IQ GUI into this method.
+        You can find the query in the IQ GUI by selecting the three lines at the top of the 
+        desired results view, and then selecting "View Query".
+
+        Parameters
+        ----------
+        query: dict
+            The Spirent IQ query to execute. This may also be an IqCompiledQuery object,
+            which is sent without being serialized again.
+
+        mode: str
+            "once" executes the query. "cost" only returns the server's estimate of the
+            cost of the query (see estimate_query_cost()), if the datastore has the
+            "has_cost_query_mode" capability.
+
+        db_id: str
+            The database ID that the query will be executed against. The current DB ID will
+            be used if one is not specified.
+
+        timeout: float
+            The timeout (in seconds) for this query. The transport default is used if
+            not specified.
+
+        columnar: bool
+            If True, the result is returned as an IqColumnarResult object instead of the
+            raw dictionary.
+
+        column_types: dict
+            The IQ type of each column, keyed by column name. Only used when columnar is True.
+
+        use_cache: bool
+            If False, the query result cache (if enabled) is bypassed.
+
+        stream: bool
+            If True, an IqStreamingResult object is returned, which decodes the rows as
+            they arrive. The query result cache is not used, and columnar is ignored.
+
+        view_name: str
+            The name of the view that the query belongs to. This is only used to label
+            the metrics.
+
+        check_cost: bool
+            If a cost budget was specified when this object was created, the cost of the
+            query is estimated first. A query that is over budget is either refused
+            (RuntimeError), or executed in pages of cost_page_size rows (or fewer) that
+            are merged into one result, depending on the cost policy. Streamed queries are
+            always refused. Set to False to skip the check.
+
+        Returns
+        -------
+        dict
+            Dictionary containing the raw results for the query.
+
+        """
+        
+        if db_id is None:
+            db_id = self.get_session_db_id()
+
+        # Cached results are returned before the cost is checked, so that they do not
+        # cost an extra request.
+        cache_context = None
+        response = None
+        if self.query_cache and use_cache and not stream:
+            cache_context = self.get_query_cache_context(query, mode, db_id)
+            response = self.query_cache.get(cache_context["key"], cache_context["last_updated"])
+
+        if response is None:
+            page_size = None
+            if check_cost and mode == "once" and self.cost_budget is not None:
+                page_size = self.check_query_cost(query, db_id=db_id, timeout=timeout, stream=stream)
+
+            labels = None
+            if self.metrics.enabled:
+                labels = self.get_metric_labels("queries", db_id=db_id, view_name=view_name)
+
+            if page_size:
+                definition = self.get_query_definition(query)
+                pages = self.iter_query_pages(definition, page_size=page_size, db_id=db_id, timeout=timeout, limit=get_query_limit(definition))
+                response = merge_query_pages(pages)
+            elif stream:
+                return self.__execute_stream("post", "queries", self.get_query_payload(query, mode, db_id), timeout=timeout, labels=labels)
+            else:
+                response = self.__execute("post", "queries", self.get_query_payload(query, mode, db_id), timeout=timeout, labels=labels)
+
+            if cache_context:
+                self.query_cache.put(cache_context["key"], response, cache_context["last_updated"], cache_context["live"])
+
+        if columnar:
+            response = IqColumnarResult.from_raw(response, column_types)
+
+        return(response)        
+
+    def get_query_payload(self, query, mode, db_id):
+        # Returns the body of the "queries" request. A compiled query is already serialized,
+        # so the body is assembled from bytes instead of encoding the definition again.
+        if isinstance(query, IqCompiledQuery):
+            return b'{"database":{"id":' + json.dumps(db_id).encode() + b'},"mode":' + json.dumps(mode).encode() + b',"definition":' + query.json + b'}'
+
+        full_query = {}
+
+        full_query["database"] = {}
+        full_query["database"]["id"] = db_id
+
+        full_query["mode"] = mode
+        full_query["definition"] = query
+
+        return full_query
+
+    def estimate_query_cost(self, query, db_id=None, timeout=None):
+        """Returns the IQ server's estimate of the cost of the query, without executing it.
+
+        Parameters
+        ----------
+        query: dict
+            The Spirent IQ query (or IqCompiledQuery object).
+
+        db_id: str
+            The database ID that the query will be executed against. The current DB ID will
+            be used if one is not specified.
+
+        timeout: float
+            The timeout (in seconds) for the request.
+
+        Returns
+        -------
+        dict
+            "cost" is the estimated cost, and "rows" the estimated number of rows (None
+            if the server does not provide it). See parse_query_cost().
+
+        """
+        if db_id is None:
+            db_id = self.get_session_db_id()
+
+        if not self.has_cost_query_mode(db_id):
+            raise Exception("The database '" + str(db_id) + "' does not support cost queries (has_cost_query_mode).")
+
+        response = self.execute_query(query, mode="cost", db_id=db_id, timeout=timeout, use_cache=False)
+
+        return parse_query_cost(response)
+
+    def has_cost_query_mode(self, db_id):
+        # Databases without capability information are assumed not to support cost queries.
+        db = self.find_db_by_id(db_id)
+        if db is None or db.capabilities is None:
+            return False
+        return "has_cost_query_mode" in db.capabilities
+
+    def check_query_cost(self, query, db_id=None, timeout=None, stream=False):
+        # Enforce the cost budget. Returns None if the query may be executed as is, or the
+        # page size to use if it must be paginated. Raises a RuntimeError if it is refused.
+        if not self.has_cost_query_mode(db_id):
+            return None
+
+        try:
+            estimate = self.estimate_query_cost(query, db_id=db_id, timeout=timeout)
+        except (RuntimeError, KeyError, ValueError) as error:
+            # The estimate request failed (e.g. with an HTTP error), or the response wasn't understood.
+            estimate = None
+            warnings.warn("The cost of the query is unknown (" + str(error) + "). The query is executed without checking the budget.", RuntimeWarning)
+
+        return self.get_cost_page_size(estimate, db_id=db_id, stream=stream)
+
+    def get_cost_page_size(self, estimate, db_id=None, stream=False):
+        # The budget check of check_query_cost(), shared with the asynchronous client.
+        # An unknown estimate (None) is allowed.
+        if estimate is None:
+            return None
+
+        if self.metrics.enabled:
+            self.metrics.record("query_cost", estimate["cost"], {"db_id": db_id or ""})
+
+        if estimate["cost"] <= self.cost_budget:
+            return None
+
+        message = "The estimated cost of the query (" + str(estimate["cost"]) + ") exceeds the budget (" + str(self.cost_budget) + ")."
+        if self.cost_policy != "paginate" or stream:
+            raise RuntimeError(message)
+
+        # Split the rows so that each page is (roughly) within the budget.
+        page_size = self.cost_page_size
+        if estimate["rows"]:
+            page_count = int(estimate["cost"] // self.cost_budget) + 1
+            page_size = min(page_size, max(estimate["rows"] // page_count, 1))
+
+        return page_size
+
+    def get_query_definition(self, query):
+        # Returns the query definition dict of a query (or IqCompiledQuery object).
+        if isinstance(query, IqCompiledQuery):
+            return query.definition
+        return query
+
+    def get_metric_labels(self, url, db_id=None, view_name=None):
+        # Returns the labels of the metrics for a request. The database ID is taken
+        # out of the URL, so that there is one endpoint label per type of request.
+        parts = url.split("?")[0].split("/")
+
+        endpoint = parts[0]
+        if len(parts) > 1:
+            endpoint += "/{id}"
+            db_id = parts[1]
+
+        labels = {}
+        labels["endpoint"] = endpoint
+        labels["db_id"] = db_id or ""
+        labels["view"] = view_name or ""
+
+        return labels
+
+    def get_query_cache_context(self, query, mode, db_id):
+        # Returns the query cache key, along with the state of the database used to validate it.
+        # Finished databases are cached until their "last_updated" changes. Running (or unknown)
+        # databases also expire after the cache's live TTL.
+        db = self.find_db_by_id(db_id)
+
+        cache_context = {}
+        cache_context["key"] = self.query_cache.make_key(db_id, mode, query)
+        cache_context["last_updated"] = None
+        cache_context["live"] = True
+        if db:
+            cache_context["last_updated"] = db.last_updated
+            cache_context["live"] = str(db.running).lower() == "true"
+
+        return cache_context
+
+    def get_query_cache_stats(self):
+        """Returns the hit/miss/eviction counters of the query result cache (None if disabled).
+        """
+        if not self.query_cache:
+            return None
+        return self.query_cache.get_stats()
+
+    def execute_view_query(self, view_name, db_id=None):        
+        """Returns results based on the specified pre-defined query.
+
+        By default, queries are located in a JSON file, loaded when this class is instantiated.        
+        
+        Parameters
+        ----------
+        view_name: str
+            The name of the pre-defined query. These queries are stored in the file self.query_definitions_file.
+
+        db_id: str
+            The database ID that the query will be executed against. The current DB ID will
+            be used if one is not specified.
+
+        Returns
+        -------
+        dict
+            Dictionary containing the results for the query.
+
+        """        
+        if db_id is None:
+            db_id = self.get_session_db_id()          
+
+        response = None
+        if view_name in self.query_definitions.keys():
+            query = self.query_definitions[view_name]
+            response = self.execute_query(query, db_id=db_id, view_name=view_name)
+        else:
+            print("ERROR: The view '" + view_name + "' is not defined. Please use one of the following views:")
+            for view in self.query_definitions.keys():
+                print("  " + view)
+
+        return response
+
+    def execute_many(self, queries, db_ids=None, max_workers=8, timeout=None, columnar=False, labels=None):
+        """Execute many views and/or queries concurrently.
+
+        A failure in one query does not abort the batch. Its exception is returned
+        in place of the result.
+
+        Parameters
+        ----------
+        queries: list
+            The view names (see execute_view_query()) and/or query definitions (see
+            execute_query()) to execute.
+
+        db_ids: list
+            The database IDs to execute each query against. The current session database
+            is used if not specified.
+
+        max_workers: int
+            The maximum number of queries executed at the same time.
+
+        timeout: float
+            The timeout (in seconds) for each query.
+
+        columnar: bool
+            If True, each result is returned as an IqColumnarResult object.
+
+        labels: list
+            The label of each query, which is used as the "view" label of its metrics.
+            Defaults to the view name, or "query_<index>" for a query definition.
+
+        Returns
+        -------
+        list
+            One dict per query and database, in the same order as the queries (and then
+            db_ids). Each contains "query" (the view name or query), "label", "db_id",
+            "result", "error" (the exception, or None) and "duration" (in seconds).
+
+        """
+        if db_ids is None:
+            db_ids = [self.get_session_db_id()]
+
+        batch = []
+        for query, label in zip(queries, self.get_batch_labels(queries, labels)):
+            for db_id in db_ids:
+                batch.append((query, label, db_id))
+
+        def execute_batch_query(batch_entry):
+            query, label, db_id = batch_entry
+
+            batch_result = {}
+            batch_result["query"] = query
+            batch_result["label"] = label
+            batch_result["db_id"] = db_id
+            batch_result["result"] = None
+            batch_result["error"] = None
+
+            start_time = time.time()
+            try:
+                batch_result["result"] = self.execute_query(self.get_batch_query(query), db_id=db_id, timeout=timeout, columnar=columnar,
+                                                            view_name=label)
+            except Exception as error:
+                batch_result["error"] = error
+            batch_result["duration"] = time.time() - start_time
+
+            return batch_result
+
+        if not batch:
+            return []
+
+        with concurrent.futures.ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(batch)))) as executor:
+            results = list(executor.map(execute_batch_query, batch))
+
+        return results
+
+    @staticmethod
+    def get_batch_labels(queries, labels=None):
+        # Returns the label of each entry passed to execute_many().
+        queries = list(queries)
+        if labels is None:
+            return [query if isinstance(query, str) else "query_" + str(index) for index, query in enumerate(queries)]
+
+        labels = list(labels)
+        if len(labels) != len(queries):
+            raise ValueError("There must be one label per query (" + str(len(queries)) + " queries, " + str(len(labels)) + " labels).")
+        return labels
+
+    def get_batch_query(self, query):
+        # Returns the query definition for an entry passed to execute_many().
+        if isinstance(query, str):
+            if query not in self.query_definitions.keys():
+                raise KeyError("The view '" + query + "' is not defined.")
+            return self.query_definitions[query]
+
+        return query
+
+    def refresh_database_list(self, max_workers=None, lazy=None):
+        """Discover all of the TestCenter results databases on the IQ server.
+
+        The summary list is fetched first, and then the details for each database are
+        fetched concurrently. If a catalog cache is configured, the details of databases
+        that have not changed are read from it instead. The time taken and the number of
+        requests used are stored in self.discovery_stats.
+
+        Parameters
+        ----------
+        max_workers: int
+            The maximum number of concurrent requests. Defaults to the discovery_workers
+            constructor argument.
+
+        lazy: bool
+            If True, the databases are created from the summary list only, and each one
+            fetches its details the first time its sets are used. Defaults to the
+            lazy_discovery constructor argument.
+
+        """
+
+        if max_workers is None:
+            max_workers = self.discovery_workers
+
+        if lazy is None:
+            lazy = self.lazy_discovery
+
+        start_time = time.time()
+
+        for db in self.db_list:
+            del db
+
+        self.db_list = []
+
+        all_db_info = self.get_all_db_info(summary=True)
+
+        db_ids = []
+        summary_info_list = []
+        for db_info in all_db_info:
+            if "application.name" in db_info["metadata"].keys() and db_info["metadata"]["application.name"] == "TestCenter":
+                db_ids.append(db_info["id"])
+                summary_info_list.append(db_info)
+
+        fetch_ids = []
+        cache_hits = 0
+
+        if lazy:
+            for db_info in summary_info_list:
+                db = IqDatabase(self, db_info["id"], summary_info=db_info)
+                self.db_list.append(db)
+
+        elif db_ids:
+            db_info_dict = {}
+            if self.catalog_cache:
+                for summary_info in summary_info_list:
+                    db_info = self.catalog_cache.get(summary_info["id"], summary_info["last_updated"])
+                    if db_info:
+                        db_info_dict[summary_info["id"]] = db_info
+                cache_hits = len(db_info_dict)
+
+            fetch_ids = [db_id for db_id in db_ids if db_id not in db_info_dict]
+
+            if fetch_ids:
+                # Only the HTTP requests are done in parallel. The sets are built in this thread.
+                with concurrent.futures.ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(fetch_ids)))) as executor:
+                    db_info_list = list(executor.map(lambda db_id: self.get_db_info(db_id=db_id, summary=False), fetch_ids))
+
+                for db_id, db_info in zip(fetch_ids, db_info_list):
+                    db_info_dict[db_id] = db_info
+                    if self.catalog_cache:
+                        self.catalog_cache.put(db_info)
+
+            for db_id in db_ids:
+                db = IqDatabase(self, db_id, db_info=db_info_dict[db_id])
+                self.db_list.append(db)
+
+        self.discovery_stats = {}
+        self.discovery_stats["databases"] = len(self.db_list)
+        self.discovery_stats["requests"] = 1 + len(fetch_ids)
+        self.discovery_stats["cache_hits"] = cache_hits
+        self.discovery_stats["duration"] = time.time() - start_time
+
+        return
+
+    def get_session_db_id(self):
+        """Returns the Spirent IQ results database ID for the current session (if there is one).
+
+        This only works if the Spirent TestCenter API is loaded, and the STC API class is pointed to by "stc".
+
+        Returns
+        -------
+        str
+            Results database ID.
+
+        """    
+
+        db_id = None
+
+        try:
+            db_id = self.stc.get("system1.project.testinfo", "ResultDbId") 
+        except:
+            pass
+
+        return db_id
+
+    def set_current_db(self, name=None, db_id=None):
+        """Set the current database to the database specified by name or DB ID. 
+        If neither the or db_id are specified, the method will attempt to query
+        the Spirent TestCenter API (if loaded) for the current database.
+
+        Parameters
+        ----------
+        name: str
+            The name of the database.
+
+        db_id: str
+            The database ID to be used.
+
+        Returns
+        -------
+        class
+            The database object being used.
+
+        """
+
+        self.current_db = None
+
+        if db_id is None and name is None:
+            db_id = self.get_session_db_id()
+            self.current_db = self.find_db_by_id(id=db_id)
+        elif db_id:
+            self.current_db = self.find_db_by_id(id=db_id)
+        elif name:
+            self.current_db = self.find_db_by_name(name)
+        
+        return self.current_db
+
+    def find_db_by_id(self, id=None):
+        """Returns the database object that matches the specified database ID.
+
+        Parameters
+        ----------
+        id: str
+            The database ID of the desired database.
+
+        name: str
+            The name of the desired database.
+
+        Returns
+        -------
+        class
+            Database object that matches the name. None otherwise.
+
+        """
+        for db in self.db_list:
+            if id and id == db.id:
+                return db
+
+        return None
+
+    def find_db_by_name(self, name=None):
+        """Returns the latest database object that matches the specified name.
+
+        WARNING: The current implemenation is probably incorrect. The last_updated
+                 information needs to be updated each time if this method is 
+                 going be accurate.
+
+        Parameters
+        ----------
+        id: str
+            The database ID of the desired database.
+
+        name: str
+            The name of the desired database.
+
+        Returns
+        -------
+        class
+            Database that matches the name. None otherwise.
+
+        """
+        import dateutil.parser
+
+        current_db = None
+        db_timestamp = None
+
+        for db in self.db_list:
+            if db.name == name:
+
+                new_db_timestamp = dateutil.parser.parse(db.last_updated)
+
+                if not db_timestamp:
+                    db_timestamp = new_db_timestamp
+                    current_db = db
+                elif db_timestamp < new_db_timestamp:
+                    db_timestamp = new_db_timestamp
+                    current_db = db
+
+        return current_db
+
+    def get_all_db_info(self, summary=False):
+        """Returns information about the Spirent IQ results databases.
+        
+        Parameters
+        ----------
+        summary: bool
+            If True, returns only a summary. Otherwise, all of the database information is returned.
+            Also, the information cached this class is updated when set to False.
+
+        name: str
+            Return only the DB's that match this name (overridden by db_id).
+
+        Returns
+        -------
+        list
+            A list of dicts containing the information on the database(s).
+
+        """    
+
+        if summary:
+            result_db_list = self.__execute("get", "databases?detail=summary")
+        else:
+            result_db_list = self.__execute("get", "databases")
+
+        return(result_db_list) 
+
+    def get_db_info(self, db_id=None, summary=True):
+        """Returns information about the specified Spirent IQ results databases.
+        
+        Parameters
+        ----------
+        db_id: str
+            The database ID to be used. If None, the current DB ID will be used.
 
         summary: bool
             If True, returns only a summary. Otherwise, all of the database information is returned.
@@ -463,7 +2012,8 @@ class SpirentTestCenterIQ:
         return(db_info) 
 
     #==============================================================================
-    def convert_result_to_dict(self, raw_data, key_names=None):
+    @timeit
+    def convert_result_to_dict(self, raw_data, key_names=None, flat=False, share_rows=False):
         """Convert the raw result, returned from the API, into a proper dictionary.
         If the key_name is not specified, then the key will be the row index (starting
         at 1).
@@ -477,6 +2027,14 @@ class SpirentTestCenterIQ:
             A list of column names to use as the keys for the returned dictionary.
             A simple integer is used if not specified.
 
+        flat: bool
+            If True (and key_names is specified), the dictionary is keyed by a tuple
+            of the key values, instead of being nested one level per key.
+
+        share_rows: bool
+            If True, each entry is the row list from raw_data, instead of a new
+            dictionary of column to value.
+
         Returns
         -------
         dict
@@ -484,43 +2042,34 @@ class SpirentTestCenterIQ:
 
         """        
 
+        if isinstance(raw_data, IqColumnarResult):
+            return raw_data.to_dict(key_names, flat=flat, share_rows=share_rows)
+
+        if isinstance(raw_data, IqStreamingResult):
+            columns = raw_data.columns
+            rows = raw_data.rows()
+        else:
+            columns = raw_data["result"]["columns"]
+            rows = raw_data["result"].get("rows")
+
         if key_names:
-            for key in key_names:
-                if key not in raw_data["result"]["columns"]:
-                    raise KeyError("The key '" + key + "' is not a valid value.")
+            # The user has specified which keys they want to use for the resulting dictionary.
+            return build_keyed_index(columns, rows, key_names, flat=flat, share_rows=share_rows)
 
         row_index = 0
         result_dict = {}
-        if "rows" in raw_data["result"] and raw_data["result"]["rows"]:
-            for row in raw_data["result"]["rows"]:
-                entry = {}
-                column_index = 0
-                for column in raw_data["result"]["columns"]:
-                    entry[column] = row[column_index]
-                    column_index += 1                    
-                
-                if key_names:
-                    # The user has specified which keys they want to use for the resulting dictionary.
-                    # Construct the dictionary with the specified keys, and add the data for this row.
-                    new_dict = current = {}
-                    for key in key_names:
-                        new_dict = current = {}
-                        for name in key_names:
-                            key_value = entry[name]
-                            current[key_value] = {}
-                            if name == key_names[-1]:
-                                current[key_value] = entry
-                            current = current[key_value]
-
-                    # Merge the new_dict into result_dict.
-                    deepupdate(result_dict, new_dict)
+        if rows:
+            for row in rows:
+                row_index += 1
+                if share_rows:
+                    result_dict[row_index] = row
                 else:
-                    row_index += 1
-                    result_dict[row_index] = entry
+                    result_dict[row_index] = dict(zip(columns, row))
 
         return result_dict
 
     #==============================================================================
+    @timeit
     def convert_result_to_csv(self, raw_data, filename="results.csv"):
         """Convert the raw result, returned from the API, into a CSV file.
 
@@ -529,21 +2078,175 @@ class SpirentTestCenterIQ:
         raw_data: dict
             The result dict returned by the Spirent IQ ReST API.
 
-        filename: str
-            The name of the file to store the results CSV.
+        filename: str
+            The name of the file to store the results CSV.
+
+        """  
+
+        import csv
+
+        if isinstance(raw_data, IqColumnarResult):
+            raw_data = raw_data.to_raw()
+
+        with open(filename, mode='w') as result_file:
+            result_writer = csv.writer(result_file, delimiter=',', quotechar='"', quoting=csv.QUOTE_MINIMAL)
+
+            if isinstance(raw_data, IqStreamingResult):
+                # The rows are written as they are received.
+                result_writer.writerow(raw_data.columns)
+                for row in raw_data.rows():
+                    result_writer.writerow(row)
+                return
+
+            result_writer.writerow(raw_data["result"]["columns"])
+
+            if "rows" in raw_data["result"] and raw_data["result"]["rows"]:
+                for row in raw_data["result"]["rows"]:
+                    result_writer.writerow(row)        
+
+        return
+
+    #==============================================================================
+    def iter_query_pages(self, query, page_size=10000, db_id=None, timeout=None, offset=0, limit=None):
+        """Execute the query one page at a time, yielding the raw result of each page.
+
+        The pages are requested using the query's pagination, so only one page is held
+        in memory at a time. The query should have an order, so that the pages are stable.
+
+        The pagination format is assumed to be {"offset": ..., "limit": ...} (see
+        paginate_query()). If the server returns more rows than were requested, or the
+        same page twice, it is not honoring the pagination and a RuntimeError is raised.
+
+        Parameters
+        ----------
+        query: dict
+            The Spirent IQ query to execute.
+
+        page_size: int
+            The maximum number of rows requested per page.
+
+        db_id: str
+            The database ID that the query will be executed against.
+
+        timeout: float
+            The timeout (in seconds) for each page.
+
+        offset: int
+            The index of the first row to return.
+
+        limit: int
+            The maximum total number of rows to return. The last page is shrunk to fit.
+
+        Returns
+        -------
+        generator
+            Yields the raw result dict for each page. The last page has fewer than
+            page_size rows.
+
+        """
+        cursor = IqPageCursor(query, page_size, offset=offset, limit=limit)
+
+        # The pages are bounded, so their cost is not checked.
+        while not cursor.done:
+            page = self.execute_query(cursor.get_query(), db_id=db_id, timeout=timeout, check_cost=False)
+            cursor.add_page(page)
+
+            yield page
+
+        return
+
+    def export_query(self, query, filename, file_format="csv", page_size=10000, db_id=None, timeout=None):
+        """Execute the query page by page, and write the rows to a CSV or NDJSON file as they arrive.
+
+        Unlike convert_result_to_csv(), the complete result is never held in memory.
+
+        Parameters
+        ----------
+        query: dict
+            The Spirent IQ query to execute.
+
+        filename: str
+            The name of the output file.
+
+        file_format: str
+            Either "csv" or "ndjson" (one JSON object per row, keyed by column name).
+
+        page_size: int
+            The maximum number of rows requested per page.
+
+        db_id: str
+            The database ID that the query will be executed against.
+
+        timeout: float
+            The timeout (in seconds) for each page.
+
+        Returns
+        -------
+        dict
+            Export statistics: "rows", "pages", "bytes", "duration" (in seconds) and "rows_per_second".
+
+        """
+        with IqResultWriter(filename, file_format) as result_writer:
+            for page in self.iter_query_pages(query, page_size=page_size, db_id=db_id, timeout=timeout):
+                result_writer.write_page(page)
+
+        return result_writer.stats
+
+    def export_view_query(self, view_name, filename, file_format="csv", page_size=10000, db_id=None, timeout=None):
+        """Export the results of a pre-defined query to a file. See export_query().
+        """
+        query = self.get_view_definition(view_name)
+
+        if db_id is None:
+            db_id = self.get_session_db_id()
+
+        return self.export_query(query, filename, file_format=file_format, page_size=page_size, db_id=db_id, timeout=timeout)
+
+    def export_snapshot(self, query, filename, db_id=None, timeout=None, column_types=None):
+        """Execute the query, and save the result to a memory-mappable snapshot file.
+
+        Other processes can then open the snapshot with IqResultSnapshot(filename),
+        instead of executing the query again.
+
+        Parameters
+        ----------
+        query: dict
+            The Spirent IQ query (or IqCompiledQuery object) to execute.
+
+        filename: str
+            The name of the snapshot file.
+
+        db_id: str
+            The database ID that the query will be executed against. The current DB ID will
+            be used if one is not specified.
+
+        timeout: float
+            The timeout (in seconds) for the query.
 
-        """  
+        column_types: dict
+            The IQ type of each column, keyed by column name. See IqResultSnapshot.save().
 
-        with open(filename, mode='w') as result_file:
-            result_writer = csv.writer(result_file, delimiter=',', quotechar='"', quoting=csv.QUOTE_MINIMAL)
+        Returns
+        -------
+        class
+            The opened IqResultSnapshot object.
 
-            result_writer.writerow(raw_data["result"]["columns"])
+        """
+        raw_data = self.execute_query(query, db_id=db_id, timeout=timeout)
 
-            if "rows" in raw_data["result"] and raw_data["result"]["rows"]:
-                for row in raw_data["result"]["rows"]:
-                    result_writer.writerow(row)        
+        return IqResultSnapshot.save(raw_data, filename, column_types=column_types)
 
-        return
+    def export_view_snapshot(self, view_name, filename, db_id=None, timeout=None, column_types=None):
+        """Save the results of a pre-defined query to a snapshot file. See export_snapshot().
+        """
+        query = self.get_view_definition(view_name)
+
+        if db_id is None:
+            db_id = self.get_session_db_id()
+
+        raw_data = self.execute_query(query, db_id=db_id, timeout=timeout, view_name=view_name)
+
+        return IqResultSnapshot.save(raw_data, filename, column_types=column_types)
 
     #==============================================================================
     def from_iso_format(self, timestamp):
@@ -558,65 +2261,100 @@ class SpirentTestCenterIQ:
         return timestamp.strftime("%Y-%m-%dT%H:%M:%S.%fZ")        
 
     #==============================================================================
-    def __execute(self, cmdtype, url, payload=None):
+    def get_transport_stats(self):
+        """Returns the connection statistics (opened vs reused) and the byte counts
+        (compressed vs uncompressed) of the HTTP transport.
+        """
+        return self.transport.get_stats()
+
+    def close(self):
+        """Close all pooled connections to the IQ server.
+        """
+        self.transport.close()
+        return
+
+    #==============================================================================
+    def __execute(self, cmdtype, url, payload=None, timeout=None, labels=None):
         """Construct the URL...
         Be sure to escape all invalid characters first.        
         """
 
+        metrics_enabled = self.metrics.enabled
+        if metrics_enabled:
+            if labels is None:
+                labels = self.get_metric_labels(url)
+            start_time = time.perf_counter()
+
         #url = requests.utils.quote(url)
         url = "".join(self.get_result_url() + "/" + url)
 
         # Send the command to the REST server.
-        if cmdtype.lower() == "get":
-            #response = requests.get(url, headers={"X-STC-API-Session": self.sessionid})
-            #response = requests.get(get_result_url(), headers=get_header(), json=query_data)
-            response = requests.get(url)
-        elif cmdtype.lower() == "put":
-            response = requests.put(url)
-        elif cmdtype.lower() == "post":
-            response = requests.post(url, json=payload)
-        elif cmdtype.lower() == "delete":
-            response = requests.delete(url)
-        elif cmdtype.lower() == "head":
-            response = requests.head(url)    
-
-        # Check for exceptions.
-        # We want to only raise the BLL-related exceptions, not the HTTP exception that 
-        # is generated by the "requests" module.
-        try:
-            response.raise_for_status()
-        except:
-            try:    
-                responsedata = self.__extract_json(response)
+        response = self.transport.request(cmdtype, url, payload, timeout=timeout)
 
-                #raise RuntimeError(responsedata['message']) from None
-                raise RuntimeError(responsedata['message'])
-            except:
-                pass
+        # Raise the IQ server's error message (if there is one), rather than the HTTP
+        # exception that is generated by the "requests" module.
+        raise_for_response_status(response, self.transport.extract_json)
+
+        if metrics_enabled:
+            decode_time = time.perf_counter()
+            result = self.__extract_json(response)
+            self.metrics.record_request(labels, response, decode_time - start_time, time.perf_counter() - decode_time, result)
+            return(result)
 
         return(self.__extract_json(response))                
 
-        # Some valid responses do not have a JSON response (like the HEAD command).
+    def __execute_stream(self, cmdtype, url, payload=None, timeout=None, chunk_size=65536, labels=None):
+        # Like __execute(), but the response body is decoded incrementally.
+        metrics_enabled = self.metrics.enabled
+        if metrics_enabled:
+            if labels is None:
+                labels = self.get_metric_labels(url)
+            start_time = time.perf_counter()
+
+        url = "".join(self.get_result_url() + "/" + url)
+
+        response = self.transport.request(cmdtype, url, payload, timeout=timeout, stream=True)
+
         try:
-            # Try to return the JSON response.
-            return(self.__extract_json(response))
-        except:
-            # The response was not JSON. Just return the HTTP status code.
-            return(response.status_code)    
+            raise_for_response_status(response, self.transport.extract_json)
+        except RuntimeError:
+            response.close()
+            raise
 
-    def __extract_json(self, response):
-        # Apparently there is a difference between the json commands for Python 2.6 and 2.7+.
-        # Use this function to take care of the difference.
+        if metrics_enabled:
+            # Only the time until the headers were received is known at this point.
+            self.metrics.record_request(labels, response, time.perf_counter() - start_time)
 
-        version = pkg_resources.get_distribution("requests").version
+        def on_close(result):
+            if hasattr(self.transport, "record_response"):
+                self.transport.record_response(response, result.bytes_read)
+            if metrics_enabled:
+                self.metrics.record("response_bytes", result.bytes_read, labels)
+                self.metrics.record("rows_returned", result.row_count, labels)
+            return
 
-        if LooseVersion(version) < LooseVersion("1.0"):
-            result = response.json
-        else:
-            result = response.json()
+        return IqStreamingResult(response.iter_content(chunk_size=chunk_size), response, on_close=on_close)
 
-        return(result)                
+    def __extract_json(self, response):
+        return(self.transport.extract_json(response))
     
+    def load_query_definitions(self, query_definitions_file=None):
+        # Load the pre-defined queries (views). The file that is included with this module
+        # is used if one is not specified. Missing files are ignored.
+        if not query_definitions_file:
+            query_definitions_file = os.path.join(self.module_path, "spirent_iq_query_definitions.json")
+
+        if os.path.isfile(query_definitions_file):
+            self.__load_json_from_file(query_definitions_file)
+
+        return
+
+    def get_view_definition(self, view_name):
+        # Returns the definition of a pre-defined query, or raises a KeyError.
+        if view_name not in self.query_definitions.keys():
+            raise KeyError("The view '" + view_name + "' is not defined.")
+        return self.query_definitions[view_name]
+
     def __load_json_from_file(self, input_filename):        
 
         # Open and read the JSON input file.        
@@ -626,7 +2364,7 @@ class SpirentTestCenterIQ:
                 with open(input_filename) as json_file:
                     self.query_definitions = json.load(json_file)
             except:
-                errmsg = "Unexpected error while parsing the JSON definition file:" + sys.exc_info()[1]
+                errmsg = "Unexpected error while parsing the JSON definition file:" + str(sys.exc_info()[1])
                 print("ERROR: " + errmsg)
                 raise Exception(errmsg)
 
@@ -634,29 +2372,82 @@ class SpirentTestCenterIQ:
 
 #========================================================================================================
 class IqDatabase:
-    def __init__(self, iq, db_id):
+    # These attributes are only available once the full database details have been
+    # fetched. For a lazy database, accessing any of them triggers the fetch.
+    lazy_attributes = ("info", "set_list", "result_set_list", "dimension_set_list")
+
+    def __init__(self, iq, db_id, db_info=None, summary_info=None):
         self.iq = iq
         self.db_id = db_id
 
         # This refers to the profile used by the UI when opening the database.
         self.profile_id = None
 
-        self.refresh()
+        self.loaded = False
+
+        # The caller may pass in the database information if it has already been fetched.
+        # If only the summary information is passed in, the rest is loaded on demand.
+        if db_info:
+            self.populate(db_info)
+        elif summary_info:
+            self.populate_summary(summary_info)
+        else:
+            self.refresh()
 
         return
 
+    def __getattr__(self, name):
+        # Only called when the attribute does not exist (i.e. the database has not been loaded).
+        if name in IqDatabase.lazy_attributes and not self.__dict__.get("loaded", True):
+            self.load()
+            return getattr(self, name)
+
+        raise AttributeError("'" + type(self).__name__ + "' object has no attribute '" + name + "'")
+
     def refresh(self):
         # Populate all of the database information for the IQ server.
         db_info = self.iq.get_db_info(db_id=self.db_id, summary=False)
-        
-        self.info = db_info
-        
+
+        if self.iq.catalog_cache:
+            self.iq.catalog_cache.put(db_info)
+
+        self.populate(db_info)
+
+        return
+
+    def load(self):
+        # Populate the database information for a lazy database, using the catalog cache if possible.
+        db_info = None
+        if self.iq.catalog_cache:
+            db_info = self.iq.catalog_cache.get(self.db_id, self.last_updated)
+
+        if db_info:
+            self.populate(db_info)
+        else:
+            self.refresh()
+
+        return
+
+    def populate_summary(self, db_info):
+        # Only set the attributes that are available in the summary information.
         self.id = db_info["id"]
         self.name = db_info["name"]
         self.first_create = db_info["first_created"]
         self.last_updated = db_info["last_updated"]
         self.running = db_info["metadata"].get("test.running", False)
 
+        # None if the datastore information is not available.
+        self.capabilities = db_info.get("datastore", {}).get("capabilities")
+
+        return
+
+    def populate(self, db_info):
+        # Build the database attributes and sets from the (full) database information.
+        self.info = db_info
+        self.loaded = True
+
+        self.populate_summary(db_info)
+
         self.set_list = []
         self.result_set_list = []
         self.dimension_set_list = []
@@ -734,6 +2525,11 @@ class IqDatabase:
 
         return snapshots
 
+    def has_capability(self, capability):
+        """Returns True if the datastore has the specified capability (e.g. "has_cost_query_mode").
+        """
+        return capability in (self.capabilities or [])
+
     def find_set_by_name(self, name):        
         for iq_set in self.set_list:
             if iq_set.name == name:
@@ -795,22 +2591,69 @@ class IqSet:
         alias = self.name + "_" + column      
         return alias    
 
-    def get_columns_info(self):
+    def get_columns_info(self, latest=False, columns=None):
         # Return a dictionary with the projection query, as well as a list
-        # of aliases used.
+        # of aliases used. If columns is specified, only those columns are included
+        # (see resolve_columns()).
+
+        if columns is None:
+            selected_columns = [(self, column) for column in self.column_list]
+        else:
+            selected_columns = self.resolve_columns(columns)
 
         column_info = {}
         column_info["projections"] = []
         column_info["column_alias_list"] = []
-        for column in self.column_list:
-            full_column = self.get_full_column_name(column)
-            alias = self.get_column_alias(column)            
+        column_info["column_types"] = {}
+        for iq_set, column in selected_columns:
+            full_column = iq_set.get_full_column_name(column)
+            alias = iq_set.get_column_alias(column)            
 
             column_info["projections"].append(full_column + " AS " + alias)
             column_info["column_alias_list"].append(alias)
+            column_info["column_types"][alias] = iq_set.column_info[column].get("type")
 
         return column_info
 
+    def get_column_lookup(self):
+        # Returns the (set, column) of each column, keyed by each of the names it may be
+        # selected by: the column name, its alias and its full name.
+        lookup = {}
+        for column in self.column_list:
+            for name in (column, self.get_column_alias(column), self.name + "." + column):
+                lookup.setdefault(name, (self, column))
+        return lookup
+
+    def resolve_columns(self, columns):
+        """Returns the (set, column) tuples for the specified column names.
+
+        Parameters
+        ----------
+        columns: list
+            The names of the columns. Each may be the column name (e.g. "frame_count"),
+            its alias (e.g. "tx_stream_live_stats_frame_count") or its full name (e.g.
+            "tx_stream_live_stats.frame_count"). For a result set, the attributes of its
+            dimension sets may be selected by alias (e.g. "port_name") or full name
+            (e.g. "port.name").
+
+        Returns
+        -------
+        list
+            A list of (IqSet, column name) tuples, in the order specified. Duplicates
+            are removed.
+
+        """
+        lookup = self.get_column_lookup()
+
+        selected_columns = []
+        for name in columns:
+            if name not in lookup:
+                raise Exception("The column '" + name + "' was not found in '" + self.name + "'.")
+            if lookup[name] not in selected_columns:
+                selected_columns.append(lookup[name])
+
+        return selected_columns
+
     def get_column_type(self, column_name):
         if column_name not in self.column_info.keys():
             raise Exception("The column '" + column_name + "' was not found.")        
@@ -864,26 +2707,43 @@ class IqResultSet(IqSet):
 
         return full_column        
 
-    def get_columns_info(self, latest=False):        
+    def get_columns_info(self, latest=False, columns=None):        
+        # By default, all of the facts are included, along with the attributes of all of
+        # the dimension sets. If columns is specified, only those columns are included.
+
+        if columns is None:
+            selected_columns = [(self, column) for column in self.column_list]
+            for dimension_set in self.dimension_sets:
+                selected_columns += [(dimension_set, column) for column in dimension_set.column_list]
+        else:
+            selected_columns = self.resolve_columns(columns)
 
         column_info = {}
         column_info["projections"] = []
         column_info["column_alias_list"] = []
-        for column in self.column_list:
-            full_column = self.get_full_column_name(column, latest)
-            alias = self.get_column_alias(column)            
+        column_info["column_types"] = {}
+        for iq_set, column in selected_columns:
+            if iq_set is self:
+                full_column = self.get_full_column_name(column, latest)
+            else:
+                full_column = iq_set.get_full_column_name(column)
+            alias = iq_set.get_column_alias(column)            
 
             column_info["projections"].append(full_column + " AS " + alias)
             column_info["column_alias_list"].append(alias)
+            column_info["column_types"][alias] = iq_set.column_info[column].get("type")
 
+        return column_info
+
+    def get_column_lookup(self):
+        # The dimension attributes may only be selected by alias or full name, since
+        # their column names are not unique (e.g. "name").
+        lookup = super().get_column_lookup()
         for dimension_set in self.dimension_sets:
             for column in dimension_set.column_list:
-                full_column = dimension_set.get_full_column_name(column)
-                alias = dimension_set.get_column_alias(column)
-                column_info["projections"].append(full_column + " AS " + alias)
-                column_info["column_alias_list"].append(alias)        
-
-        return column_info
+                for name in (dimension_set.get_column_alias(column), dimension_set.name + "." + column):
+                    lookup.setdefault(name, (dimension_set, column))
+        return lookup
 
 #========================================================================================================
 class IqDimensionSet(IqSet):
@@ -911,143 +2771,508 @@ class IqQuery:
         self.timestamp_range = {}
         self.limit = None
         self.pagination = None
+
+        # The compiled query definitions (keyed by the "latest" flag). The add_* and delete_*
+        # methods invalidate them. If the attributes above are modified directly, call invalidate().
+        self.compiled = {}
+        self.version = 0
        
         return    
 
-    def execute(self):
-        query = self.get_query()
-        result = self.db.iq.execute_query(query, db_id=self.db.id)
+    def execute(self, columnar=False):
+        query = self.compile()
+        result = self.db.iq.execute_query(query, db_id=self.db.id, columnar=columnar, column_types=self.get_column_types())
         return result
 
-    def get_query(self):
+    def estimate_cost(self, latest=False):
+        """Returns the IQ server's estimate of the cost of this query, without executing it.
+        See SpirentTestCenterIQ.estimate_query_cost().
+        """
+        return self.db.iq.estimate_query_cost(self.compile(latest), db_id=self.db.id)
+
+    def invalidate(self):
+        # Discard the compiled query definitions.
+        self.compiled = {}
+        self.version += 1
+        return
+
+    def get_version(self):
+        # Changes whenever the query (or one of its subqueries) is modified.
+        return self.version
+
+    def compile(self, latest=False):
+        """Returns the compiled (and serialized) query definition.
+
+        The definition is only built the first time, and is then reused until the query
+        is modified.
+
+        Returns
+        -------
+        class
+            The IqCompiledQuery object, which can be passed to SpirentTestCenterIQ.execute_query().
+
+        """
+        version = self.get_version()
+
+        compiled_query = self.compiled.get(latest)
+        if compiled_query is None or compiled_query.version != version:
+            compiled_query = IqCompiledQuery(self.build_definition(latest), version)
+            self.compiled[latest] = compiled_query
+
+        return compiled_query
+
+    def build_definition(self, latest=False):
+        # Build the query definition, as passed to SpirentTestCenterIQ.execute_query().
+        return self.build_query(latest)
+
+    def get_definition(self, latest=False):
+        # Returns (a copy of) the query definition, as passed to SpirentTestCenterIQ.execute_query().
+        return copy.deepcopy(self.compile(latest).definition)
+
+    def iter_pages(self, page_size=10000, latest=False, columnar=False):
+        """Execute the query one page at a time, using the server-side pagination.
+
+        The pages are only requested as they are consumed, so large results can be
+        processed with bounded memory. If a pagination offset has been set with
+        add_pagination(), the first page starts at that offset. The limit set with
+        add_limit() still applies to the total number of rows.
+
+        Parameters
+        ----------
+        page_size: int
+            The maximum number of rows per page.
+
+        latest: bool
+            If True, only the latest values of the facts are returned.
+
+        columnar: bool
+            If True, each page is returned as an IqColumnarResult object.
+
+        Returns
+        -------
+        generator
+            Yields the result of each page.
+
+        """
+        offset = 0
+        if self.pagination:
+            offset = self.pagination.get("offset", 0)
+
+        column_types = self.get_column_types()
+
+        for page in self.db.iq.iter_query_pages(self.compile(latest).definition, page_size=page_size, db_id=self.db.id, offset=offset, limit=self.limit):
+            if columnar:
+                page = IqColumnarResult.from_raw(page, column_types)
+            yield page
+
+        return
+
+    def iter_rows(self, page_size=10000, latest=False):
+        # Yield the rows of the result one at a time (as lists), fetching the pages as required.
+        for page in self.iter_pages(page_size=page_size, latest=latest):
+            for row in page["result"].get("rows") or []:
+                yield row
+
+        return
+
+    def get_column_types(self):
+        # Returns the IQ type of each column (by alias). Unknown for a generic query.
+        return {}
+
+    def get_query(self, latest=False):
+        # Returns (a copy of) the query. The query is only rebuilt if it has been modified.
+        return copy.deepcopy(self.compile(latest).definition)
+
+    def build_query(self, latest=False):
 
         query = {}
         query["alias"] = self.name        
-        query["filters"] = self.filters
-        query["groups"] = self.groups
-        query["orders"] = self.orders
-        query["timestamp_range"] = self.timestamp_range
+        query["filters"] = list(self.filters)
+        query["groups"] = list(self.groups)
+        query["orders"] = list(self.orders)
+        query["timestamp_range"] = copy.deepcopy(self.timestamp_range)
         query["limit"] = self.limit
-        query["pagination"] = self.pagination
+        query["pagination"] = copy.copy(self.pagination)
 
         return query
 
     def add_filter(self, filter):        
         self.filters.append(filter)
+        self.invalidate()
         return
 
     def delete_filters(self):
         self.filters = []
+        self.invalidate()
         return
 
     def add_group(self, group):
         self.groups.append(group)
+        self.invalidate()
+        return
+
+    def delete_groups(self):
+        self.groups = []
+        self.invalidate()
+        return
+
+    def add_order(self, order):
+        self.orders.append(order)
+        self.invalidate()
+        return
+
+    def delete_orders(self):
+        self.orders = []
+        self.invalidate()
+
+    def add_timestamp_range(self, timestamp=None):
+
+        self.timestamp_range = {}
+        if timestamp:
+            self.timestamp_range = timestamp
+
+        self.invalidate()
+
+        return
+
+    def add_timestamp_range_absolute(self, start=None, end=None):
+
+        self.timestamp_range = {}        
+
+        if start or end:
+            self.timestamp_range["absolute"] = {}
+
+            if start:
+                if not isinstance(start, str):
+                    # This is probably a datetime object.
+                    startstr = self.db.iq.iso_format(start)
+                else:
+                    startstr = start
+
+                self.timestamp_range["absolute"]["start"] = startstr
+
+            if end:
+                if not isinstance(end, str):
+                    # This is probably a datetime object.
+                    endstr = self.db.iq.iso_format(end)
+                else:
+                    endstr = end
+
+                self.timestamp_range["absolute"]["end"] = endstr
+
+        self.invalidate()
+
+        return                
+
+    def add_timestamp_range_relative(self, interval=None):
+        # Example intervals are "PT1M" and "PT1H".
+        self.timestamp_range = {}
+        
+        if interval:
+            self.timestamp_range["relative"] = {}
+            self.timestamp_range["relative"]["interval"] = interval
+
+        self.invalidate()
+
+        return                        
+
+    def add_limit(self, limit=None):
+        """Limit the total number of rows returned by the query.
+
+        Parameters
+        ----------
+        limit: int
+            The maximum number of rows. None removes the limit.
+
+        """
+        if limit is not None and (not isinstance(limit, int) or isinstance(limit, bool) or limit < 0):
+            raise ValueError("The limit must be a non-negative integer.")
+
+        self.limit = limit
+        self.invalidate()
+
+        return
+
+    def add_pagination(self, offset=0, page_size=None):
+        """Request a single page of the query's rows.
+
+        Parameters
+        ----------
+        offset: int
+            The index of the first row of the page.
+
+        page_size: int
+            The maximum number of rows in the page. None removes the pagination.
+
+        """
+        self.pagination = None
+
+        if page_size is not None:
+            if not isinstance(offset, int) or isinstance(offset, bool) or offset < 0:
+                raise ValueError("The offset must be a non-negative integer.")
+            if not isinstance(page_size, int) or isinstance(page_size, bool) or page_size <= 0:
+                raise ValueError("The page size must be a positive integer.")
+
+            self.pagination = {"offset": offset, "limit": page_size}
+
+        self.invalidate()
+
+        return
+
+#========================================================================================================
+class IqSingleQuery(IqQuery):
+    # The aggregate functions supported by add_aggregate(), and the type of their result
+    # (if it is not the type of the column).
+    aggregate_functions = ("sum", "avg", "min", "max", "count")
+    aggregate_types = {"count": "uint64", "avg": "double"}
+
+    def __init__(self, db, iq_set_name=None, name=None, columns=None):
+        super().__init__(db, name=name)
+
+        if not name:
+            self.name = iq_set_name
+
+        self.iq_set = db.find_set_by_name(iq_set_name)
+
+        # The columns selected by the user (None for all of them). See set_columns().
+        self.selected_columns = list(columns) if columns else None
+
+        # The aggregation (see add_group_by() and add_aggregate()). The group by columns
+        # are (set, column) tuples, and the orders are (alias, direction) tuples.
+        self.group_by = []
+        self.aggregates = []
+        self.aggregate_orders = []
+
+        self.columns_info = None
+        self.columns = []
+
+        self.refresh_columns_info()
+        return       
+
+    def set_columns(self, columns=None):
+        """Only project the specified columns, instead of every column of the set.
+
+        Parameters
+        ----------
+        columns: list
+            The names of the facts and dimension attributes. See IqSet.resolve_columns().
+            None selects all of the columns.
+
+        """
+        self.selected_columns = list(columns) if columns else None
+        self.refresh_columns_info()
+        self.invalidate()
         return
 
-    def delete_groups(self):
-        self.groups = []
-        return
+    def get_columns(self):        
+        return self.columns
+
+    def get_column_types(self):
+        return self.columns_info.get("column_types", {})
+
+    def add_group_by(self, columns):
+        """Group the rows by one or more dimension attributes.
+
+        Once the query has group by columns or aggregates, only those are projected (the
+        selected columns are ignored), and the rows are aggregated by the IQ server.
+
+        Parameters
+        ----------
+        columns: list
+            The names of the dimension attributes (e.g. "port.name" or "port_name").
+            See IqSet.resolve_columns(). A single name may also be passed as a str.
+
+        """
+        if isinstance(columns, str):
+            columns = [columns]
 
-    def add_order(self, order):
-        self.orders.append(group)
-        return
+        # The columns are only added once all of them have been checked.
+        group_by = list(self.group_by)
+        for iq_set, column in self.iq_set.resolve_columns(columns):
+            if iq_set is self.iq_set and isinstance(iq_set, IqResultSet):
+                raise ValueError("The column '" + column + "' is a fact. Only dimension attributes can be grouped by.")
 
-    def delete_orders(self):
-        self.orders = []
+            if (iq_set, column) in group_by:
+                continue
 
-    def add_timestamp_range(self, timestamp=None):
+            alias = iq_set.get_column_alias(column)
+            aliases = [aggregate["alias"] for aggregate in self.aggregates]
+            aliases += [group_set.get_column_alias(group_column) for group_set, group_column in group_by]
+            if alias in aliases:
+                raise ValueError("The alias '" + alias + "' is already used by another column of this query.")
 
-        self.timestamp_range = {}
-        if timestamp:
-            self.timestamp_range = timestamp
+            group_by.append((iq_set, column))
 
+        self.group_by = group_by
+
+        self.refresh_columns_info()
+        self.invalidate()
         return
 
-    def add_timestamp_range_absolute(self, start=None, end=None):
+    def add_aggregate(self, function, column=None, alias=None):
+        """Add an aggregate (e.g. the sum of a fact) to the projections.
 
-        self.timestamp_range = {}        
+        Parameters
+        ----------
+        function: str
+            One of "sum", "avg", "min", "max" or "count".
 
-        if start or end:
-            self.timestamp_range["absolute"] = {}
+        column: str
+            The name of the column (see IqSet.resolve_columns()). Only facts can be
+            summed or averaged. For "count", None counts the rows.
 
-            if start:
-                if not isinstance(start, str):
-                    # This is probably a datetime object.
-                    startstr = self.db.iq.iso_format(start)
-                else:
-                    startstr = start
+        alias: str
+            The name of the result column. Defaults to the function and the column
+            alias, e.g. "sum_tx_stream_live_stats_frame_count", or "row_count".
 
-                self.timestamp_range["absolute"]["start"] = startstr
+        """
+        function = function.lower()
+        if function not in self.aggregate_functions:
+            raise ValueError("The aggregate function '" + function + "' is not supported. Use one of: " + ", ".join(self.aggregate_functions))
+
+        aggregate = {}
+        aggregate["function"] = function
+        aggregate["set"] = None
+        aggregate["column"] = None
+
+        if column is None:
+            if function != "count":
+                raise ValueError("A column must be specified for the '" + function + "' aggregate function.")
+            aggregate["type"] = self.aggregate_types["count"]
+            aggregate["alias"] = alias or "row_count"
+        else:
+            iq_set, column_name = self.iq_set.resolve_columns([column])[0]
+            column_type = iq_set.column_info[column_name].get("type")
 
-            if end:
-                if not isinstance(end, str):
-                    # This is probably a datetime object.
-                    endstr = self.db.iq.iso_format(end)
-                else:
-                    endstr = end
+            if function in ("sum", "avg"):
+                if iq_set is not self.iq_set or not isinstance(iq_set, IqResultSet):
+                    raise ValueError("The column '" + column + "' is not a fact. Only facts can be summed or averaged.")
+                if column_type in ("string", "timestamp"):
+                    raise ValueError("The column '" + column + "' (" + str(column_type) + ") can't be summed or averaged.")
 
-                self.timestamp_range["absolute"]["end"] = endstr
+            aggregate["set"] = iq_set
+            aggregate["column"] = column_name
+            aggregate["type"] = self.aggregate_types.get(function, column_type)
+            aggregate["alias"] = alias or function + "_" + iq_set.get_column_alias(column_name)
 
-        return                
+        aliases = [existing["alias"] for existing in self.aggregates]
+        aliases += [iq_set.get_column_alias(column) for iq_set, column in self.group_by]
+        if aggregate["alias"] in aliases:
+            raise ValueError("The alias '" + aggregate["alias"] + "' is already used by another column of this query.")
 
-    def add_timestamp_range_relative(self, interval=None):
-        # Example intervals are "PT1M" and "PT1H".
-        self.timestamp_range = {}
-        
-        if interval:
-            self.timestamp_range["relative"] = {}
-            self.timestamp_range["relative"]["interval"] = interval
+        self.aggregates.append(aggregate)
 
-        return                        
+        self.refresh_columns_info()
+        self.invalidate()
+        return aggregate["alias"]
 
-    def add_limit(self):
-        return
+    def add_aggregate_order(self, alias, direction="ASC"):
+        """Order the aggregated rows by a group by column or an aggregate.
 
-    def add_pagination(self):
-        return
+        Parameters
+        ----------
+        alias: str
+            The alias of the group by column (e.g. "port_name") or of the aggregate.
 
-#========================================================================================================
-class IqSingleQuery(IqQuery):
-    def __init__(self, db, iq_set_name=None, name=None):
-        super().__init__(db, name=name)
+        direction: str
+            "ASC" or "DESC".
 
-        if not name:
-            self.name = iq_set_name
+        """
+        direction = direction.upper()
+        if direction not in ("ASC", "DESC"):
+            raise ValueError("The direction must be 'ASC' or 'DESC'.")
 
-        self.iq_set = db.find_set_by_name(iq_set_name)
+        if alias not in self.columns_info.get("expressions", {}):
+            raise Exception("The column '" + alias + "' is not a group by column or an aggregate of this query.")
 
-        self.columns_info = None
-        self.columns = []
+        self.aggregate_orders.append((alias, direction))
+        self.invalidate()
+        return
+
+    def delete_aggregation(self):
+        # Remove the group by columns, aggregates and their orders.
+        self.group_by = []
+        self.aggregates = []
+        self.aggregate_orders = []
 
         self.refresh_columns_info()
-        return       
+        self.invalidate()
+        return
 
-    def get_columns(self):        
-        return self.columns
+    def get_aggregate_expression(self, aggregate, latest=False):
+        if aggregate["column"] is None:
+            return "count(*)"
+
+        iq_set = aggregate["set"]
+        if isinstance(iq_set, IqResultSet):
+            full_column = iq_set.get_full_column_name(aggregate["column"], latest)
+        else:
+            full_column = iq_set.get_full_column_name(aggregate["column"])
+
+        return aggregate["function"] + "(" + full_column + ")"
 
     def refresh_columns_info(self, latest=False):
-        self.columns_info = self.iq_set.get_columns_info(latest)
-        self.columns = self.columns_info["column_alias_list"]        
+        if not self.group_by and not self.aggregates:
+            self.columns_info = self.iq_set.get_columns_info(latest, columns=self.selected_columns)
+            self.columns = self.columns_info["column_alias_list"]        
+            return
+
+        # Only the group by columns and the aggregates are projected. The expression of
+        # each one is kept for the groups and orders.
+        columns_info = {}
+        columns_info["projections"] = []
+        columns_info["column_alias_list"] = []
+        columns_info["column_types"] = {}
+        columns_info["expressions"] = {}
+
+        for iq_set, column in self.group_by:
+            alias = iq_set.get_column_alias(column)
+            columns_info["expressions"][alias] = iq_set.get_full_column_name(column)
+            columns_info["column_types"][alias] = iq_set.column_info[column].get("type")
+
+        for aggregate in self.aggregates:
+            alias = aggregate["alias"]
+            columns_info["expressions"][alias] = self.get_aggregate_expression(aggregate, latest)
+            columns_info["column_types"][alias] = aggregate["type"]
+
+        for alias, expression in columns_info["expressions"].items():
+            columns_info["projections"].append(expression + " AS " + alias)
+            columns_info["column_alias_list"].append(alias)
+
+        self.columns_info = columns_info
+        self.columns = columns_info["column_alias_list"]
         return
 
-    def get_query(self, latest=False):
-        query = super().get_query()
+    def build_query(self, latest=False):
+        query = super().build_query(latest)
 
         self.refresh_columns_info(latest)
 
-        query["projections"] = self.columns_info["projections"]
+        query["projections"] = list(self.columns_info["projections"])
+
+        if self.group_by or self.aggregates:
+            expressions = self.columns_info["expressions"]
+
+            group_by = [iq_set.get_full_column_name(column) for iq_set, column in self.group_by]
+            query["groups"] = group_by + query["groups"]
+            query["orders"] = query["orders"] + [expressions[alias] + " " + direction for alias, direction in self.aggregate_orders]
 
         return query
 
-    def execute(self, latest=False):        
-        query = {}
-        query["single_result"] = self.get_query(latest)
-        result = self.db.iq.execute_query(query, db_id=self.db.id)
+    def get_query(self, latest=False):
+        return copy.deepcopy(self.compile(latest).definition["single_result"])
+
+    def build_definition(self, latest=False):
+        return {"single_result": self.build_query(latest)}
+
+    def execute(self, latest=False, columnar=False):        
+        query = self.compile(latest)
+        result = self.db.iq.execute_query(query, db_id=self.db.id, columnar=columnar, column_types=self.get_column_types())
         return result        
 
 #========================================================================================================
 class IqMultiQuery(IqQuery):
-    def __init__(self, db, iq_set_names=None, subqueries=None, name=None, keys=None):
+    def __init__(self, db, iq_set_names=None, subqueries=None, name=None, keys=None, columns=None):
         super().__init__(db, name=name)      
 
         # A multiquery is made up of two, or more, subqueries, which could be either 
@@ -1055,8 +3280,10 @@ class IqMultiQuery(IqQuery):
         self.subqueries = []
 
         # If the user has specified a set name, create a single_result query object.
+        # The columns of each one may be selected with a dict keyed by set name. The
+        # keys must be included.
         for set_name in iq_set_names:
-            iq_set = IqSingleQuery(db, iq_set_name=set_name)
+            iq_set = IqSingleQuery(db, iq_set_name=set_name, columns=(columns or {}).get(set_name))
 
             self.subqueries.append(iq_set)
 
@@ -1073,28 +3300,41 @@ class IqMultiQuery(IqQuery):
             columns += query.get_columns()
         return columns
 
+    def get_column_types(self):
+        column_types = {}
+        for query in self.subqueries:
+            for column, column_type in query.get_column_types().items():
+                column_types.setdefault(column, column_type)
+        return column_types
+
     def add_subqueries(self, queries):
         for query in queries:
             self.subqueries.append(query)
+        self.invalidate()
         return
 
-    def get_query(self, latest=False):
+    def get_version(self):
+        # The compiled query must also be rebuilt if any of the subqueries change.
+        return (self.version, tuple([subquery.get_version() for subquery in self.subqueries]))
+
+    def build_query(self, latest=False):
 
         query = {}
         query["alias"] = self.name
-        query["filters"] = self.filters
-        query["groups"] = self.groups
-        query["orders"] = self.orders
+        query["filters"] = list(self.filters)
+        query["groups"] = list(self.groups)
+        query["orders"] = list(self.orders)
         query["limit"] = self.limit
-        query["pagination"] = self.pagination
+        query["pagination"] = copy.copy(self.pagination)
 
         query["subqueries"] = []
         query["projections"] = []
 
-        columns = []
+        columns = set()
         key_dict = {}
 
         for subquery in self.subqueries:
+            # The subqueries are compiled too, so they are only rebuilt if they change.
             query["subqueries"].append(subquery.get_query(latest))
 
             for column in subquery.get_columns():
@@ -1102,7 +3342,7 @@ class IqMultiQuery(IqQuery):
                 alias = column
 
                 if column not in columns:
-                    columns.append(column)                                
+                    columns.add(column)                                
                     query["projections"].append(full_column + " AS " + alias)
 
                 if column in self.keys:
@@ -1125,14 +3365,827 @@ class IqMultiQuery(IqQuery):
         
         return query     
 
-    def execute(self, latest=False, custom_query=None):        
-        query = {}
+    def get_query(self, latest=False):
+        return copy.deepcopy(self.compile(latest).definition["multi_result"])
+
+    def build_definition(self, latest=False):
+        return {"multi_result": self.build_query(latest)}
+
+    def execute(self, latest=False, custom_query=None, columnar=False):        
         
         if not custom_query:
-            query["multi_result"] = self.get_query(latest)
+            query = self.compile(latest)
         else:
+            query = {}
             query["multi_result"] = custom_query
 
-        result = self.db.iq.execute_query(query, db_id=self.db.id)
+        result = self.db.iq.execute_query(query, db_id=self.db.id, columnar=columnar, column_types=self.get_column_types())
         return result                 
 
+#========================================================================================================
+class IqCompiledQuery:
+    """An immutable, pre-serialized query definition.
+
+    Created by IqQuery.compile(). The definition must not be modified.
+
+    Parameters
+    ----------
+    definition: dict
+        The query definition, e.g. {"single_result": {...}}.
+
+    version: int
+        The version of the IqQuery object that the definition was built from.
+
+    """
+    __slots__ = ("definition", "json", "version")
+
+    def __init__(self, definition, version=None):
+        self.definition = definition
+        self.json = json.dumps(definition, sort_keys=True, separators=(",", ":")).encode()
+        self.version = version
+
+        return
+
+#========================================================================================================
+class IqColumnarResult:
+    """Columnar container for the result of a query.
+
+    The column names are stored once, and the values of each column are stored in a
+    single array. Numeric columns are stored as NumPy arrays (if NumPy is installed),
+    using the column types reported by the IQ server (see IqSet.column_info). All other
+    columns are stored as lists.
+
+    Parameters
+    ----------
+    columns: list
+        The column names.
+
+    data: dict
+        The column arrays, keyed by column name.
+
+    row_count: int
+        The number of rows in the result.
+
+    """
+    # Maps the IQ column types to NumPy dtypes. Types that are not listed are stored as lists.
+    numeric_types = {"int8": "int64", "int16": "int64", "int32": "int64", "int64": "int64",
+                     "uint8": "int64", "uint16": "int64", "uint32": "int64", "uint64": "uint64",
+                     "integer": "int64", "long": "int64",
+                     "float": "float64", "double": "float64", "decimal": "float64",
+                     "bool": "bool", "boolean": "bool"}
+
+    def __init__(self, columns, data, row_count):
+        self.columns = columns
+        self.data = data
+        self.row_count = row_count
+
+        return
+
+    @classmethod
+    def from_raw(cls, raw_data, column_types=None):
+        """Build a columnar result from the raw result returned by the IQ ReST API.
+
+        Parameters
+        ----------
+        raw_data: dict
+            The result dict returned by the Spirent IQ ReST API.
+
+        column_types: dict
+            The IQ type of each column, keyed by column name. Columns without a type
+            are stored as lists.
+
+        Returns
+        -------
+        class
+            The IqColumnarResult object.
+
+        """
+        if column_types is None:
+            column_types = {}
+
+        columns = list(raw_data["result"]["columns"])
+        rows = raw_data["result"].get("rows") or []
+
+        if rows:
+            column_values = list(zip(*rows))
+        else:
+            column_values = [()] * len(columns)
+
+        data = {}
+        for column, values in zip(columns, column_values):
+            data[column] = cls.make_array(values, column_types.get(column))
+
+        return cls(columns, data, len(rows))
+
+    @classmethod
+    def make_array(cls, values, column_type=None):
+        dtype = cls.numeric_types.get(column_type)
+
+        numpy = get_numpy()
+        if numpy is None or dtype is None:
+            return list(values)
+
+        if None in values:
+            if dtype == "bool":
+                return list(values)
+            # Missing integer values are stored as NaN.
+            dtype = "float64"
+            values = [numpy.nan if value is None else value for value in values]
+
+        try:
+            return numpy.array(values, dtype=dtype)
+        except (ValueError, TypeError, OverflowError):
+            return list(values)
+
+    def __len__(self):
+        return self.row_count
+
+    def __getitem__(self, column):
+        return self.data[column]
+
+    def __contains__(self, column):
+        return column in self.data
+
+    def get_column(self, column):
+        if column not in self.data:
+            raise KeyError("The column '" + column + "' is not in the result.")
+        return self.data[column]
+
+    def get_row(self, index):
+        # Returns a single row as a tuple.
+        return tuple(self.data[column][index] for column in self.columns)
+
+    def rows(self):
+        # Iterate over the rows as tuples.
+        for index in range(self.row_count):
+            yield self.get_row(index)
+
+    def slice(self, start=None, stop=None, step=None):
+        """Returns a new result containing only the specified rows.
+        """
+        row_slice = slice(start, stop, step)
+
+        data = {}
+        for column in self.columns:
+            data[column] = self.data[column][row_slice]
+
+        return IqColumnarResult(self.columns, data, len(range(*row_slice.indices(self.row_count))))
+
+    def filter(self, mask):
+        """Returns a new result containing only the rows where the mask is True.
+
+        Parameters
+        ----------
+        mask: list
+            A sequence of booleans (or a NumPy boolean array), one per row. For example:
+            result.filter(result["tx_stream_stats_frame_count"] > 0)
+
+        """
+        if len(mask) != self.row_count:
+            raise ValueError("The mask has " + str(len(mask)) + " entries, but the result has " + str(self.row_count) + " rows.")
+
+        indexes = [index for index, keep in enumerate(mask) if keep]
+
+        numpy = get_numpy()
+
+        data = {}
+        for column in self.columns:
+            values = self.data[column]
+            if numpy is not None and isinstance(values, numpy.ndarray):
+                data[column] = values[numpy.asarray(mask, dtype=bool)]
+            else:
+                data[column] = [values[index] for index in indexes]
+
+        return IqColumnarResult(self.columns, data, len(indexes))
+
+    def to_raw(self):
+        """Returns the result in the same format as the raw IQ ReST API result.
+        """
+        rows = []
+        for row in self.rows():
+            rows.append([self.to_python(value) for value in row])
+
+        return {"result": {"columns": list(self.columns), "rows": rows}}
+
+    @staticmethod
+    def to_python(value):
+        # Convert a NumPy scalar back to the Python value. JSON has no NaN, so a NaN
+        # can only be a missing value.
+        if hasattr(value, "item"):
+            value = value.item()
+        if isinstance(value, float) and value != value:
+            value = None
+        return value
+
+    def to_dict(self, key_names=None, flat=False, share_rows=False):
+        """Convert the result into a dictionary of rows.
+        See SpirentTestCenterIQ.convert_result_to_dict().
+        """
+        rows = self.to_raw()["result"]["rows"]
+
+        if key_names:
+            return build_keyed_index(self.columns, rows, key_names, flat=flat, share_rows=share_rows)
+
+        result_dict = {}
+        for row_index, row in enumerate(rows, start=1):
+            if share_rows:
+                result_dict[row_index] = row
+            else:
+                result_dict[row_index] = dict(zip(self.columns, row))
+
+        return result_dict
+
+#========================================================================================================
+class IqResultSnapshot:
+    """A query result saved in a binary file, which is memory-mapped when it is opened.
+
+    Use save() to write a result once. Any number of processes can then open the file,
+    and share its pages (the numeric columns are not copied). The rows are only
+    decoded when they are accessed.
+
+    The file layout is (in native byte order, with each section 8-byte aligned):
+
+        "IQSNAP01", the length of the header (a little-endian uint64), and the header
+        (JSON), which holds the byte order, the row count and, for each column, its kind
+        and the offsets of its data.
+        The columns: "int" columns as int64, "float" columns as float64, and "string"
+        and "json" columns as int32 indexes into the string table (-1 for None).
+        A null mask (one uint8 per row) for the numeric columns that have None values.
+        The string table: the int64 offset of each (deduplicated) string, followed by
+        the UTF-8 data. Values of "json" columns are stored JSON-encoded.
+
+    Parameters
+    ----------
+    filename: str
+        The snapshot file to open.
+
+    """
+    magic = b"IQSNAP01"
+
+    def __init__(self, filename):
+        self.filename = filename
+
+        with open(filename, "rb") as snapshot_file:
+            self.map = mmap.mmap(snapshot_file.fileno(), 0, access=mmap.ACCESS_READ)
+
+        # The map is closed if the file can't be read.
+        try:
+            self.header = self.read_header()
+        except Exception:
+            self.map.close()
+            raise
+
+        header_length = int.from_bytes(self.map[8:16], "little")
+
+        self.data_offset = IqResultSnapshot.align(16 + header_length)
+
+        self.columns = [column["name"] for column in self.header["columns"]]
+        self.column_info = {column["name"]: column for column in self.header["columns"]}
+        self.row_count = self.header["rows"]
+        self.extra = self.header.get("extra", {})
+
+        # The string table is decoded the first time it is needed.
+        self.strings = None
+
+        return
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+        return
+
+    def __len__(self):
+        return self.row_count
+
+    def read_header(self):
+        if self.map[:8] != IqResultSnapshot.magic:
+            raise ValueError("The file '" + self.filename + "' is not a result snapshot.")
+
+        # The header length is always little-endian, so that the byte order can be checked.
+        header_length = int.from_bytes(self.map[8:16], "little")
+        try:
+            header = json.loads(self.map[16:16 + header_length].decode("utf-8"))
+        except ValueError:
+            raise ValueError("The header of the snapshot '" + self.filename + "' is corrupt.") from None
+
+        if header.get("version") != 1:
+            raise ValueError("The snapshot '" + self.filename + "' has an unsupported version (" + str(header.get("version")) + ").")
+
+        if header.get("byteorder") != sys.byteorder:
+            raise ValueError("The snapshot '" + self.filename + "' was written with a different byte order.")
+
+        return header
+
+    @staticmethod
+    def align(offset):
+        return (offset + 7) // 8 * 8
+
+    @classmethod
+    def save(cls, raw_data, filename, column_types=None):
+        """Save a query result to a snapshot file, and return the opened snapshot.
+
+        Parameters
+        ----------
+        raw_data: dict
+            The result dict returned by the Spirent IQ ReST API. An IqColumnarResult or
+            IqStreamingResult object may also be passed.
+
+        filename: str
+            The snapshot file. It is replaced atomically if it already exists.
+
+        column_types: dict
+            The IQ type of each column, keyed by column name. Integer columns with a
+            floating point type (e.g. "double") are stored as floats.
+
+        Returns
+        -------
+        class
+            The IqResultSnapshot object.
+
+        """
+        if column_types is None:
+            column_types = {}
+
+        if isinstance(raw_data, IqColumnarResult):
+            raw_data = raw_data.to_raw()
+
+        extra = {}
+        if isinstance(raw_data, IqStreamingResult):
+            columns = list(raw_data.columns)
+            rows = list(raw_data.rows())
+            extra = raw_data.extra
+        else:
+            columns = list(raw_data["result"]["columns"])
+            rows = raw_data["result"].get("rows") or []
+            extra = {key: value for key, value in raw_data.items() if key != "result"}
+
+        column_values = list(zip(*rows)) if rows else [()] * len(columns)
+
+        strings = []
+        string_indexes = {}
+
+        def get_string_index(string):
+            if string not in string_indexes:
+                string_indexes[string] = len(strings)
+                strings.append(string)
+            return string_indexes[string]
+
+        # The sections are built first, with offsets relative to the start of the data.
+        sections = []
+        position = 0
+
+        def add_section(data):
+            nonlocal position
+            offset = position
+            sections.append(data)
+            position = IqResultSnapshot.align(position + len(data))
+            return offset
+
+        header_columns = []
+        for column, values in zip(columns, column_values):
+            kind = cls.get_kind(values, column_types.get(column))
+            has_nulls = None in values
+
+            column_info = {}
+            column_info["name"] = column
+            column_info["kind"] = kind
+            column_info["nulls"] = None
+
+            if kind == "int":
+                column_info["offset"] = add_section(array.array("q", [0 if value is None else value for value in values]).tobytes())
+            elif kind == "float":
+                column_info["offset"] = add_section(array.array("d", [float("nan") if value is None else value for value in values]).tobytes())
+            elif kind == "string":
+                column_info["offset"] = add_section(array.array("i", [-1 if value is None else get_string_index(value) for value in values]).tobytes())
+            else:
+                column_info["offset"] = add_section(array.array("i", [-1 if value is None else get_string_index(json.dumps(value)) for value in values]).tobytes())
+
+            if has_nulls and kind in ("int", "float"):
+                column_info["nulls"] = add_section(bytes(array.array("B", [value is None for value in values])))
+
+            header_columns.append(column_info)
+
+        encoded_strings = [string.encode("utf-8") for string in strings]
+        string_offsets = array.array("q", [0])
+        for encoded_string in encoded_strings:
+            string_offsets.append(string_offsets[-1] + len(encoded_string))
+
+        string_table = {}
+        string_table["count"] = len(strings)
+        string_table["offset"] = add_section(string_offsets.tobytes())
+        string_table["data"] = add_section(b"".join(encoded_strings))
+
+        header = {}
+        header["version"] = 1
+        header["byteorder"] = sys.byteorder
+        header["rows"] = len(rows)
+        header["columns"] = header_columns
+        header["strings"] = string_table
+        header["extra"] = extra
+        header_bytes = json.dumps(header).encode("utf-8")
+
+        temp_filename = filename + ".tmp"
+        with open(temp_filename, "wb") as snapshot_file:
+            snapshot_file.write(IqResultSnapshot.magic)
+            snapshot_file.write(len(header_bytes).to_bytes(8, "little"))
+            snapshot_file.write(header_bytes)
+            snapshot_file.write(b"\0" * (IqResultSnapshot.align(16 + len(header_bytes)) - 16 - len(header_bytes)))
+            for data in sections:
+                snapshot_file.write(data)
+                snapshot_file.write(b"\0" * (IqResultSnapshot.align(len(data)) - len(data)))
+        os.replace(temp_filename, filename)
+
+        return cls(filename)
+
+    @classmethod
+    def get_kind(cls, values, column_type=None):
+        # Returns how a column is stored: "int", "float", "string" or "json".
+        value_types = set(type(value) for value in values if value is not None)
+
+        if value_types <= {int}:
+            if column_type in ("float", "double", "decimal"):
+                return "float"
+            if all(value is None or -2 ** 63 <= value < 2 ** 63 for value in values):
+                return "int"
+            return "json"
+        if value_types <= {int, float}:
+            return "float"
+        if value_types <= {str}:
+            return "string"
+
+        return "json"
+
+    def get_view(self, offset, typecode, count):
+        # Returns a memoryview of a section of the file.
+        itemsize = array.array(typecode).itemsize
+        start = self.data_offset + offset
+        return memoryview(self.map)[start:start + itemsize * count].cast(typecode)
+
+    def get_string(self, index):
+        # Returns a single string of the string table, without decoding the whole table.
+        if self.strings is not None:
+            return self.strings[index]
+
+        string_table = self.header["strings"]
+        offsets = self.get_view(string_table["offset"], "q", string_table["count"] + 1)
+        start = self.data_offset + string_table["data"]
+        string = self.map[start + offsets[index]:start + offsets[index + 1]].decode("utf-8")
+        offsets.release()
+
+        return string
+
+    def get_strings(self):
+        if self.strings is None:
+            string_table = self.header["strings"]
+            offsets = self.get_view(string_table["offset"], "q", string_table["count"] + 1)
+            start = self.data_offset + string_table["data"]
+            self.strings = [self.map[start + offsets[index]:start + offsets[index + 1]].decode("utf-8") for index in range(string_table["count"])]
+            offsets.release()
+        return self.strings
+
+    def get_null_mask(self, column):
+        # Returns the null mask (1 for None) of a numeric column, or None if it has no None values.
+        column_info = self.column_info[column]
+        if column_info["nulls"] is None:
+            return None
+        return self.get_view(column_info["nulls"], "B", self.row_count)
+
+    def get_column(self, column):
+        """Returns the values of a column.
+
+        Numeric columns are returned without being copied, as read-only NumPy arrays if
+        NumPy is installed (and otherwise as memoryviews). None values are stored as 0
+        in "int" columns and NaN in "float" columns (see get_null_mask()). Other columns
+        are returned as lists.
+        """
+        if column not in self.column_info:
+            raise KeyError("The column '" + column + "' is not in the snapshot.")
+
+        column_info = self.column_info[column]
+        kind = column_info["kind"]
+
+        if kind in ("int", "float"):
+            typecode = "q" if kind == "int" else "d"
+            numpy = get_numpy()
+            if numpy is not None:
+                dtype = numpy.int64 if kind == "int" else numpy.float64
+                return numpy.frombuffer(self.map, dtype=dtype, count=self.row_count, offset=self.data_offset + column_info["offset"])
+            return self.get_view(column_info["offset"], typecode, self.row_count)
+
+        strings = self.get_strings()
+        indexes = self.get_view(column_info["offset"], "i", self.row_count)
+        if kind == "string":
+            values = [None if index < 0 else strings[index] for index in indexes]
+        else:
+            values = [None if index < 0 else json.loads(strings[index]) for index in indexes]
+        indexes.release()
+
+        return values
+
+    def get_values(self, column):
+        # Returns the values of a column as a list, with None values restored.
+        values = self.get_column(column)
+        if self.column_info[column]["kind"] not in ("int", "float"):
+            return values
+
+        values = values.tolist()
+        null_mask = self.get_null_mask(column)
+        if null_mask is not None:
+            values = [None if is_null else value for value, is_null in zip(values, null_mask)]
+            null_mask.release()
+
+        return values
+
+    def get_value(self, column, index):
+        # Returns a single value, reading only that row of the column.
+        column_info = self.column_info[column]
+        kind = column_info["kind"]
+
+        if kind in ("int", "float"):
+            null_mask = self.get_null_mask(column)
+            if null_mask is not None:
+                is_null = null_mask[index]
+                null_mask.release()
+                if is_null:
+                    return None
+
+            values = self.get_view(column_info["offset"], "q" if kind == "int" else "d", self.row_count)
+            value = values[index]
+            values.release()
+            return value
+
+        indexes = self.get_view(column_info["offset"], "i", self.row_count)
+        string_index = indexes[index]
+        indexes.release()
+
+        if string_index < 0:
+            return None
+        if kind == "string":
+            return self.get_string(string_index)
+        return json.loads(self.get_string(string_index))
+
+    def get_row(self, index):
+        # Returns a single row as a tuple. Use rows() to iterate over all of the rows.
+        if index < 0:
+            index += self.row_count
+        if not 0 <= index < self.row_count:
+            raise IndexError("The row " + str(index) + " is not in the snapshot (" + str(self.row_count) + " rows).")
+
+        return tuple(self.get_value(column, index) for column in self.columns)
+
+    def rows(self):
+        # Iterate over the rows as lists. The columns are decoded once.
+        column_values = [self.get_values(column) for column in self.columns]
+        for index in range(self.row_count):
+            yield [values[index] for values in column_values]
+
+    def to_raw(self):
+        """Returns the result in the format returned by the IQ ReST API.
+        """
+        raw_data = dict(self.extra)
+        raw_data["result"] = {}
+        raw_data["result"]["columns"] = list(self.columns)
+        raw_data["result"]["rows"] = list(self.rows())
+        return raw_data
+
+    def to_columnar(self):
+        """Returns the result as an IqColumnarResult.
+
+        If NumPy is installed, the "float" columns (and the "int" columns without None
+        values) share the memory of the file. "int" columns with None values are copied
+        to floats, with NaN for None, as IqColumnarResult does.
+        """
+        numpy = get_numpy()
+
+        data = {}
+        for column in self.columns:
+            kind = self.column_info[column]["kind"]
+            if numpy is None or kind not in ("int", "float"):
+                data[column] = self.get_values(column)
+                continue
+
+            values = self.get_column(column)
+            null_mask = self.get_null_mask(column)
+            if kind == "int" and null_mask is not None:
+                values = values.astype(numpy.float64)
+                values[numpy.frombuffer(null_mask, dtype=numpy.uint8).astype(bool)] = numpy.nan
+            if null_mask is not None:
+                null_mask.release()
+            data[column] = values
+
+        return IqColumnarResult(list(self.columns), data, self.row_count)
+
+    def close(self):
+        # The arrays returned by get_column() must no longer be in use.
+        self.map.close()
+        return
+
+#========================================================================================================
+class IqStreamingResult:
+    """The result of a query, decoded incrementally as it arrives from the IQ server.
+
+    The response is expected to have the form {"result": {"columns": [...], "rows": [...]}}.
+    The columns are decoded first, and then each row is decoded and yielded as soon as it
+    has been received, so the complete result never has to be held in memory. Any other
+    values in the response are stored in self.extra.
+
+    The rows can only be iterated once. The object can be passed to the
+    convert_result_to_csv() and convert_result_to_dict() methods of SpirentTestCenterIQ.
+
+    Parameters
+    ----------
+    chunks: iterable
+        The body of the response, as chunks of bytes (or str).
+
+    response: class
+        The HTTP response, which is closed once the rows have been read.
+
+    on_close: function
+        Called with this object when it is closed. self.bytes_read holds the size of
+        the body that was read, and self.row_count the number of rows.
+
+    """
+    whitespace = " \t\n\r"
+
+    def __init__(self, chunks, response=None, on_close=None):
+        self.chunks = iter(chunks)
+        self.response = response
+        self.on_close = on_close
+        self.bytes_read = 0
+        self.row_count = 0
+
+        self.decoder = json.JSONDecoder()
+        self.text_decoder = codecs.getincrementaldecoder("utf-8")()
+        self.buffer = ""
+        self.position = 0
+        self.eof = False
+
+        self.columns = None
+        self.extra = {}
+
+        # Rows that were received before the columns (only if the server sends them first).
+        self.pending_rows = collections.deque()
+        self.parser = self.parse()
+        self.done = False
+
+        # Read up to (and including) the columns.
+        while self.columns is None and not self.done:
+            self.advance()
+
+        return
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+        return
+
+    def __iter__(self):
+        return self.rows()
+
+    def rows(self):
+        # Yield each row (a list of values) as it is decoded.
+        while True:
+            while self.pending_rows:
+                self.row_count += 1
+                yield self.pending_rows.popleft()
+            if self.done:
+                break
+            self.advance()
+
+        return
+
+    def close(self):
+        if self.done:
+            return
+
+        if self.response is not None:
+            self.response.close()
+        self.done = True
+
+        if self.on_close:
+            self.on_close(self)
+
+        return
+
+    def advance(self):
+        # Decode the next row (or the columns), storing it for rows().
+        try:
+            next(self.parser)
+        except StopIteration:
+            self.close()
+        return
+
+    #==============================================================================
+    def fill(self):
+        # Read the next chunk into the buffer. Returns False at the end of the response.
+        if self.eof:
+            return False
+
+        # Discard the part of the buffer that has already been decoded.
+        self.buffer = self.buffer[self.position:]
+        self.position = 0
+
+        for chunk in self.chunks:
+            if isinstance(chunk, bytes):
+                self.bytes_read += len(chunk)
+                chunk = self.text_decoder.decode(chunk)
+            if chunk:
+                self.buffer += chunk
+                return True
+
+        self.buffer += self.text_decoder.decode(b"", final=True)
+        self.eof = True
+
+        return False
+
+    def peek(self):
+        # Returns the next non-whitespace character, without consuming it.
+        while True:
+            while self.position < len(self.buffer) and self.buffer[self.position] in IqStreamingResult.whitespace:
+                self.position += 1
+            if self.position < len(self.buffer):
+                return self.buffer[self.position]
+            if not self.fill():
+                raise ValueError("Unexpected end of the JSON response.")
+
+    def expect(self, characters):
+        character = self.peek()
+        if character not in characters:
+            raise ValueError("Expected one of '" + characters + "' in the JSON response, but found '" + character + "'.")
+        self.position += 1
+        return character
+
+    def read_value(self):
+        # Decode a complete JSON value. A value that ends at the end of the buffer may have been
+        # truncated (e.g. a number), so more data is read until there is a character after it.
+        self.peek()
+        while True:
+            try:
+                value, end = self.decoder.raw_decode(self.buffer, self.position)
+                if end < len(self.buffer) or self.eof:
+                    self.position = end
+                    return value
+            except json.JSONDecodeError:
+                if self.eof:
+                    raise
+            self.fill()
+
+    def parse(self):
+        # A generator that yields each time the columns or a row has been decoded.
+        self.expect("{")
+        if self.peek() == "}":
+            self.position += 1
+            self.columns = []
+            return
+
+        while True:
+            key = self.read_value()
+            self.expect(":")
+
+            if key == "result" and self.peek() == "{":
+                yield from self.parse_result()
+            else:
+                self.extra[key] = self.read_value()
+
+            if self.expect(",}") == "}":
+                break
+
+        if self.columns is None:
+            self.columns = []
+
+        return
+
+    def parse_result(self):
+        self.expect("{")
+        if self.peek() == "}":
+            self.position += 1
+            return
+
+        while True:
+            key = self.read_value()
+            self.expect(":")
+
+            if key == "rows" and self.peek() == "[":
+                self.position += 1
+                if self.peek() == "]":
+                    self.position += 1
+                else:
+                    while True:
+                        self.pending_rows.append(self.read_value())
+                        yield
+                        if self.expect(",]") == "]":
+                            break
+            elif key == "columns":
+                self.columns = self.read_value()
+                yield
+            else:
+                self.extra[key] = self.read_value()
+
+            if self.expect(",}") == "}":
+                break
+
+        return
@@ -0,0 +1,530 @@
+#!/usr/bin/env python
+"""Provides an asyncio front-end for the Spirent TestCenter IQ ReST API.
+
+The classes in this module mirror SpirentTestCenterIQ, IqDatabase and the IqQuery
+family, but all methods that talk to the IQ server are coroutines. The HTTP requests
+are sent through the same pooled transport as the synchronous client, from a bounded
+worker pool, so many queries can be in flight at once without blocking the event loop.
+
+Example:
+
+    iq = await AsyncSpirentTestCenterIQ.create("10.1.1.1", max_concurrency=20)
+    results = await asyncio.gather(*[iq.execute_view_query(view) for view in views])
+    await iq.close()
+
+"""
+
+import asyncio
+import concurrent.futures
+import functools
+import os.path
+import time
+import warnings
+import weakref
+
+from spirenttestcenteriq import *
+
+__author__ = "Matthew Jefferson"
+__copyright__ = "Copyright 2020, Spirent Communications"
+__credits__ = ["Matthew Jefferson"]
+__version__ = "0.0.1"
+__maintainer__ = "Matthew Jefferson"
+__email__ = "matt.jefferson@spirent.com"
+
+# "Prototype", "Development", or "Production"
+__status__ = "Prototype"
+
+#========================================================================================================
+class AsyncSpirentTestCenterIQ(SpirentTestCenterIQ):
+    """Asyncio counterpart of SpirentTestCenterIQ.
+
+    The constructor does not contact the IQ server. Use the create() coroutine (or
+    "async with") to build the object and discover the databases.
+
+    Parameters
+    ----------
+    max_concurrency: int
+        The maximum number of requests that may be outstanding at the same time.
+        This also sizes the connection pool, unless pool_size is given. The requests
+        are sent from a thread pool of this size, so the limit applies across event
+        loops as well. Each event loop also has its own semaphore, so that requests
+        wait in the loop rather than in the thread pool's queue.
+
+    """
+    def __init__(self, iq_server_ip=None, iq_server_port=9199, verbose=False, log_path=None, log_level="INFO", query_definitions_file=None, stc_api_instance=None,
+                 transport=None, pool_size=None, timeout=None, max_concurrency=10, query_cache_bytes=None, query_cache_live_ttl=1.0,
+                 compress_requests=False, metrics=None, cost_budget=None, cost_policy="refuse", cost_page_size=10000):
+
+        self.query_definitions = {}
+
+        if cost_policy not in ("refuse", "paginate"):
+            raise ValueError("The cost policy '" + str(cost_policy) + "' is not supported. Use 'refuse' or 'paginate'.")
+        self.cost_budget = cost_budget
+        self.cost_policy = cost_policy
+        self.cost_page_size = cost_page_size
+
+        if pool_size is None:
+            pool_size = max_concurrency
+
+        if transport is None:
+            transport = IqTransport(pool_size=pool_size, timeout=timeout, compress_requests=compress_requests)
+        self.transport = transport
+
+        if metrics is None:
+            metrics = IqMetrics()
+        self.metrics = metrics
+
+        self.max_concurrency = max_concurrency
+        self.executor = concurrent.futures.ThreadPoolExecutor(max_workers=max_concurrency)
+
+        # An asyncio.Semaphore can only be used by one event loop, so there is one per loop.
+        self.semaphores = weakref.WeakKeyDictionary()
+
+        # The catalog cache and lazy discovery are only supported by the synchronous client.
+        self.catalog_cache = None
+        self.lazy_discovery = False
+
+        self.query_cache = None
+        if query_cache_bytes:
+            self.query_cache = IqQueryCache(max_bytes=query_cache_bytes, live_ttl=query_cache_live_ttl)
+
+        self.spirent_iq_rest_api_url = None
+        if iq_server_ip:
+            self.spirent_iq_rest_api_url = "http://" + iq_server_ip + ":" + str(iq_server_port)
+
+        self.module_path = os.path.dirname(os.path.abspath(__file__))
+
+        self.load_query_definitions(query_definitions_file)
+
+        self.stc = stc_api_instance
+
+        self.db_list = []
+        self.current_db = None
+        self.discovery_stats = {}
+
+        return
+
+    @classmethod
+    async def create(cls, *args, **kwargs):
+        """Construct the client, and discover the databases on the IQ server.
+        Accepts the same arguments as the constructor.
+        """
+        iq = cls(*args, **kwargs)
+        await iq.connect()
+        return iq
+
+    async def connect(self):
+        # Equivalent to the network portion of SpirentTestCenterIQ.__init__.
+        self.subscribe()
+
+        await self.refresh_database_list()
+
+        self.set_current_db()
+
+        return
+
+    async def __aenter__(self):
+        await self.connect()
+        return self
+
+    async def __aexit__(self, exc_type, exc_value, traceback):
+        await self.close()
+        return
+
+    async def execute_query(self, query, mode="once", db_id=None, timeout=None, columnar=False, column_types=None, use_cache=True, view_name=None,
+                            check_cost=True):
+        """Returns the raw results based on the specified query.
+        See SpirentTestCenterIQ.execute_query().
+        """
+
+        if db_id is None:
+            db_id = self.get_session_db_id()
+
+        cache_context = None
+        response = None
+        if self.query_cache and use_cache:
+            cache_context = self.get_query_cache_context(query, mode, db_id)
+            response = self.query_cache.get(cache_context["key"], cache_context["last_updated"])
+
+        if response is None:
+            page_size = None
+            if check_cost and mode == "once" and self.cost_budget is not None:
+                page_size = await self.check_query_cost(query, db_id=db_id, timeout=timeout)
+
+            labels = None
+            if self.metrics.enabled:
+                labels = self.get_metric_labels("queries", db_id=db_id, view_name=view_name)
+
+            if page_size:
+                definition = self.get_query_definition(query)
+                pages = [page async for page in self.iter_query_pages(definition, page_size=page_size, db_id=db_id, timeout=timeout, limit=get_query_limit(definition))]
+                response = merge_query_pages(pages)
+            else:
+                response = await self.__execute("post", "queries", self.get_query_payload(query, mode, db_id), timeout=timeout, labels=labels)
+
+            if cache_context:
+                self.query_cache.put(cache_context["key"], response, cache_context["last_updated"], cache_context["live"])
+
+        if columnar:
+            response = IqColumnarResult.from_raw(response, column_types)
+
+        return(response)
+
+    async def estimate_query_cost(self, query, db_id=None, timeout=None):
+        """Returns the IQ server's estimate of the cost of the query, without executing it.
+        See SpirentTestCenterIQ.estimate_query_cost().
+        """
+        if db_id is None:
+            db_id = self.get_session_db_id()
+
+        if not self.has_cost_query_mode(db_id):
+            raise Exception("The database '" + str(db_id) + "' does not support cost queries (has_cost_query_mode).")
+
+        response = await self.execute_query(query, mode="cost", db_id=db_id, timeout=timeout, use_cache=False)
+
+        return parse_query_cost(response)
+
+    async def check_query_cost(self, query, db_id=None, timeout=None, stream=False):
+        # See SpirentTestCenterIQ.check_query_cost().
+        if not self.has_cost_query_mode(db_id):
+            return None
+
+        try:
+            estimate = await self.estimate_query_cost(query, db_id=db_id, timeout=timeout)
+        except (RuntimeError, KeyError, ValueError) as error:
+            estimate = None
+            warnings.warn("The cost of the query is unknown (" + str(error) + "). The query is executed without checking the budget.", RuntimeWarning)
+
+        return self.get_cost_page_size(estimate, db_id=db_id, stream=stream)
+
+    async def execute_view_query(self, view_name, db_id=None):
+        """Returns results based on the specified pre-defined query.
+        See SpirentTestCenterIQ.execute_view_query().
+        """
+        if db_id is None:
+            db_id = self.get_session_db_id()
+
+        response = None
+        if view_name in self.query_definitions.keys():
+            query = self.query_definitions[view_name]
+            response = await self.execute_query(query, db_id=db_id, view_name=view_name)
+        else:
+            print("ERROR: The view '" + view_name + "' is not defined. Please use one of the following views:")
+            for view in self.query_definitions.keys():
+                print("  " + view)
+
+        return response
+
+    async def execute_many(self, queries, db_ids=None, max_workers=None, timeout=None, columnar=False, labels=None):
+        """Execute many views and/or queries concurrently.
+        See SpirentTestCenterIQ.execute_many(). The number of queries executed at the
+        same time is also bounded by max_concurrency.
+        """
+        if db_ids is None:
+            db_ids = [self.get_session_db_id()]
+
+        batch_semaphore = None
+        if max_workers:
+            batch_semaphore = asyncio.Semaphore(max_workers)
+
+        queries = list(queries)
+        labels = self.get_batch_labels(queries, labels)
+
+        async def execute_batch_query(query, label, db_id):
+            batch_result = {}
+            batch_result["query"] = query
+            batch_result["label"] = label
+            batch_result["db_id"] = db_id
+            batch_result["result"] = None
+            batch_result["error"] = None
+
+            start_time = time.time()
+            try:
+                if batch_semaphore:
+                    async with batch_semaphore:
+                        batch_result["result"] = await self.execute_query(self.get_batch_query(query), db_id=db_id, timeout=timeout, columnar=columnar,
+                                                                          view_name=label)
+                else:
+                    batch_result["result"] = await self.execute_query(self.get_batch_query(query), db_id=db_id, timeout=timeout, columnar=columnar,
+                                                                      view_name=label)
+            except Exception as error:
+                batch_result["error"] = error
+            batch_result["duration"] = time.time() - start_time
+
+            return batch_result
+
+        return list(await asyncio.gather(*[execute_batch_query(query, label, db_id) for query, label in zip(queries, labels) for db_id in db_ids]))
+
+    async def iter_query_pages(self, query, page_size=10000, db_id=None, timeout=None, offset=0, limit=None):
+        """Execute the query one page at a time, yielding the raw result of each page.
+        See SpirentTestCenterIQ.iter_query_pages().
+        """
+        cursor = IqPageCursor(query, page_size, offset=offset, limit=limit)
+
+        while not cursor.done:
+            page = await self.execute_query(cursor.get_query(), db_id=db_id, timeout=timeout, check_cost=False)
+            cursor.add_page(page)
+
+            yield page
+
+    async def export_query(self, query, filename, file_format="csv", page_size=10000, db_id=None, timeout=None):
+        """Execute the query page by page, and write the rows to a CSV or NDJSON file as they arrive.
+        See SpirentTestCenterIQ.export_query().
+        """
+        with IqResultWriter(filename, file_format) as result_writer:
+            async for page in self.iter_query_pages(query, page_size=page_size, db_id=db_id, timeout=timeout):
+                result_writer.write_page(page)
+
+        return result_writer.stats
+
+    async def export_view_query(self, view_name, filename, file_format="csv", page_size=10000, db_id=None, timeout=None):
+        """Export the results of a pre-defined query to a file.
+        See SpirentTestCenterIQ.export_query().
+        """
+        query = self.get_view_definition(view_name)
+
+        if db_id is None:
+            db_id = self.get_session_db_id()
+
+        return await self.export_query(query, filename, file_format=file_format, page_size=page_size, db_id=db_id, timeout=timeout)
+
+    async def export_snapshot(self, query, filename, db_id=None, timeout=None, column_types=None):
+        """Execute the query, and save the result to a memory-mappable snapshot file.
+        See SpirentTestCenterIQ.export_snapshot().
+        """
+        raw_data = await self.execute_query(query, db_id=db_id, timeout=timeout)
+
+        # Writing a large snapshot takes a while, so it is done in a worker thread.
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.executor, functools.partial(IqResultSnapshot.save, raw_data, filename, column_types=column_types))
+
+    async def export_view_snapshot(self, view_name, filename, db_id=None, timeout=None, column_types=None):
+        """Save the results of a pre-defined query to a snapshot file.
+        See SpirentTestCenterIQ.export_snapshot().
+        """
+        query = self.get_view_definition(view_name)
+
+        if db_id is None:
+            db_id = self.get_session_db_id()
+
+        raw_data = await self.execute_query(query, db_id=db_id, timeout=timeout, view_name=view_name)
+
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.executor, functools.partial(IqResultSnapshot.save, raw_data, filename, column_types=column_types))
+
+    async def refresh_database_list(self):
+        # The details for each database are fetched concurrently.
+
+        start_time = time.time()
+
+        self.db_list = []
+
+        all_db_info = await self.get_all_db_info(summary=True)
+
+        db_ids = []
+        for db_info in all_db_info:
+            if "application.name" in db_info["metadata"].keys() and db_info["metadata"]["application.name"] == "TestCenter":
+                db_ids.append(db_info["id"])
+
+        self.db_list = list(await asyncio.gather(*[AsyncIqDatabase.create(self, db_id) for db_id in db_ids]))
+
+        self.discovery_stats = {}
+        self.discovery_stats["databases"] = len(self.db_list)
+        self.discovery_stats["requests"] = 1 + len(db_ids)
+        self.discovery_stats["duration"] = time.time() - start_time
+
+        return
+
+    async def get_all_db_info(self, summary=False):
+        """Returns information about the Spirent IQ results databases.
+        See SpirentTestCenterIQ.get_all_db_info().
+        """
+
+        if summary:
+            result_db_list = await self.__execute("get", "databases?detail=summary")
+        else:
+            result_db_list = await self.__execute("get", "databases")
+
+        return(result_db_list)
+
+    async def get_db_info(self, db_id=None, summary=True):
+        """Returns information about the specified Spirent IQ results databases.
+        See SpirentTestCenterIQ.get_db_info().
+        """
+
+        if not db_id:
+            db_id = self.get_session_db_id()
+
+        if summary:
+            db_info = await self.__execute("get", "databases/" + db_id + "?detail=summary")
+        else:
+            db_info = await self.__execute("get", "databases/" + db_id)
+
+        return(db_info)
+
+    async def close(self):
+        """Close all pooled connections and stop the worker threads.
+        """
+        self.executor.shutdown(wait=False)
+        self.transport.close()
+        return
+
+    #==============================================================================
+    async def __execute(self, cmdtype, url, payload=None, timeout=None, labels=None):
+        if self.metrics.enabled and labels is None:
+            labels = self.get_metric_labels(url)
+
+        url = "".join(self.get_result_url() + "/" + url)
+
+        loop = asyncio.get_running_loop()
+
+        semaphore = self.semaphores.get(loop)
+        if semaphore is None:
+            semaphore = self.semaphores[loop] = asyncio.Semaphore(self.max_concurrency)
+
+        async with semaphore:
+            result = await loop.run_in_executor(self.executor, functools.partial(self.__send, cmdtype, url, payload, timeout, labels))
+
+        return result
+
+    def __send(self, cmdtype, url, payload, timeout, labels=None):
+        # Runs in a worker thread. The JSON is decoded here as well, so that large
+        # responses do not block the event loop. The request time does not include
+        # the time spent waiting for the semaphore.
+        metrics_enabled = self.metrics.enabled and labels is not None
+        if metrics_enabled:
+            start_time = time.perf_counter()
+
+        response = self.transport.request(cmdtype, url, payload, timeout=timeout)
+
+        raise_for_response_status(response, self.transport.extract_json)
+
+        if metrics_enabled:
+            decode_time = time.perf_counter()
+            result = self.transport.extract_json(response)
+            self.metrics.record_request(labels, response, decode_time - start_time, time.perf_counter() - decode_time, result)
+            return(result)
+
+        return(self.transport.extract_json(response))
+
+#========================================================================================================
+class AsyncIqDatabase(IqDatabase):
+    def __init__(self, iq, db_id):
+        # Unlike IqDatabase, the constructor does not fetch anything. Use create().
+        self.iq = iq
+        self.db_id = db_id
+
+        # This refers to the profile used by the UI when opening the database.
+        self.profile_id = None
+
+        self.set_list = []
+        self.result_set_list = []
+        self.dimension_set_list = []
+
+        return
+
+    @classmethod
+    async def create(cls, iq, db_id):
+        db = cls(iq, db_id)
+        await db.refresh()
+        return db
+
+    async def refresh(self):
+        # Populate all of the database information for the IQ server.
+        db_info = await self.iq.get_db_info(db_id=self.db_id, summary=False)
+
+        self.populate(db_info)
+
+        return
+
+    async def get_snapshot_list(self, order="ASC"):
+        """Returns the names of all saved snapshots for the specified results DB.
+        See IqDatabase.get_snapshot_list().
+        """
+
+        query = {}
+
+        query["filters"] = []
+        query["groups"] = []
+        query["orders"] = ["view.test_event_timestamp " + order]
+        query["projections"] = [
+            "view.test_snapshot_name as snapshot_name",
+            "view.test_snapshot_number as snapshot_number"
+        ]
+
+        query["subqueries"] = [
+             {
+               "alias": "view",
+               "filters": [
+                 "test_events.name = 'snapshot_completed'"
+               ],
+               "groups": [],
+               "orders": [],
+               "projections": [
+                  "test.snapshot_name as test_snapshot_name",
+                  "test.snapshot_number as test_snapshot_number",
+                  "test_events.name as test_event_name",
+                  "test_events.timestamp as test_event_timestamp",
+               ],
+             }
+          ]
+
+        mrquery = {"multi_result": query}
+        result = await self.iq.execute_query(mrquery, db_id=self.id)
+
+        snapshots = []
+        for snapshot in result["result"]["rows"]:
+            snapshots.append(snapshot[0])
+
+        return snapshots
+
+#========================================================================================================
+class AsyncIqQueryMixin:
+    # Asynchronous versions of the IqQuery page iterators.
+
+    async def iter_pages(self, page_size=10000, latest=False, columnar=False):
+        offset = 0
+        if self.pagination:
+            offset = self.pagination.get("offset", 0)
+
+        column_types = self.get_column_types()
+
+        async for page in self.db.iq.iter_query_pages(self.compile(latest).definition, page_size=page_size, db_id=self.db.id, offset=offset, limit=self.limit):
+            if columnar:
+                page = IqColumnarResult.from_raw(page, column_types)
+            yield page
+
+    async def iter_rows(self, page_size=10000, latest=False):
+        async for page in self.iter_pages(page_size=page_size, latest=latest):
+            for row in page["result"].get("rows") or []:
+                yield row
+
+    async def estimate_cost(self, latest=False):
+        return await self.db.iq.estimate_query_cost(self.compile(latest), db_id=self.db.id)
+
+#========================================================================================================
+class AsyncIqQuery(AsyncIqQueryMixin, IqQuery):
+    async def execute(self, columnar=False):
+        query = self.compile()
+        result = await self.db.iq.execute_query(query, db_id=self.db.id, columnar=columnar, column_types=self.get_column_types())
+        return result
+
+#========================================================================================================
+class AsyncIqSingleQuery(AsyncIqQueryMixin, IqSingleQuery):
+    async def execute(self, latest=False, columnar=False):
+        query = self.compile(latest)
+        result = await self.db.iq.execute_query(query, db_id=self.db.id, columnar=columnar, column_types=self.get_column_types())
+        return result
+
+#========================================================================================================
+class AsyncIqMultiQuery(AsyncIqQueryMixin, IqMultiQuery):
+    async def execute(self, latest=False, custom_query=None, columnar=False):
+
+        if not custom_query:
+            query = self.compile(latest)
+        else:
+            query = {}
+            query["multi_result"] = custom_query
+
+        result = await self.db.iq.execute_query(query, db_id=self.db.id, columnar=columnar, column_types=self.get_column_types())
+        return result
@@ -3,6 +3,12 @@
     
 """
 
+import array
+import bisect
+import mmap
+import threading
+import warnings
+
 from spirenttestcenteriq import *
 
 __author__ = "Matthew Jefferson"
@@ -16,24 +22,14 @@ __email__ = "matt.jefferson@spirent.com"
 __status__ = "Prototype"
 
 
-def timeit(method):
-    def timed(*args, **kw):
-        ts = time.time()
-        result = method(*args, **kw)
-        te = time.time()
-        if 'log_time' in kw:
-            name = kw.get('log_name', method.__name__.upper())
-            kw['log_time'][name] = int((te - ts) * 1000)
-        else:
-            print('%r  %2.2f ms' % \
-                  (method.__name__, (te - ts) * 1000))
-        return result
-    return timed
-        
+# StreamLiveResults.refresh() is timed with spirenttestcenteriq.timeit, which records the
+# "method_seconds" metric in the metrics of the client (see IqMetrics).
+
 class Results:
     def __init__(self, db):
 
         self.db = db
+        self.metrics = db.iq.metrics
         self.query = None
         self.keys = None
         self.raw_result_data = None
@@ -41,7 +37,8 @@ class Results:
 
         return
 
-    def refresh(self, latest=True):
+    def refresh(self, latest=True, timestamp_range=None):
+        # If a timestamp_range is specified, only the samples in that range are returned.
         query = { 'alias': None,
                   'filters': [ 'tx_stream_live_stats.tx_stream_stream_id=rx_stream_live_stats.rx_stream_stream_id'],
                   'groups': [],
@@ -166,6 +163,10 @@ class Results:
         #                                              'rx_port.name AS rx_port_name'],
         #                             'timestamp_range': {}}]}        
         
+        if timestamp_range:
+            for subquery in query["subqueries"]:
+                subquery["timestamp_range"] = timestamp_range
+
         self.raw_result_data = self.query.execute(latest=latest, custom_query=query)
         #self.raw_result_data = self.query.execute(latest=latest)         
 
@@ -175,7 +176,24 @@ class Results:
         return self.raw_result_data
 
 class StreamLiveResults(Results):
-    def __init__(self, db):
+    def __init__(self, db, incremental=False, overlap=1.0):
+        """Latest live statistics for each stream.
+
+        Parameters
+        ----------
+        db: class
+            The IqDatabase object to query.
+
+        incremental: bool
+            If True, refresh() only requests the samples that are newer than the
+            previous refresh, and merges the changed streams into result_data.
+
+        overlap: float
+            The number of seconds before the newest timestamp already seen that an
+            incremental refresh starts from. This catches samples that are written
+            to the database slightly out of order.
+
+        """
         super().__init__(db)      
 
         self.result_data = None
@@ -184,13 +202,712 @@ class StreamLiveResults(Results):
 
         self.query = IqMultiQuery(db, ["tx_stream_live_stats", "rx_stream_live_stats"], keys=self.keys)
 
+        self.incremental = incremental
+        self.overlap = overlap
+
+        # The timestamp of the latest sample of each stream, and the streams that
+        # changed during the last refresh.
+        self.last_timestamps = {}
+        self.changed_keys = []
+
         return
 
     @timeit
-    def refresh(self, latest=True):
-        super().refresh(latest)      
+    def refresh(self, latest=True, incremental=None):
+        """Refresh result_data, which is keyed by stream ID and then timestamp.
+
+        When refreshing incrementally, raw_result_data only contains the rows that
+        were returned for the new samples, and changed_keys lists the stream IDs
+        that were updated. The new samples are merged into result_data. If latest is
+        True, only the newest sample of each stream is kept (as with a full refresh),
+        and otherwise the existing samples are kept as well.
+        """
+        if incremental is None:
+            incremental = self.incremental
 
         keys = self.keys + ["tx_stream_live_stats_timestamp"]
-        self.result_data = self.db.iq.convert_result_to_dict(self.raw_result_data, key_names=keys)        
+
+        if not incremental or self.result_data is None or not self.last_timestamps:
+            super().refresh(latest)      
+
+            self.result_data = self.db.iq.convert_result_to_dict(self.raw_result_data, key_names=keys)        
+
+            self.last_timestamps = {}
+            for stream_id, samples in self.result_data.items():
+                # Streams without any samples have a timestamp of None.
+                timestamps = [timestamp for timestamp in samples.keys() if timestamp]
+                if timestamps:
+                    self.last_timestamps[stream_id] = max(timestamps)
+            self.changed_keys = list(self.result_data.keys())
+
+            return self.result_data
+
+        # Only request the samples after the newest one already seen (minus the overlap).
+        newest = self.db.iq.from_iso_format(max(self.last_timestamps.values()))
+        start = self.db.iq.iso_format(newest - datetime.timedelta(seconds=self.overlap))
+
+        super().refresh(latest, timestamp_range={"absolute": {"start": start}})
+
+        delta = self.db.iq.convert_result_to_dict(self.raw_result_data, key_names=keys)
+
+        # Timestamps are all in the same ISO 8601 format, so they can be compared as strings.
+        self.changed_keys = []
+        for stream_id, samples in delta.items():
+            timestamps = [timestamp for timestamp in samples.keys() if timestamp]
+            if not timestamps:
+                continue
+
+            timestamp = max(timestamps)
+            if timestamp <= self.last_timestamps.get(stream_id, ""):
+                continue
+
+            if latest:
+                self.result_data[stream_id] = {timestamp: samples[timestamp]}
+            else:
+                # The overlap means that some of the samples may already be known.
+                self.result_data.setdefault(stream_id, {}).update({key: value for key, value in samples.items() if key})
+            self.last_timestamps[stream_id] = timestamp
+            self.changed_keys.append(stream_id)
 
         return self.result_data
+
+class LiveResultsRingBuffer:
+    """Fixed-size history of the values of a set of counters.
+
+    The storage is preallocated: one flat array of doubles per counter, holding
+    "capacity" samples of one value per key (e.g. per stream). When the buffer is full,
+    the oldest sample is overwritten. If new keys appear, the arrays are widened.
+
+    The buffer uses 8 * capacity * keys bytes per counter, whether or not the samples
+    have been written (e.g. 5 counters of 600 samples of 10,000 streams use 240 MB).
+    The number of keys is capped by max_keys. The keys beyond it are not kept in the
+    history (a RuntimeWarning is raised the first time this happens).
+
+    Parameters
+    ----------
+    counters: list
+        The names of the counters to store.
+
+    capacity: int
+        The number of samples kept.
+
+    max_keys: int
+        The maximum number of keys (e.g. streams) kept. None for no limit.
+
+    """
+    def __init__(self, counters, capacity=600, max_keys=10000):
+        self.counters = list(counters)
+        self.capacity = capacity
+        self.max_keys = max_keys
+        self.dropped_keys = set()
+
+        self.keys = []
+        self.key_indexes = {}
+        self.width = 0
+
+        self.times = array.array("d", [0.0] * capacity)
+        self.data = {}
+        for counter in self.counters:
+            self.data[counter] = array.array("d")
+
+        # The slot that the next sample is written to, and the number of valid samples.
+        self.next_slot = 0
+        self.count = 0
+
+        return
+
+    def add_keys(self, keys):
+        new_keys = [key for key in keys if key not in self.key_indexes and key not in self.dropped_keys]
+        if self.max_keys is not None and len(self.keys) + len(new_keys) > self.max_keys:
+            kept_count = max(self.max_keys - len(self.keys), 0)
+            if not self.dropped_keys:
+                warnings.warn("The history is limited to " + str(self.max_keys) + " keys. The values of the other keys are not kept.", RuntimeWarning)
+            self.dropped_keys.update(new_keys[kept_count:])
+            new_keys = new_keys[:kept_count]
+
+        if not new_keys:
+            return
+
+        old_width = self.width
+        for key in new_keys:
+            self.key_indexes[key] = len(self.keys)
+            self.keys.append(key)
+        self.width = len(self.keys)
+
+        # Widen each array, keeping the existing samples. Missing values are NaN. The array
+        # is repeated in C, rather than built from a list of capacity * width floats.
+        for counter in self.counters:
+            old_data = self.data[counter]
+            new_data = array.array("d", [float("nan")]) * (self.capacity * self.width)
+            if old_width:
+                for slot in range(self.capacity):
+                    new_data[slot * self.width:slot * self.width + old_width] = old_data[slot * old_width:(slot + 1) * old_width]
+            self.data[counter] = new_data
+
+        return
+
+    def append(self, sample_time, values):
+        """Add a sample.
+
+        Parameters
+        ----------
+        sample_time: float
+            The time of the sample (seconds since the epoch).
+
+        values: dict
+            The value of each counter, keyed by key and then counter name.
+
+        """
+        self.add_keys(values.keys())
+
+        slot = self.next_slot
+        offset = slot * self.width
+        empty_row = array.array("d", [float("nan")]) * self.width
+
+        for counter in self.counters:
+            data = self.data[counter]
+            data[offset:offset + self.width] = empty_row
+            for key, entry in values.items():
+                key_index = self.key_indexes.get(key)
+                value = entry.get(counter)
+                if key_index is not None and value is not None:
+                    data[offset + key_index] = value
+
+        self.times[slot] = sample_time
+
+        self.next_slot = (slot + 1) % self.capacity
+        self.count = min(self.count + 1, self.capacity)
+
+        return
+
+    def get_memory_size(self):
+        # Returns the number of bytes used by the sample arrays.
+        return (len(self.times) + sum(len(data) for data in self.data.values())) * 8
+
+    def get_slots(self, since=None):
+        # Returns the valid slots, oldest first, optionally only those at or after "since".
+        first_slot = (self.next_slot - self.count) % self.capacity
+        slots = [(first_slot + index) % self.capacity for index in range(self.count)]
+
+        if since is not None:
+            slots = [slot for slot in slots if self.times[slot] >= since]
+
+        return slots
+
+    def get_history(self, since=None):
+        """Returns the samples at or after the specified time (all of them if None).
+
+        Returns
+        -------
+        dict
+            "times" is the list of sample times, "keys" the list of keys, and "counters"
+            holds, for each counter, one row of values (in key order) per sample. The rows
+            are NumPy arrays if NumPy is installed.
+
+        """
+        slots = self.get_slots(since)
+
+        history = {}
+        history["times"] = [self.times[slot] for slot in slots]
+        history["keys"] = list(self.keys)
+        history["counters"] = {}
+
+        numpy = get_numpy()
+
+        for counter in self.counters:
+            data = self.data[counter]
+            if numpy is not None and self.width:
+                matrix = numpy.frombuffer(data, dtype=numpy.float64).reshape(self.capacity, self.width)
+                history["counters"][counter] = matrix[slots]
+            else:
+                history["counters"][counter] = [data[slot * self.width:(slot + 1) * self.width].tolist() for slot in slots]
+
+        return history
+
+class LiveResultsStore:
+    """Append-only, on-disk store of live result samples, for analysis after the test.
+
+    The samples are buffered in memory, and written to columnar chunk files once
+    chunk_rows rows have been buffered (or when flush() is called). Each row holds
+    the sample time and key (e.g. stream ID), along with the value of each counter.
+    A chunk file holds the columns one after the other: the times and each counter
+    as doubles, and then the key indexes as 32-bit integers. The rows of each chunk
+    are sorted by time.
+
+    The index (index.json) lists the counters, the keys and the chunks, with the
+    number of rows and the time range of each one. Reads memory-map the chunk files,
+    and only the chunks that overlap the requested time range are read.
+
+    An existing store is reopened (and appended to) if the path already contains an
+    index.
+
+    Example:
+
+        store = LiveResultsStore("results/live")
+        poller = LiveResultsPoller(StreamLiveResults(iq.current_db), store=store)
+        ...
+        poller.stop()
+        store.close()
+
+        history = LiveResultsStore("results/live").read(start=test_start)
+
+    Parameters
+    ----------
+    path: str
+        The directory of the store. It is created if it doesn't exist.
+
+    counters: list
+        The numeric counters to store. Ignored when an existing store is reopened.
+        Defaults to LiveResultsPoller.default_counters.
+
+    chunk_rows: int
+        The number of rows in each chunk file.
+
+    """
+    index_filename = "index.json"
+
+    def __init__(self, path, counters=None, chunk_rows=100000):
+        self.path = path
+        self.chunk_rows = chunk_rows
+
+        self.lock = threading.Lock()
+
+        # The open memory maps of the chunk files, keyed by filename.
+        self.maps = {}
+
+        os.makedirs(path, exist_ok=True)
+
+        index_filename = os.path.join(path, LiveResultsStore.index_filename)
+        if os.path.isfile(index_filename):
+            with open(index_filename) as index_file:
+                self.index = json.load(index_file)
+        else:
+            if counters is None:
+                counters = LiveResultsPoller.default_counters
+            self.index = {"version": 1, "counters": list(counters), "keys": [], "chunks": []}
+
+        self.counters = self.index["counters"]
+
+        # Keys are stored as indexes into index["keys"]. JSON turns tuples into lists, so
+        # self.keys holds the (hashable) keys that are returned by get_keys() and read().
+        self.keys = [self.get_hashable_key(key) for key in self.index["keys"]]
+        self.key_indexes = {}
+        for key_index, key in enumerate(self.keys):
+            self.key_indexes[key] = key_index
+
+        self.reset_buffer()
+
+        return
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+        return
+
+    def get_hashable_key(self, key):
+        if isinstance(key, list):
+            return tuple(key)
+        return key
+
+    def reset_buffer(self):
+        self.buffer_times = array.array("d")
+        self.buffer_keys = array.array("i")
+        self.buffer_values = {}
+        for counter in self.counters:
+            self.buffer_values[counter] = array.array("d")
+        return
+
+    def append(self, sample_time, values):
+        """Add a sample.
+
+        Parameters
+        ----------
+        sample_time: float
+            The time of the sample (seconds since the epoch).
+
+        values: dict
+            The row of each key (a dict keyed by counter name), e.g. the "values" of a
+            LiveResultsPoller sample. Missing and non-numeric values are stored as NaN.
+
+        """
+        nan = float("nan")
+
+        with self.lock:
+            for key, row in values.items():
+                key = self.get_hashable_key(key)
+                key_index = self.key_indexes.get(key)
+                if key_index is None:
+                    key_index = len(self.keys)
+                    self.keys.append(key)
+                    self.index["keys"].append(key)
+                    self.key_indexes[key] = key_index
+
+                self.buffer_times.append(sample_time)
+                self.buffer_keys.append(key_index)
+                for counter in self.counters:
+                    value = row.get(counter)
+                    if not isinstance(value, (int, float)):
+                        value = nan
+                    self.buffer_values[counter].append(value)
+
+            if len(self.buffer_times) >= self.chunk_rows:
+                self.write_chunk()
+
+        return
+
+    def flush(self):
+        """Write the buffered rows to a chunk file.
+        """
+        with self.lock:
+            self.write_chunk()
+        return
+
+    def write_chunk(self):
+        # The lock must be held.
+        row_count = len(self.buffer_times)
+        if not row_count:
+            return
+
+        order = sorted(range(row_count), key=self.buffer_times.__getitem__)
+
+        filename = "chunk_%06d.bin" % len(self.index["chunks"])
+        temp_filename = os.path.join(self.path, filename + ".tmp")
+        with open(temp_filename, "wb") as chunk_file:
+            array.array("d", [self.buffer_times[row] for row in order]).tofile(chunk_file)
+            for counter in self.counters:
+                values = self.buffer_values[counter]
+                array.array("d", [values[row] for row in order]).tofile(chunk_file)
+            array.array("i", [self.buffer_keys[row] for row in order]).tofile(chunk_file)
+        os.replace(temp_filename, os.path.join(self.path, filename))
+
+        chunk = {}
+        chunk["file"] = filename
+        chunk["rows"] = row_count
+        chunk["start"] = self.buffer_times[order[0]]
+        chunk["end"] = self.buffer_times[order[-1]]
+        self.index["chunks"].append(chunk)
+
+        self.write_index()
+        self.reset_buffer()
+
+        return
+
+    def write_index(self):
+        index_filename = os.path.join(self.path, LiveResultsStore.index_filename)
+        with open(index_filename + ".tmp", "w") as index_file:
+            json.dump(self.index, index_file)
+        os.replace(index_filename + ".tmp", index_filename)
+        return
+
+    def get_map(self, filename):
+        if filename not in self.maps:
+            with open(os.path.join(self.path, filename), "rb") as chunk_file:
+                self.maps[filename] = mmap.mmap(chunk_file.fileno(), 0, access=mmap.ACCESS_READ)
+        return self.maps[filename]
+
+    def get_columns(self, chunk):
+        # Returns the columns of a chunk file, as memoryviews of the memory map.
+        row_count = chunk["rows"]
+        view = memoryview(self.get_map(chunk["file"]))
+
+        columns = {}
+        columns["time"] = view[0:8 * row_count].cast("d")
+        for index, counter in enumerate(self.counters):
+            offset = 8 * row_count * (index + 1)
+            columns[counter] = view[offset:offset + 8 * row_count].cast("d")
+        offset = 8 * row_count * (len(self.counters) + 1)
+        columns["key"] = view[offset:offset + 4 * row_count].cast("i")
+
+        return columns
+
+    def read(self, start=None, end=None, keys=None, counters=None):
+        """Returns the rows with a time in the range [start, end], in time order.
+
+        Parameters
+        ----------
+        start: float
+            The earliest time (seconds since the epoch). None for no limit.
+
+        end: float
+            The latest time. None for no limit.
+
+        keys: list
+            Only return the rows of these keys (as returned by get_keys()). None for all keys.
+
+        counters: list
+            Only return these counters. None for all counters.
+
+        Returns
+        -------
+        dict
+            "times" holds the time of each row, "keys" the key of each row, and
+            "counters" the values of each counter. The times and values are NumPy
+            arrays if NumPy is installed, and otherwise arrays of doubles.
+
+        """
+        if counters is None:
+            counters = self.counters
+        for counter in counters:
+            if counter not in self.counters:
+                raise KeyError("The counter '" + counter + "' is not in the store.")
+
+        key_filter = None
+        if keys is not None:
+            key_filter = set()
+            for key in keys:
+                key = self.get_hashable_key(key)
+                if key in self.key_indexes:
+                    key_filter.add(self.key_indexes[key])
+
+        times = array.array("d")
+        key_indexes = array.array("i")
+        values = {}
+        for counter in counters:
+            values[counter] = array.array("d")
+
+        with self.lock:
+            sources = []
+            for chunk in self.index["chunks"]:
+                if (start is not None and chunk["end"] < start) or (end is not None and chunk["start"] > end):
+                    continue
+                sources.append(self.get_columns(chunk))
+
+            # The buffered rows are in time order too (the samples are appended in order).
+            if len(self.buffer_times):
+                buffered = {}
+                for counter, column in self.buffer_values.items():
+                    buffered[counter] = memoryview(column)
+                buffered["time"] = memoryview(self.buffer_times)
+                buffered["key"] = memoryview(self.buffer_keys)
+                sources.append(buffered)
+
+            for columns in sources:
+                first_row = 0 if start is None else bisect.bisect_left(columns["time"], start)
+                last_row = len(columns["time"]) if end is None else bisect.bisect_right(columns["time"], end)
+
+                if key_filter is None:
+                    # Copied straight out of the memory map.
+                    times.frombytes(columns["time"][first_row:last_row].cast("B"))
+                    key_indexes.frombytes(columns["key"][first_row:last_row].cast("B"))
+                    for counter in counters:
+                        values[counter].frombytes(columns[counter][first_row:last_row].cast("B"))
+                else:
+                    rows = [row for row in range(first_row, last_row) if columns["key"][row] in key_filter]
+                    times.extend([columns["time"][row] for row in rows])
+                    key_indexes.extend([columns["key"][row] for row in rows])
+                    for counter in counters:
+                        column = columns[counter]
+                        values[counter].extend([column[row] for row in rows])
+
+            all_keys = self.keys
+
+            # The views must be released before the buffers can grow (or the maps be closed).
+            for columns in sources:
+                for column in columns.values():
+                    column.release()
+
+        result = {}
+        result["times"] = times
+        result["keys"] = [all_keys[key_index] for key_index in key_indexes]
+        result["counters"] = values
+
+        numpy = get_numpy()
+        if numpy is not None:
+            result["times"] = numpy.frombuffer(times, dtype=numpy.float64)
+            for counter in counters:
+                result["counters"][counter] = numpy.frombuffer(values[counter], dtype=numpy.float64)
+
+        return result
+
+    def get_time_range(self):
+        # Returns the (earliest, latest) time in the store, or None if it is empty.
+        with self.lock:
+            starts = [chunk["start"] for chunk in self.index["chunks"]]
+            ends = [chunk["end"] for chunk in self.index["chunks"]]
+            if len(self.buffer_times):
+                starts.append(min(self.buffer_times))
+                ends.append(max(self.buffer_times))
+
+        if not starts:
+            return None
+        return (min(starts), max(ends))
+
+    def get_keys(self):
+        # Returns the keys in the store. Keys that are lists or tuples are returned as tuples.
+        with self.lock:
+            return list(self.keys)
+
+    def close(self):
+        """Write the buffered rows, and close the memory maps.
+        """
+        self.flush()
+        with self.lock:
+            for memory_map in self.maps.values():
+                memory_map.close()
+            self.maps = {}
+        return
+
+class LiveResultsPoller:
+    """Refreshes a live Results object on a fixed interval, in a background thread.
+
+    Each sample is stored in a LiveResultsRingBuffer. The latest sample is also kept
+    as a plain dictionary, which is replaced (never modified) on each poll, so it can
+    be read without waiting for a refresh.
+
+    The Results object must have a result_data that is keyed by a key and then by
+    timestamp, like StreamLiveResults.
+
+    Example:
+
+        poller = LiveResultsPoller(StreamLiveResults(iq.current_db), interval=1)
+        poller.start()
+        rate = poller.get_latest_value(stream_id, "rx_stream_live_stats_sig_frame_rate")
+        history = poller.get_history(seconds=30)
+        poller.stop()
+
+    Parameters
+    ----------
+    results: class
+        The Results object to refresh (e.g. StreamLiveResults).
+
+    interval: float
+        The number of seconds between polls.
+
+    capacity: int
+        The number of samples kept in the history.
+
+    counters: list
+        The numeric counters to keep in the history. Defaults to the stream rates,
+        counts and latency.
+
+    max_keys: int
+        The maximum number of keys (e.g. streams) kept in the history. See
+        LiveResultsRingBuffer for its memory use.
+
+    store: LiveResultsStore
+        An optional LiveResultsStore. Every sample is also appended to it, so the
+        complete history is kept on disk.
+
+    """
+    default_counters = ["tx_stream_live_stats_frame_count",
+                        "tx_stream_live_stats_frame_rate",
+                        "rx_stream_live_stats_sig_frame_count",
+                        "rx_stream_live_stats_sig_frame_rate",
+                        "rx_stream_live_stats_avg_latency"]
+
+    def __init__(self, results, interval=1.0, capacity=600, counters=None, store=None, max_keys=10000):
+        self.results = results
+        self.interval = interval
+        self.store = store
+
+        if counters is None:
+            counters = LiveResultsPoller.default_counters
+
+        self.history = LiveResultsRingBuffer(counters, capacity, max_keys=max_keys)
+
+        # Only held while a sample is being stored or read, never during a refresh.
+        self.lock = threading.Lock()
+
+        self.latest = None
+        self.poll_count = 0
+        self.error_count = 0
+        self.last_error = None
+
+        self.thread = None
+        self.stop_event = threading.Event()
+
+        return
+
+    def start(self):
+        if self.is_running():
+            return
+
+        self.stop_event.clear()
+        self.thread = threading.Thread(target=self.run, name="LiveResultsPoller", daemon=True)
+        self.thread.start()
+
+        return
+
+    def stop(self, timeout=None):
+        self.stop_event.set()
+        if self.thread:
+            self.thread.join(timeout)
+        self.thread = None
+        return
+
+    def is_running(self):
+        return self.thread is not None and self.thread.is_alive()
+
+    def run(self):
+        # The polls are scheduled on a fixed interval, regardless of how long each refresh takes.
+        next_poll = time.monotonic()
+        while not self.stop_event.is_set():
+            try:
+                self.poll()
+            except Exception as error:
+                self.error_count += 1
+                self.last_error = error
+
+            next_poll += self.interval
+            delay = next_poll - time.monotonic()
+            if delay < 0:
+                # The refresh took longer than the interval. Skip the missed polls.
+                next_poll = time.monotonic()
+                delay = 0
+
+            self.stop_event.wait(delay)
+
+        return
+
+    def poll(self):
+        """Refresh the results once, and store the sample.
+        """
+        result_data = self.results.refresh()
+        sample_time = time.time()
+
+        values = {}
+        for key, samples in result_data.items():
+            timestamps = [timestamp for timestamp in samples.keys() if timestamp]
+            if timestamps:
+                values[key] = samples[max(timestamps)]
+
+        latest = {}
+        latest["time"] = sample_time
+        latest["values"] = values
+
+        with self.lock:
+            self.history.append(sample_time, values)
+            self.latest = latest
+            self.poll_count += 1
+
+        if self.store is not None:
+            self.store.append(sample_time, values)
+
+        return latest
+
+    def get_latest(self):
+        """Returns the latest sample, or None if there isn't one yet.
+
+        The sample is a dict with "time" (seconds since the epoch) and "values", which
+        holds the row of each key.
+        """
+        return self.latest
+
+    def get_latest_value(self, key, counter):
+        latest = self.latest
+        if latest is None or key not in latest["values"]:
+            return None
+        return latest["values"][key].get(counter)
+
+    def get_history(self, seconds=None):
+        """Returns the samples from the last number of seconds (or all of them).
+        See LiveResultsRingBuffer.get_history().
+        """
+        since = None
+        if seconds is not None:
+            since = time.time() - seconds
+
+        with self.lock:
+            return self.history.get_history(since)
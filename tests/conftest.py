@@ -0,0 +1,34 @@
+"""Shared fixtures. The tests run against the IQ stand-in server (benchmarks/iqserver.py).
+"""
+
+import os.path
+import sys
+
+import pytest
+
+TESTS_PATH = os.path.dirname(os.path.abspath(__file__))
+REPO_PATH = os.path.dirname(TESTS_PATH)
+sys.path.insert(0, REPO_PATH)
+sys.path.insert(0, os.path.join(REPO_PATH, "benchmarks"))
+
+import iqserver
+import spirenttestcenteriq
+
+@pytest.fixture
+def server():
+    server = iqserver.IqStandInServer(streams=100).start()
+    yield server
+    server.stop()
+
+@pytest.fixture
+def iq(server):
+    iq = spirenttestcenteriq.SpirentTestCenterIQ("127.0.0.1", server.port)
+    yield iq
+    iq.close()
+
+@pytest.fixture
+def db(iq):
+    return iq.db_list[0]
+
+def get_query_count(server):
+    return server.request_counts.get("queries", 0)
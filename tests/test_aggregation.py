@@ -0,0 +1,89 @@
+import pytest
+
+import spirenttestcenteriq
+
+@pytest.fixture
+def query(db):
+    return spirenttestcenteriq.IqSingleQuery(db, iq_set_name="tx_stream_live_stats")
+
+def test_group_by_and_aggregates(query):
+    alias = query.add_aggregate("sum", "frame_count")
+    query.add_group_by("port_name")
+    query.add_aggregate("count")
+
+    definition = query.get_query()
+
+    assert alias == "sum_tx_stream_live_stats_frame_count"
+    assert definition["groups"] == ["port.name"]
+    # The group by columns are projected before the aggregates.
+    assert definition["projections"] == ["port.name AS port_name",
+                                         "sum(tx_stream_live_stats.frame_count) AS sum_tx_stream_live_stats_frame_count",
+                                         "count(*) AS row_count"]
+    assert query.get_columns() == ["port_name", "sum_tx_stream_live_stats_frame_count", "row_count"]
+    assert query.get_column_types()["row_count"] == "uint64"
+
+def test_group_by_alias_used_by_aggregate(query):
+    query.add_aggregate("count", alias="port_name")
+
+    with pytest.raises(ValueError, match="already used"):
+        query.add_group_by("port_name")
+    assert query.group_by == []
+
+def test_aggregate_orders_follow_user_orders(query):
+    query.add_group_by(["port_name"])
+    alias = query.add_aggregate("max", "frame_rate")
+    query.add_order("port.name ASC")
+    query.add_aggregate_order(alias, "desc")
+
+    assert query.get_query()["orders"] == ["port.name ASC", "max(tx_stream_live_stats.frame_rate) DESC"]
+
+def test_add_order_appends(query):
+    query.add_order("port.name ASC")
+    query.add_order("tx_stream.stream_id DESC")
+
+    assert query.get_query()["orders"] == ["port.name ASC", "tx_stream.stream_id DESC"]
+
+def test_aggregated_query_executes(query):
+    query.add_group_by("port_name")
+    query.add_aggregate("count")
+
+    result = query.execute()
+
+    assert result["result"]["columns"] == ["port_name", "row_count"]
+    assert len(result["result"]["rows"]) == 16
+
+def test_delete_aggregation_restores_columns(query):
+    columns = list(query.get_columns())
+    query.add_group_by("port_name")
+    query.add_aggregate("count")
+
+    query.delete_aggregation()
+
+    assert query.get_columns() == columns
+    assert query.get_query()["groups"] == []
+
+def test_group_by_fact_is_rejected(query):
+    with pytest.raises(ValueError):
+        query.add_group_by("frame_count")
+
+def test_sum_of_dimension_is_rejected(query):
+    with pytest.raises(ValueError):
+        query.add_aggregate("sum", "port_name")
+
+def test_unknown_function_is_rejected(query):
+    with pytest.raises(ValueError):
+        query.add_aggregate("median", "frame_count")
+
+def test_count_requires_no_column_but_others_do(query):
+    with pytest.raises(ValueError):
+        query.add_aggregate("sum")
+
+def test_duplicate_alias_is_rejected(query):
+    query.add_aggregate("count")
+    with pytest.raises(ValueError):
+        query.add_aggregate("count")
+
+def test_order_by_unknown_alias_is_rejected(query):
+    query.add_aggregate("count")
+    with pytest.raises(Exception):
+        query.add_aggregate_order("frame_count")
@@ -0,0 +1,61 @@
+import asyncio
+
+import spirenttestcenteriqasync
+
+def run(server, coroutine_function):
+    async def main():
+        async with spirenttestcenteriqasync.AsyncSpirentTestCenterIQ("127.0.0.1", server.port) as iq:
+            return await coroutine_function(iq)
+    return asyncio.run(main())
+
+def test_execute_view_query(server):
+    async def execute(iq):
+        return await iq.execute_view_query("Stream Results")
+
+    assert len(run(server, execute)["result"]["rows"]) == 100
+
+def test_iter_pages_stops_at_limit(server):
+    async def get_page_sizes(iq):
+        query = spirenttestcenteriqasync.AsyncIqSingleQuery(iq.db_list[0], iq_set_name="tx_stream_live_stats")
+        query.add_limit(25)
+        return [len(page["result"]["rows"]) async for page in query.iter_pages(page_size=10)]
+
+    assert run(server, get_page_sizes) == [10, 10, 5]
+
+def test_client_used_from_several_event_loops(server):
+    iq = spirenttestcenteriqasync.AsyncSpirentTestCenterIQ("127.0.0.1", server.port)
+
+    async def execute():
+        if not iq.db_list:
+            await iq.connect()
+        return await iq.execute_view_query("Stream Results")
+
+    assert len(asyncio.run(execute())["result"]["rows"]) == 100
+    assert len(asyncio.run(execute())["result"]["rows"]) == 100
+
+    asyncio.run(iq.close())
+
+def test_export_snapshot(server, tmp_path):
+    async def export(iq):
+        query = iq.get_view_definition("Stream Results")
+        return await iq.export_snapshot(query, str(tmp_path / "query.snap"), db_id=iq.db_list[0].id)
+
+    with run(server, export) as snapshot:
+        assert len(snapshot) == 100
+
+def test_export_view_snapshot(server, tmp_path):
+    async def export(iq):
+        snapshot = await iq.export_view_snapshot("Stream Results", str(tmp_path / "view.snap"), db_id=iq.db_list[0].id)
+        return snapshot, await iq.execute_view_query("Stream Results", db_id=iq.db_list[0].id)
+
+    snapshot, raw_data = run(server, export)
+    with snapshot:
+        assert snapshot.to_raw()["result"] == raw_data["result"]
+
+def test_execute_many_labels(server):
+    async def execute(iq):
+        return await iq.execute_many(["Stream Results", iq.get_view_definition("Stream Results")], db_ids=[iq.db_list[0].id])
+
+    results = run(server, execute)
+    assert [result["label"] for result in results] == ["Stream Results", "query_1"]
+    assert all(len(result["result"]["result"]["rows"]) == 100 for result in results)
@@ -0,0 +1,34 @@
+import pytest
+
+import spirenttestcenteriq
+
+def get_query(db, limit):
+    query = spirenttestcenteriq.IqSingleQuery(db, iq_set_name="tx_stream_live_stats")
+    query.add_limit(limit)
+    return query.compile()
+
+def test_results_in_query_order(iq, db):
+    results = iq.execute_many([get_query(db, limit) for limit in (30, 10, 20)], db_ids=[db.id], max_workers=3)
+
+    assert [len(result["result"]["result"]["rows"]) for result in results] == [30, 10, 20]
+    assert [result["label"] for result in results] == ["query_0", "query_1", "query_2"]
+
+def test_failure_does_not_abort_batch(iq, db):
+    results = iq.execute_many(["Stream Results", "No Such View"], db_ids=[db.id])
+
+    assert len(results[0]["result"]["result"]["rows"]) == 100
+    assert results[0]["error"] is None
+    assert results[1]["result"] is None
+    assert isinstance(results[1]["error"], KeyError)
+
+def test_labels_reach_metrics(iq, db):
+    views = []
+    iq.metrics.add_sink(spirenttestcenteriq.IqCallbackSink(lambda name, value, labels: views.append(labels["view"]) if name == "request_seconds" else None))
+
+    iq.execute_many(["Stream Results", get_query(db, 5)], db_ids=[db.id], labels=["streams", "first_five"], max_workers=1)
+
+    assert views == ["streams", "first_five"]
+
+def test_one_label_per_query(iq, db):
+    with pytest.raises(ValueError):
+        iq.execute_many(["Stream Results"], db_ids=[db.id], labels=["a", "b"])
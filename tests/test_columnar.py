@@ -0,0 +1,53 @@
+import math
+
+import numpy
+
+import spirenttestcenteriq
+
+RAW_DATA = {"result": {"columns": ["name", "count", "rate", "missing", "flag"],
+                       "rows": [["a", 1, 1.5, 7, True],
+                                ["b", 2, 2.5, None, None],
+                                ["c", 3, None, 9, False]]}}
+
+COLUMN_TYPES = {"name": "string", "count": "uint64", "rate": "double", "missing": "int32", "flag": "bool"}
+
+def test_column_dtypes():
+    result = spirenttestcenteriq.IqColumnarResult.from_raw(RAW_DATA, COLUMN_TYPES)
+
+    assert len(result) == 3
+    assert result["name"] == ["a", "b", "c"]
+    assert result["count"].dtype == numpy.uint64
+    assert result["rate"].dtype == numpy.float64 and math.isnan(result["rate"][2])
+    # Missing integers are stored as NaN, and bools with missing values as a list.
+    assert result["missing"].dtype == numpy.float64 and math.isnan(result["missing"][1])
+    assert result["flag"] == [True, None, False]
+
+def test_untyped_columns_are_lists():
+    result = spirenttestcenteriq.IqColumnarResult.from_raw(RAW_DATA)
+
+    assert all(isinstance(result[column], list) for column in result.columns)
+
+def test_round_trip():
+    result = spirenttestcenteriq.IqColumnarResult.from_raw(RAW_DATA, COLUMN_TYPES)
+
+    assert result.to_raw() == RAW_DATA
+    assert result.get_row(0) == ("a", 1, 1.5, 7, True)
+
+def test_filter_and_slice():
+    result = spirenttestcenteriq.IqColumnarResult.from_raw(RAW_DATA, COLUMN_TYPES)
+
+    filtered = result.filter(result["count"] > 1)
+    assert filtered["name"] == ["b", "c"]
+    assert list(filtered["count"]) == [2, 3]
+    assert result.slice(1)["name"] == ["b", "c"]
+
+def test_query_columnar_result(db):
+    query = spirenttestcenteriq.IqSingleQuery(db, iq_set_name="tx_stream_live_stats")
+    result = query.execute(columnar=True)
+
+    assert len(result) == 100
+    assert result["tx_stream_live_stats_frame_count"].dtype == numpy.uint64
+    assert result["tx_stream_live_stats_frame_rate"].dtype == numpy.float64
+    # The stand-in server stamps each response with the current time.
+    rows = query.execute()["result"]["rows"]
+    assert [row[1:] for row in result.to_raw()["result"]["rows"]] == [row[1:] for row in rows]
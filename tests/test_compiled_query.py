@@ -0,0 +1,49 @@
+import json
+
+import pytest
+
+import spirenttestcenteriq
+
+@pytest.fixture
+def query(db):
+    return spirenttestcenteriq.IqSingleQuery(db, iq_set_name="tx_stream_live_stats")
+
+def test_compiled_query_is_reused(query):
+    compiled_query = query.compile()
+
+    assert query.compile() is compiled_query
+    assert json.loads(compiled_query.json) == compiled_query.definition
+
+@pytest.mark.parametrize("mutate", [lambda query: query.add_filter("port.name = 'Port //1/1'"),
+                                    lambda query: query.add_order("port.name ASC"),
+                                    lambda query: query.add_limit(10),
+                                    lambda query: query.add_group_by("port_name")])
+def test_mutation_invalidates(query, mutate):
+    compiled_query = query.compile()
+    mutate(query)
+
+    assert query.compile() is not compiled_query
+    assert query.compile().definition != compiled_query.definition
+
+def test_latest_is_compiled_separately(query):
+    assert query.compile(latest=True) is not query.compile()
+    assert query.compile(latest=True) is query.compile(latest=True)
+
+def test_subquery_mutation_invalidates_multiquery(db):
+    multiquery = spirenttestcenteriq.IqMultiQuery(db, ["tx_stream_live_stats", "rx_stream_live_stats"])
+    compiled_query = multiquery.compile()
+
+    multiquery.subqueries[0].add_filter("port.name = 'Port //1/1'")
+
+    assert multiquery.compile() is not compiled_query
+    assert "port.name = 'Port //1/1'" in json.dumps(multiquery.compile().definition)
+
+def test_definition_copy_does_not_change_the_query(query):
+    query.get_definition()["single_result"]["limit"] = 5
+
+    assert query.get_definition()["single_result"]["limit"] is None
+
+def test_compiled_query_executes(iq, db, query):
+    query.add_limit(10)
+
+    assert len(iq.execute_query(query.compile(), db_id=db.id)["result"]["rows"]) == 10
@@ -0,0 +1,69 @@
+import pytest
+
+import iqserver
+import spirenttestcenteriq
+
+@pytest.fixture
+def servers():
+    servers = []
+    def start(**kwargs):
+        servers.append(iqserver.IqStandInServer(**kwargs).start())
+        return servers[-1]
+    yield start
+    for server in servers:
+        server.stop()
+
+def connect(server, **kwargs):
+    return spirenttestcenteriq.SpirentTestCenterIQ("127.0.0.1", server.port, **kwargs)
+
+def test_details_fetched_concurrently(servers):
+    server = servers(databases=4, latency=0.2)
+    iq = connect(server, discovery_workers=4)
+
+    assert [db.id for db in iq.db_list] == ["db0", "db1", "db2", "db3"]
+    assert iq.discovery_stats["databases"] == 4
+    assert iq.discovery_stats["requests"] == 5
+    assert server.request_counts["database"] == 4
+    # Fetched one at a time, the details alone would take 0.8 seconds.
+    assert iq.discovery_stats["duration"] < 0.8
+
+def test_lazy_discovery(servers):
+    server = servers(databases=2)
+    iq = connect(server, lazy_discovery=True)
+
+    assert iq.discovery_stats["requests"] == 1
+    assert "database" not in server.request_counts
+    assert iq.db_list[0].name == "standin_db0"
+
+    # The details are only fetched for the database that is used, and only once.
+    assert iq.db_list[0].find_set_by_name("tx_stream_live_stats") is not None
+    iq.db_list[0].find_set_by_name("port")
+    assert server.request_counts["database"] == 1
+    assert iq.db_list[0].info["id"] == "db0"
+    assert not iq.db_list[1].loaded
+
+def test_catalog_cache_round_trip(servers, tmp_path):
+    server = servers(databases=2)
+    first_iq = connect(server, catalog_cache_dir=str(tmp_path))
+    second_iq = connect(server, catalog_cache_dir=str(tmp_path))
+
+    assert first_iq.discovery_stats["cache_hits"] == 0
+    assert second_iq.discovery_stats["cache_hits"] == 2
+    assert second_iq.discovery_stats["requests"] == 1
+    assert server.request_counts["database"] == 2
+    assert [db.info for db in second_iq.db_list] == [db.info for db in first_iq.db_list]
+    assert second_iq.db_list[0].find_set_by_name("tx_stream_live_stats") is not None
+
+def test_catalog_cache_invalidated_by_update(servers, tmp_path):
+    server = servers(databases=2)
+    connect(server, catalog_cache_dir=str(tmp_path))
+
+    server.databases["db1"]["last_updated"] = "2030-01-01T00:00:00.000000Z"
+    iq = connect(server, catalog_cache_dir=str(tmp_path))
+
+    assert iq.discovery_stats["cache_hits"] == 1
+    assert server.request_counts["database"] == 3
+    assert iq.db_list[1].last_updated == "2030-01-01T00:00:00.000000Z"
+
+    # The refreshed details replace the stale entry.
+    assert connect(server, catalog_cache_dir=str(tmp_path)).discovery_stats["cache_hits"] == 2
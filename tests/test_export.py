@@ -0,0 +1,48 @@
+import pytest
+
+import spirenttestcenteriq
+
+def test_page_cursor_rejects_oversized_page():
+    cursor = spirenttestcenteriq.IqPageCursor({"single_result": {}}, page_size=2)
+    with pytest.raises(RuntimeError):
+        cursor.add_page({"result": {"rows": [[1], [2], [3]]}})
+
+def test_page_cursor_rejects_repeated_page():
+    cursor = spirenttestcenteriq.IqPageCursor({"single_result": {}}, page_size=2)
+    cursor.add_page({"result": {"rows": [[1], [2]]}})
+    with pytest.raises(RuntimeError):
+        cursor.add_page({"result": {"rows": [[1], [2]]}})
+
+def test_page_cursor_accepts_pages_that_differ_only_in_timestamps():
+    # The counters of a stopped stream don't change between samples.
+    columns = ["stream_id", "frame_count", "tx_stream_live_stats_timestamp"]
+    cursor = spirenttestcenteriq.IqPageCursor({"single_result": {}}, page_size=2)
+
+    cursor.add_page({"result": {"columns": columns, "rows": [[1, 100, "t0"], [1, 100, "t1"]]}})
+    cursor.add_page({"result": {"columns": columns, "rows": [[1, 100, "t2"], [1, 100, "t3"]]}})
+
+    assert cursor.offset == 4
+    assert not cursor.done
+
+def test_export_query_ignoring_pagination_fails(iq, db, server, tmp_path, monkeypatch):
+    # A server that ignores the pagination returns the whole result for every page.
+    execute_query = server.execute_query
+    def execute_query_without_pagination(payload):
+        for definition in payload["definition"].values():
+            definition["pagination"] = None
+        return execute_query(payload)
+    monkeypatch.setattr(server, "execute_query", execute_query_without_pagination)
+
+    query = spirenttestcenteriq.IqSingleQuery(db, iq_set_name="tx_stream_live_stats")
+    with pytest.raises(RuntimeError):
+        iq.export_query(query.get_definition(), str(tmp_path / "export.csv"), page_size=30)
+
+def test_export_query(iq, db, tmp_path):
+    query = spirenttestcenteriq.IqSingleQuery(db, iq_set_name="tx_stream_live_stats")
+    filename = tmp_path / "export.csv"
+
+    stats = iq.export_query(query.get_definition(), str(filename), page_size=30)
+
+    assert stats["rows"] == 100
+    assert stats["pages"] == 4
+    assert len(filename.read_text().splitlines()) == 101
@@ -0,0 +1,46 @@
+import asyncio
+
+import pytest
+
+import spirenttestcenteriq
+import spirenttestcenteriqasync
+
+def fail_queries(server, monkeypatch):
+    # The stand-in server answers with HTTP 400 when the query fails.
+    def execute_query(payload):
+        raise Exception("The query failed.")
+    monkeypatch.setattr(server, "execute_query", execute_query)
+    return
+
+def test_sync_http_error_raises(iq):
+    with pytest.raises(RuntimeError, match="Not found"):
+        iq.get_db_info("missing")
+
+def test_sync_query_error_raises(iq, db, server, monkeypatch):
+    fail_queries(server, monkeypatch)
+    query = spirenttestcenteriq.IqSingleQuery(db, iq_set_name="tx_stream_live_stats")
+
+    with pytest.raises(RuntimeError, match="The query failed."):
+        query.execute()
+
+def test_sync_page_error_raises(db, server, monkeypatch):
+    fail_queries(server, monkeypatch)
+    query = spirenttestcenteriq.IqSingleQuery(db, iq_set_name="tx_stream_live_stats")
+
+    with pytest.raises(RuntimeError, match="The query failed."):
+        list(query.iter_pages(page_size=10))
+
+def test_sync_stream_error_raises(iq, db, server, monkeypatch):
+    fail_queries(server, monkeypatch)
+    query = spirenttestcenteriq.IqSingleQuery(db, iq_set_name="tx_stream_live_stats")
+
+    with pytest.raises(RuntimeError, match="The query failed."):
+        iq.execute_query(query.get_definition(), db_id=db.id, stream=True)
+
+def test_async_http_error_raises(server):
+    async def get_missing_database():
+        async with spirenttestcenteriqasync.AsyncSpirentTestCenterIQ("127.0.0.1", server.port) as iq:
+            return await iq.get_db_info("missing")
+
+    with pytest.raises(RuntimeError, match="Not found"):
+        asyncio.run(get_missing_database())
@@ -0,0 +1,45 @@
+import pytest
+
+import spirenttestcenteriq
+
+COLUMNS = ["port", "stream", "ts", "count"]
+ROWS = [["p1", 1, "t0", 5],
+        ["p1", 1, "t1", 7],
+        ["p1", 2, "t0", 3],
+        ["p2", 3, "t0", 1],
+        ["p1", 1, "t1", 8]]
+
+def build_with_deepupdate(columns, rows, key_names):
+    # The original convert_result_to_dict() algorithm: one nested dict per row, merged with deepupdate().
+    result_dict = {}
+    for row in rows:
+        entry = dict(zip(columns, row))
+        new_dict = current = {}
+        for name in key_names:
+            key_value = entry[name]
+            current[key_value] = {}
+            if name == key_names[-1]:
+                current[key_value] = entry
+            current = current[key_value]
+        spirenttestcenteriq.deepupdate(result_dict, new_dict)
+    return result_dict
+
+@pytest.mark.parametrize("key_names", [["port"], ["stream", "ts"], ["port", "stream", "ts"]])
+def test_matches_deepupdate(key_names):
+    assert spirenttestcenteriq.build_keyed_index(COLUMNS, ROWS, key_names) == build_with_deepupdate(COLUMNS, ROWS, key_names)
+
+def test_flat_and_shared_rows():
+    index = spirenttestcenteriq.build_keyed_index(COLUMNS, ROWS, ["stream", "ts"], flat=True, share_rows=True)
+
+    assert index[(1, "t1")] is ROWS[-1]
+    assert sorted(index.keys()) == [(1, "t0"), (1, "t1"), (2, "t0"), (3, "t0")]
+
+def test_unknown_key():
+    with pytest.raises(KeyError):
+        spirenttestcenteriq.build_keyed_index(COLUMNS, ROWS, ["missing"])
+
+def test_convert_result_to_dict(iq):
+    raw_data = {"result": {"columns": COLUMNS, "rows": ROWS}}
+
+    assert iq.convert_result_to_dict(raw_data, key_names=["port", "stream"]) == build_with_deepupdate(COLUMNS, ROWS, ["port", "stream"])
+    assert iq.convert_result_to_dict(raw_data)[1] == dict(zip(COLUMNS, ROWS[0]))
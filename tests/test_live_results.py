@@ -0,0 +1,44 @@
+import spirenttestcenteriqresults
+
+def test_full_refresh(db):
+    results = spirenttestcenteriqresults.StreamLiveResults(db)
+
+    result_data = results.refresh()
+
+    assert len(result_data) == 100
+    assert all(len(samples) == 1 for samples in result_data.values())
+
+def test_incremental_refresh_merges_history(db):
+    results = spirenttestcenteriqresults.StreamLiveResults(db, incremental=True)
+
+    results.refresh(latest=False)
+    result_data = results.refresh(latest=False)
+
+    # Each refresh returns a new sample for every stream, and the first is kept.
+    assert all(len(samples) == 2 for samples in result_data.values())
+    assert len(results.changed_keys) == 100
+
+def test_incremental_refresh_latest_keeps_newest_sample(db):
+    results = spirenttestcenteriqresults.StreamLiveResults(db, incremental=True)
+
+    first = {stream_id: list(samples) for stream_id, samples in results.refresh().items()}
+    result_data = results.refresh()
+
+    for stream_id, samples in result_data.items():
+        assert len(samples) == 1
+        assert list(samples)[0] > first[stream_id][0]
+
+def test_incremental_refresh_requests_new_samples_only(db, server, monkeypatch):
+    payloads = []
+    execute_query = server.execute_query
+    def record_query(payload):
+        payloads.append(payload)
+        return execute_query(payload)
+    monkeypatch.setattr(server, "execute_query", record_query)
+
+    results = spirenttestcenteriqresults.StreamLiveResults(db, incremental=True)
+    results.refresh()
+    results.refresh()
+
+    subqueries = payloads[-1]["definition"]["multi_result"]["subqueries"]
+    assert all("start" in subquery["timestamp_range"]["absolute"] for subquery in subqueries)
@@ -0,0 +1,49 @@
+import spirenttestcenteriq
+
+def test_histogram_summary():
+    sink = spirenttestcenteriq.IqHistogramSink(buckets={"rows_returned": (10, 100)})
+    for value in (5, 50, 50, 500):
+        sink.record("rows_returned", value, {"view": "v"})
+
+    summary = sink.get_summary("rows_returned")
+    assert len(summary) == 1
+    assert summary[0]["labels"] == {"view": "v"}
+    assert (summary[0]["count"], summary[0]["sum"], summary[0]["min"], summary[0]["max"]) == (4, 605, 5, 500)
+    assert 10 < summary[0]["p50"] <= 100
+    assert summary[0]["p99"] == 500
+    assert sink.histograms["rows_returned"][(("view", "v"),)]["buckets"] == [1, 2]
+
+def test_prometheus_text():
+    sink = spirenttestcenteriq.IqPrometheusSink(buckets={"request_seconds": (0.1, 1.0)})
+    sink.record("request_seconds", 0.05, {"endpoint": "queries", "view": 'a "b"'})
+    sink.record("request_seconds", 2.0, {"endpoint": "queries", "view": 'a "b"'})
+
+    assert sink.get_text().splitlines() == [
+        '# TYPE spirentiq_request_seconds histogram',
+        'spirentiq_request_seconds_bucket{endpoint="queries",view="a \\"b\\"",le="0.1"} 1',
+        'spirentiq_request_seconds_bucket{endpoint="queries",view="a \\"b\\"",le="1.0"} 1',
+        'spirentiq_request_seconds_bucket{endpoint="queries",view="a \\"b\\"",le="+Inf"} 2',
+        'spirentiq_request_seconds_sum{endpoint="queries",view="a \\"b\\""} 2.05',
+        'spirentiq_request_seconds_count{endpoint="queries",view="a \\"b\\""} 2']
+
+def test_write_text(tmp_path):
+    sink = spirenttestcenteriq.IqPrometheusSink()
+    sink.record("rows_returned", 3, {})
+    sink.write_text(str(tmp_path / "iq.prom"))
+
+    assert (tmp_path / "iq.prom").read_text() == sink.get_text()
+
+def test_client_metrics(iq, db):
+    measurements = []
+    sink = iq.metrics.add_sink(spirenttestcenteriq.IqCallbackSink(lambda name, value, labels: measurements.append((name, value, labels))))
+
+    raw_data = iq.execute_view_query("Stream Results", db_id=db.id)
+    iq.convert_result_to_dict(raw_data)
+    iq.metrics.remove_sink(sink)
+    iq.execute_view_query("Stream Results", db_id=db.id)
+
+    names = [name for name, value, labels in measurements]
+    assert names.count("request_seconds") == 1
+    assert ("rows_returned", 100, {"endpoint": "queries", "db_id": db.id, "view": "Stream Results"}) in measurements
+    assert [labels for name, value, labels in measurements if name == "method_seconds"] == [{"method": "SpirentTestCenterIQ.convert_result_to_dict"}]
+    assert not iq.metrics.enabled
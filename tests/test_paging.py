@@ -0,0 +1,54 @@
+import pytest
+
+import spirenttestcenteriq
+from conftest import get_query_count
+
+def get_page_sizes(pages):
+    return [len(page["result"]["rows"]) for page in pages]
+
+def test_iter_pages_without_limit(db):
+    query = spirenttestcenteriq.IqSingleQuery(db, iq_set_name="tx_stream_live_stats")
+    assert get_page_sizes(query.iter_pages(page_size=30)) == [30, 30, 30, 10]
+
+def test_iter_pages_stops_at_limit(db, server):
+    query = spirenttestcenteriq.IqSingleQuery(db, iq_set_name="tx_stream_live_stats")
+    query.add_limit(25)
+
+    assert get_page_sizes(query.iter_pages(page_size=10)) == [10, 10, 5]
+    assert get_query_count(server) == 3
+
+def test_iter_pages_limit_on_page_boundary(db, server):
+    query = spirenttestcenteriq.IqSingleQuery(db, iq_set_name="tx_stream_live_stats")
+    query.add_limit(20)
+
+    assert get_page_sizes(query.iter_pages(page_size=10)) == [10, 10]
+    assert get_query_count(server) == 2
+
+def test_iter_pages_zero_limit(db, server):
+    query = spirenttestcenteriq.IqSingleQuery(db, iq_set_name="tx_stream_live_stats")
+    query.add_limit(0)
+
+    assert list(query.iter_pages(page_size=10)) == []
+    assert get_query_count(server) == 0
+
+def test_iter_pages_starts_at_pagination_offset(db):
+    query = spirenttestcenteriq.IqSingleQuery(db, iq_set_name="tx_stream_live_stats")
+    query.add_pagination(offset=95, page_size=10)
+
+    assert get_page_sizes(query.iter_pages(page_size=10)) == [5]
+
+@pytest.mark.parametrize("limit", [True, -1, 1.5, "10"])
+def test_add_limit_rejects_invalid_values(db, limit):
+    query = spirenttestcenteriq.IqSingleQuery(db, iq_set_name="tx_stream_live_stats")
+    with pytest.raises(ValueError):
+        query.add_limit(limit)
+
+def test_page_cursor_requests():
+    cursor = spirenttestcenteriq.IqPageCursor({"single_result": {}}, page_size=10, offset=5, limit=15)
+    assert cursor.get_query()["single_result"]["pagination"] == {"offset": 5, "limit": 10}
+
+    cursor.add_page({"result": {"rows": [[index] for index in range(10)]}})
+    assert cursor.get_query()["single_result"]["pagination"] == {"offset": 15, "limit": 5}
+
+    cursor.add_page({"result": {"rows": [[index] for index in range(10, 15)]}})
+    assert cursor.done
@@ -0,0 +1,45 @@
+import pytest
+
+import spirenttestcenteriq
+
+def test_only_selected_columns_are_projected(db):
+    query = spirenttestcenteriq.IqSingleQuery(db, iq_set_name="tx_stream_live_stats",
+                                              columns=["frame_rate", "tx_stream_live_stats.frame_count", "port_name", "tx_stream.stream_id"])
+
+    assert query.get_query()["projections"] == ["tx_stream_live_stats.frame_rate AS tx_stream_live_stats_frame_rate",
+                                                "tx_stream_live_stats.frame_count AS tx_stream_live_stats_frame_count",
+                                                "port.name AS port_name",
+                                                "tx_stream.stream_id AS tx_stream_stream_id"]
+    assert query.get_column_types() == {"tx_stream_live_stats_frame_rate": "double", "tx_stream_live_stats_frame_count": "uint64",
+                                        "port_name": "string", "tx_stream_stream_id": "uint64"}
+
+def test_projected_query_returns_selected_columns(db):
+    query = spirenttestcenteriq.IqSingleQuery(db, iq_set_name="tx_stream_live_stats", columns=["tx_stream_stream_id", "frame_count"])
+    raw_data = query.execute()
+
+    assert raw_data["result"]["columns"] == ["tx_stream_stream_id", "tx_stream_live_stats_frame_count"]
+    assert all(len(row) == 2 for row in raw_data["result"]["rows"])
+
+def test_set_columns(db):
+    query = spirenttestcenteriq.IqSingleQuery(db, iq_set_name="tx_stream_live_stats")
+    all_columns = query.get_columns()
+    compiled_query = query.compile()
+
+    query.set_columns(["frame_count", "frame_count"])
+    assert query.get_columns() == ["tx_stream_live_stats_frame_count"]
+    assert query.compile() is not compiled_query
+
+    query.set_columns(None)
+    assert query.get_columns() == all_columns
+
+def test_unknown_column(db):
+    # Dimension attributes must be selected by alias or full name, since their names are not unique.
+    with pytest.raises(Exception, match="was not found"):
+        spirenttestcenteriq.IqSingleQuery(db, iq_set_name="tx_stream_live_stats", columns=["name"])
+
+def test_multiquery_columns(db):
+    query = spirenttestcenteriq.IqMultiQuery(db, ["tx_stream_live_stats", "rx_stream_live_stats"],
+                                             columns={"tx_stream_live_stats": ["frame_count"]})
+
+    assert query.subqueries[0].get_columns() == ["tx_stream_live_stats_frame_count"]
+    assert len(query.subqueries[1].get_columns()) > 1
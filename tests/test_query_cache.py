@@ -0,0 +1,72 @@
+import json
+import time
+
+import pytest
+
+import spirenttestcenteriq
+from conftest import get_query_count
+
+@pytest.fixture
+def cached_iq(server):
+    iq = spirenttestcenteriq.SpirentTestCenterIQ("127.0.0.1", server.port, query_cache_bytes=10 ** 7)
+    yield iq
+    iq.close()
+
+def get_query(iq):
+    return spirenttestcenteriq.IqSingleQuery(iq.db_list[0], iq_set_name="tx_stream_live_stats").get_definition()
+
+def test_cache_hit(cached_iq, server):
+    query = get_query(cached_iq)
+
+    first = cached_iq.execute_query(query)
+    second = cached_iq.execute_query(query)
+
+    assert first is second
+    assert get_query_count(server) == 1
+    assert cached_iq.get_query_cache_stats()["hits"] == 1
+
+def test_cache_bypass(cached_iq, server):
+    query = get_query(cached_iq)
+
+    cached_iq.execute_query(query)
+    cached_iq.execute_query(query, use_cache=False)
+
+    assert get_query_count(server) == 2
+
+def test_cache_invalidated_by_last_updated():
+    cache = spirenttestcenteriq.IqQueryCache()
+    cache.put("key", {"result": {"columns": [], "rows": []}}, last_updated="2020-01-01")
+
+    assert cache.get("key", "2020-01-01") is not None
+    assert cache.get("key", "2020-01-02") is None
+    assert cache.get("key", "2020-01-01") is None
+    assert cache.get_stats()["invalidations"] == 1
+
+def test_cache_live_ttl():
+    cache = spirenttestcenteriq.IqQueryCache(live_ttl=0.05)
+    cache.put("key", {"result": {"columns": [], "rows": []}}, live=True)
+
+    assert cache.get("key") is not None
+    time.sleep(0.1)
+    assert cache.get("key") is None
+
+def test_cache_evicts_least_recently_used():
+    result = {"result": {"columns": ["a"], "rows": [[index] for index in range(100)]}}
+    size = len("key0") + spirenttestcenteriq.IqQueryCache.estimate_size(result)
+    cache = spirenttestcenteriq.IqQueryCache(max_bytes=size * 2)
+
+    cache.put("key0", result)
+    cache.put("key1", result)
+    cache.get("key0")
+    cache.put("key2", result)
+
+    assert cache.get("key0") is not None
+    assert cache.get("key1") is None
+    assert cache.get_stats()["evictions"] == 1
+
+def test_estimate_size():
+    rows = [["Port //1/" + str(index % 16), index, index * 0.5] for index in range(10000)]
+    result = {"result": {"columns": ["port_name", "stream_id", "rate"], "rows": rows}}
+
+    actual = len(json.dumps(result, separators=(",", ":")))
+    assert abs(spirenttestcenteriq.IqQueryCache.estimate_size(result) - actual) < actual * 0.1
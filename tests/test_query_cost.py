@@ -0,0 +1,102 @@
+import asyncio
+
+import pytest
+
+import spirenttestcenteriq
+import spirenttestcenteriqasync
+from conftest import get_query_count
+
+def get_query(iq):
+    return spirenttestcenteriq.IqSingleQuery(iq.db_list[0], iq_set_name="tx_stream_live_stats").get_definition()
+
+def reject_cost_queries(server, monkeypatch):
+    # The stand-in server answers with HTTP 400 when the query fails.
+    def execute_query(payload, original=server.execute_query):
+        if payload.get("mode") == "cost":
+            raise Exception("Cost queries are not supported.")
+        return original(payload)
+    monkeypatch.setattr(server, "execute_query", execute_query)
+    return
+
+def test_cost_not_checked_on_cache_hit(server):
+    iq = spirenttestcenteriq.SpirentTestCenterIQ("127.0.0.1", server.port, query_cache_bytes=10 ** 7, cost_budget=10 ** 9)
+    query = get_query(iq)
+
+    iq.execute_query(query, db_id=iq.db_list[0].id)
+    assert get_query_count(server) == 2
+
+    iq.execute_query(query, db_id=iq.db_list[0].id)
+    assert get_query_count(server) == 2
+
+    iq.close()
+
+def test_cost_budget_refuses(server):
+    iq = spirenttestcenteriq.SpirentTestCenterIQ("127.0.0.1", server.port, cost_budget=1)
+    with pytest.raises(RuntimeError):
+        iq.execute_query(get_query(iq), db_id=iq.db_list[0].id)
+    iq.close()
+
+def test_cost_budget_paginates(server):
+    iq = spirenttestcenteriq.SpirentTestCenterIQ("127.0.0.1", server.port, cost_budget=20, cost_policy="paginate")
+
+    result = iq.execute_query(get_query(iq), db_id=iq.db_list[0].id)
+
+    assert len(result["result"]["rows"]) == 100
+    assert [row[result["result"]["columns"].index("tx_stream_stream_id")] for row in result["result"]["rows"]] == list(range(100))
+    iq.close()
+
+def test_unknown_cost_is_allowed(server, monkeypatch):
+    def execute_query(payload, original=server.execute_query):
+        if payload.get("mode") == "cost":
+            return {"result": {"columns": ["plan"], "rows": [["unknown"]]}}
+        return original(payload)
+    monkeypatch.setattr(server, "execute_query", execute_query)
+
+    iq = spirenttestcenteriq.SpirentTestCenterIQ("127.0.0.1", server.port, cost_budget=1)
+    with pytest.warns(RuntimeWarning):
+        result = iq.execute_query(get_query(iq), db_id=iq.db_list[0].id)
+
+    assert len(result["result"]["rows"]) == 100
+    iq.close()
+
+def test_cost_pagination_keeps_query_limit(server):
+    iq = spirenttestcenteriq.SpirentTestCenterIQ("127.0.0.1", server.port, cost_budget=1, cost_policy="paginate", cost_page_size=10)
+    query = spirenttestcenteriq.IqSingleQuery(iq.db_list[0], iq_set_name="tx_stream_live_stats")
+    query.add_limit(25)
+
+    result = query.execute()
+
+    column = result["result"]["columns"].index("tx_stream_stream_id")
+    assert [row[column] for row in result["result"]["rows"]] == list(range(25))
+    # Paging stops at the limit. Reading all 100 rows took 19 requests.
+    assert get_query_count(server) < 10
+    iq.close()
+
+def test_rejected_cost_query_is_allowed(server, monkeypatch):
+    reject_cost_queries(server, monkeypatch)
+
+    iq = spirenttestcenteriq.SpirentTestCenterIQ("127.0.0.1", server.port, cost_budget=1)
+    with pytest.warns(RuntimeWarning):
+        result = iq.execute_query(get_query(iq), db_id=iq.db_list[0].id)
+
+    assert len(result["result"]["rows"]) == 100
+    iq.close()
+
+def test_rejected_cost_query_is_allowed_async(server, monkeypatch):
+    reject_cost_queries(server, monkeypatch)
+
+    async def execute():
+        async with spirenttestcenteriqasync.AsyncSpirentTestCenterIQ("127.0.0.1", server.port, cost_budget=1) as iq:
+            return await iq.execute_query(get_query(iq), db_id=iq.db_list[0].id)
+
+    with pytest.warns(RuntimeWarning):
+        result = asyncio.run(execute())
+
+    assert len(result["result"]["rows"]) == 100
+
+def test_unknown_database_has_no_cost_query_mode(iq, db):
+    assert iq.has_cost_query_mode(db.id)
+    assert not iq.has_cost_query_mode("missing")
+
+    db.capabilities = None
+    assert not iq.has_cost_query_mode(db.id)
@@ -0,0 +1,53 @@
+import math
+
+import pytest
+
+import spirenttestcenteriqresults
+
+def fill_store(store, times):
+    for sample_time in times:
+        store.append(sample_time, {("Port //1/1", 1): {"frame_count": sample_time},
+                                   ("Port //1/2", 2): {"frame_count": -sample_time, "frame_rate": "n/a"}})
+    return
+
+def get_values(result, counter):
+    return [float(value) for value in result["counters"][counter]]
+
+def test_read_time_range(tmp_path):
+    with spirenttestcenteriqresults.LiveResultsStore(str(tmp_path), counters=["frame_count", "frame_rate"], chunk_rows=4) as store:
+        fill_store(store, range(10))
+
+        result = store.read(start=3, end=5)
+
+        assert [float(value) for value in result["times"]] == [3, 3, 4, 4, 5, 5]
+        assert get_values(result, "frame_count") == [3, -3, 4, -4, 5, -5]
+        assert math.isnan(get_values(result, "frame_rate")[1])
+
+def test_reopen_and_read_by_keys(tmp_path):
+    with spirenttestcenteriqresults.LiveResultsStore(str(tmp_path), counters=["frame_count"], chunk_rows=4) as store:
+        fill_store(store, range(5))
+
+    with spirenttestcenteriqresults.LiveResultsStore(str(tmp_path)) as store:
+        assert store.counters == ["frame_count"]
+        assert store.get_keys() == [("Port //1/1", 1), ("Port //1/2", 2)]
+
+        fill_store(store, range(5, 7))
+
+        result = store.read(keys=store.get_keys())
+        assert len(result["keys"]) == 14
+        assert set(result["keys"]) == {("Port //1/1", 1), ("Port //1/2", 2)}
+
+        result = store.read(keys=[["Port //1/1", 1]])
+        assert get_values(result, "frame_count") == list(range(7))
+
+def test_read_includes_buffered_rows(tmp_path):
+    with spirenttestcenteriqresults.LiveResultsStore(str(tmp_path), counters=["frame_count"], chunk_rows=100) as store:
+        fill_store(store, range(3))
+
+        assert len(store.read()["keys"]) == 6
+        assert store.get_time_range() == (0, 2)
+
+def test_unknown_counter(tmp_path):
+    with spirenttestcenteriqresults.LiveResultsStore(str(tmp_path), counters=["frame_count"]) as store:
+        with pytest.raises(KeyError):
+            store.read(counters=["frame_rate"])
@@ -0,0 +1,45 @@
+import math
+
+import pytest
+
+import spirenttestcenteriqresults
+
+def get_rows(history, counter):
+    return [list(row) for row in history["counters"][counter]]
+
+def test_window_after_wrap_around():
+    ring_buffer = spirenttestcenteriqresults.LiveResultsRingBuffer(["rate"], capacity=3)
+    for sample in range(5):
+        ring_buffer.append(float(sample), {"a": {"rate": sample * 10}})
+
+    history = ring_buffer.get_history()
+    assert history["times"] == [2.0, 3.0, 4.0]
+    assert get_rows(history, "rate") == [[20.0], [30.0], [40.0]]
+
+    history = ring_buffer.get_history(since=3.0)
+    assert history["times"] == [3.0, 4.0]
+    assert get_rows(history, "rate") == [[30.0], [40.0]]
+
+def test_new_keys_widen_the_history():
+    ring_buffer = spirenttestcenteriqresults.LiveResultsRingBuffer(["rate", "count"], capacity=4)
+    ring_buffer.append(1.0, {"a": {"rate": 1, "count": 2}})
+    ring_buffer.append(2.0, {"a": {"rate": 3}, "b": {"rate": 4, "count": 5}})
+
+    history = ring_buffer.get_history()
+    assert history["keys"] == ["a", "b"]
+    rates = get_rows(history, "rate")
+    assert rates[0][0] == 1.0 and math.isnan(rates[0][1])
+    assert rates[1] == [3.0, 4.0]
+    assert math.isnan(get_rows(history, "count")[1][0])
+    assert ring_buffer.get_memory_size() == (4 + 2 * 4 * 2) * 8
+
+def test_keys_beyond_max_keys_are_dropped():
+    ring_buffer = spirenttestcenteriqresults.LiveResultsRingBuffer(["rate"], capacity=2, max_keys=2)
+    with pytest.warns(RuntimeWarning):
+        ring_buffer.append(1.0, {"a": {"rate": 1}, "b": {"rate": 2}, "c": {"rate": 3}})
+    ring_buffer.append(2.0, {"c": {"rate": 4}, "a": {"rate": 5}})
+
+    history = ring_buffer.get_history()
+    assert history["keys"] == ["a", "b"]
+    assert get_rows(history, "rate")[0] == [1.0, 2.0]
+    assert ring_buffer.get_memory_size() == (2 + 2 * 2) * 8
@@ -0,0 +1,86 @@
+import sys
+
+import pytest
+
+import spirenttestcenteriq
+
+RAW_DATA = {"result": {"columns": ["name", "id", "rate", "flag", "mixed", "empty"],
+                       "rows": [["a", 1, 1.5, True, {"x": 1}, None],
+                                ["b", None, None, False, "s", None],
+                                [None, 3, 2.0, None, [1, 2], None],
+                                ["a", 4, 3.25, True, 5, None]]},
+            "total": 4}
+
+@pytest.fixture
+def snapshot(tmp_path):
+    snapshot = spirenttestcenteriq.IqResultSnapshot.save(RAW_DATA, str(tmp_path / "result.snap"))
+    yield snapshot
+    snapshot.close()
+
+def test_round_trip(snapshot):
+    assert snapshot.to_raw() == RAW_DATA
+    assert len(snapshot) == 4
+
+def test_column_kinds(snapshot):
+    kinds = {column: snapshot.column_info[column]["kind"] for column in snapshot.columns}
+    assert kinds == {"name": "string", "id": "int", "rate": "float", "flag": "json", "mixed": "json", "empty": "int"}
+
+def test_get_row(snapshot):
+    for index, row in enumerate(RAW_DATA["result"]["rows"]):
+        assert list(snapshot.get_row(index)) == row
+    assert list(snapshot.get_row(-1)) == RAW_DATA["result"]["rows"][-1]
+
+    with pytest.raises(IndexError):
+        snapshot.get_row(4)
+
+def test_get_row_does_not_decode_string_table(snapshot):
+    snapshot.get_row(0)
+    assert snapshot.strings is None
+
+def test_reopen(snapshot):
+    with spirenttestcenteriq.IqResultSnapshot(snapshot.filename) as reopened:
+        assert reopened.to_raw() == RAW_DATA
+
+def test_empty_result(tmp_path):
+    raw_data = {"result": {"columns": ["a", "b"], "rows": []}}
+    with spirenttestcenteriq.IqResultSnapshot.save(raw_data, str(tmp_path / "empty.snap")) as snapshot:
+        assert snapshot.to_raw() == raw_data
+
+def test_not_a_snapshot(tmp_path):
+    filename = tmp_path / "other.bin"
+    filename.write_bytes(b"not a snapshot file")
+    with pytest.raises(ValueError):
+        spirenttestcenteriq.IqResultSnapshot(str(filename))
+
+def test_map_closed_on_corrupt_header(tmp_path, monkeypatch):
+    maps = []
+    class RecordingMap(spirenttestcenteriq.mmap.mmap):
+        def __new__(cls, *args, **kwargs):
+            maps.append(super().__new__(cls, *args, **kwargs))
+            return maps[-1]
+    monkeypatch.setattr(spirenttestcenteriq.mmap, "mmap", RecordingMap)
+
+    filename = tmp_path / "corrupt.snap"
+    filename.write_bytes(spirenttestcenteriq.IqResultSnapshot.magic + (9).to_bytes(8, "little") + b"{corrupt}" + bytes(7))
+    with pytest.raises(ValueError, match="corrupt"):
+        spirenttestcenteriq.IqResultSnapshot(str(filename))
+
+    assert len(maps) == 1 and maps[0].closed
+
+def test_other_byte_order(snapshot, tmp_path):
+    data = bytearray(open(snapshot.filename, "rb").read())
+    other_byte_order = b'"big"' if sys.byteorder == "little" else b'"little"'
+    data = data.replace(b'"' + sys.byteorder.encode() + b'"', other_byte_order, 1)
+
+    header_length = int.from_bytes(data[8:16], "little") + len(other_byte_order) - len(sys.byteorder) - 2
+    data[8:16] = header_length.to_bytes(8, "little")
+
+    filename = tmp_path / "other.snap"
+    filename.write_bytes(bytes(data))
+    with pytest.raises(ValueError, match="byte order"):
+        spirenttestcenteriq.IqResultSnapshot(str(filename))
+
+def test_export_view_snapshot(iq, db, tmp_path):
+    with iq.export_view_snapshot("Stream Results", str(tmp_path / "view.snap"), db_id=db.id) as snapshot:
+        assert len(snapshot) == 100
+        assert snapshot.columns == iq.execute_view_query("Stream Results", db_id=db.id)["result"]["columns"]
@@ -0,0 +1,54 @@
+import json
+
+import pytest
+
+import spirenttestcenteriq
+
+RAW_DATA = {"total": 3,
+            "result": {"columns": ["name", "count", "nested"],
+                       "rows": [["Port é中 //1/1", 1, {"a": [1, 2]}],
+                                ["quote \" and \\ brace }", -2.5e3, None],
+                                ["", 0, [True, False]]]},
+            "query_id": "q1"}
+
+def get_chunks(data, chunk_size):
+    body = json.dumps(data, ensure_ascii=False, indent=1).encode("utf-8")
+    return [body[offset:offset + chunk_size] for offset in range(0, len(body), chunk_size)]
+
+@pytest.mark.parametrize("chunk_size", [1, 2, 3, 7, 4096])
+def test_rows_across_chunk_boundaries(chunk_size):
+    closed = []
+    result = spirenttestcenteriq.IqStreamingResult(get_chunks(RAW_DATA, chunk_size), on_close=closed.append)
+
+    assert result.columns == RAW_DATA["result"]["columns"]
+    assert list(result.rows()) == RAW_DATA["result"]["rows"]
+    assert result.row_count == 3
+    assert result.extra == {"total": 3, "query_id": "q1"}
+    assert closed == [result]
+    assert result.bytes_read == sum(len(chunk) for chunk in get_chunks(RAW_DATA, chunk_size))
+
+def test_rows_before_columns():
+    raw_data = {"result": {"rows": [[1], [2]], "columns": ["id"]}}
+    result = spirenttestcenteriq.IqStreamingResult(get_chunks(raw_data, 5))
+
+    assert result.columns == ["id"]
+    assert list(result) == [[1], [2]]
+
+def test_empty_rows():
+    result = spirenttestcenteriq.IqStreamingResult(get_chunks({"result": {"columns": ["id"], "rows": []}}, 3))
+
+    assert list(result) == []
+
+def test_streamed_query(iq, db):
+    query = spirenttestcenteriq.IqSingleQuery(db, iq_set_name="tx_stream_live_stats")
+    query.add_limit(50)
+
+    with iq.execute_query(query.compile(), db_id=db.id, stream=True) as result:
+        rows = list(result)
+
+    assert result.columns == query.get_columns()
+    assert len(rows) == 50
+
+    stream_ids = {row[result.columns.index("tx_stream_stream_id")] for row in rows}
+    result_dict = iq.convert_result_to_dict(iq.execute_query(query.compile(), db_id=db.id, stream=True), key_names=["tx_stream_stream_id"])
+    assert result_dict.keys() == stream_ids
@@ -0,0 +1,59 @@
+import spirenttestcenteriq
+
+def test_connection_is_reused(iq, db):
+    requests_before = iq.get_transport_stats()["requests"]
+    for _ in range(5):
+        iq.execute_view_query("Stream Results", db_id=db.id)
+
+    stats = iq.get_transport_stats()
+    assert stats["requests"] == requests_before + 5
+    assert stats["connections_opened"] == 1
+    assert stats["connections_reused"] == stats["requests"] - 1
+
+def test_byte_counts(iq, db):
+    stats_before = iq.get_transport_stats()
+    iq.execute_view_query("Stream Results", db_id=db.id)
+    stats = iq.get_transport_stats()
+
+    assert stats["request_bytes"] > stats_before["request_bytes"]
+    assert stats["response_bytes_uncompressed"] > stats_before["response_bytes_uncompressed"]
+
+def test_custom_transport(server):
+    class RecordingTransport(spirenttestcenteriq.IqTransport):
+        def request(self, cmdtype, url, payload=None, timeout=None, stream=False):
+            self.urls.append(url)
+            return super().request(cmdtype, url, payload, timeout=timeout, stream=stream)
+
+    transport = RecordingTransport()
+    transport.urls = []
+    iq = spirenttestcenteriq.SpirentTestCenterIQ("127.0.0.1", server.port, transport=transport)
+    iq.close()
+
+    assert transport.urls
+    assert all(url.startswith("http://127.0.0.1:" + str(server.port) + "/") for url in transport.urls)
+
+def test_compressed_responses(iq, db):
+    response = iq.transport.request("post", iq.get_result_url() + "/queries", iq.get_query_payload(iq.get_view_definition("Stream Results"), "once", db.id))
+
+    assert response.transfer_stats["content_encoding"] == "gzip"
+    assert response.transfer_stats["response_bytes"] < response.transfer_stats["response_bytes_uncompressed"]
+    assert len(response.json()["result"]["rows"]) == 100
+
+def test_uncompressed_responses(server):
+    transport = spirenttestcenteriq.IqTransport(compress_responses=False)
+    iq = spirenttestcenteriq.SpirentTestCenterIQ("127.0.0.1", server.port, transport=transport)
+    iq.execute_view_query("Stream Results", db_id=iq.db_list[0].id)
+
+    stats = iq.get_transport_stats()
+    assert stats["response_bytes"] == stats["response_bytes_uncompressed"]
+    iq.close()
+
+def test_compressed_requests(server):
+    iq = spirenttestcenteriq.SpirentTestCenterIQ("127.0.0.1", server.port, compress_requests=True)
+    iq.transport.compress_min_bytes = 0
+    result = iq.execute_view_query("Stream Results", db_id=iq.db_list[0].id)
+
+    stats = iq.get_transport_stats()
+    assert len(result["result"]["rows"]) == 100
+    assert stats["request_bytes"] < stats["request_bytes_uncompressed"]
+    iq.close()